@@ -1,10 +1,23 @@
 import os
+import struct
 from cryptography.hazmat.primitives.asymmetric import padding
 from cryptography.hazmat.primitives import serialization, hashes
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
 from cryptography.hazmat.primitives import padding as sym_padding  # Correct import
 from cryptography.hazmat.backends import default_backend
+from Process.parallel_cbc import decrypt_file_ranges
+from Process.Asymmetric_algo.key_store import default_store
+from Process import cbc_buffer, mapped_io
+from Process.compression import codec_name, decompress_bytes, expand_stream
+
+# Must match the streaming format written by rsa.encrypt_file(..., stream=True)
+STREAM_MAGIC = b'ENCR'
+STREAM_VERSION = 1
+COMPRESSED_VERSION = 2
+STREAM_HEADER = struct.Struct('>4sBH')
+COMPRESSED_HEADER = struct.Struct('>4sBHB')
+DEFAULT_CHUNK_SIZE = 1024 * 1024
 
 def load_private_key(private_key_path):
     """Load the RSA private key from a file."""
@@ -12,13 +25,193 @@ def load_private_key(private_key_path):
         private_key = serialization.load_pem_private_key(f.read(), password=None, backend=default_backend())
     return private_key
 
-def decrypt_file(file_path, output_path, private_key, password):
-    """Decrypt a file using RSA and a password-derived symmetric key."""
+def unwrap_key(private_key, encrypted_symmetric_key):
+    """Decrypt the RSA-OAEP wrapped session key."""
+    return private_key.decrypt(
+        encrypted_symmetric_key,
+        padding.OAEP(
+            mgf=padding.MGF1(algorithm=hashes.SHA256()),
+            algorithm=hashes.SHA256(),
+            label=None
+        )
+    )
+
+def is_stream_file(file_path):
+    """Return True if the file uses the streaming hybrid format."""
+    with open(file_path, 'rb') as f:
+        return f.read(len(STREAM_MAGIC)) == STREAM_MAGIC
+
+def is_compressed(data):
+    """Return True if data (the start of a file) is a stream of compressed plaintext."""
+    return bytes(data[:len(STREAM_MAGIC) + 1]) == STREAM_MAGIC + bytes([COMPRESSED_VERSION])
+
+def is_compressed_file(file_path):
+    """Return True if the file is a stream of compressed plaintext."""
+    with open(file_path, 'rb') as f:
+        return is_compressed(f.read(len(STREAM_MAGIC) + 1))
+
+def _parse_header(data, private_key):
+    """Parse the stream header at the start of data; returns (header_size, key_length, compression).
+
+    Returns None while data is too short to hold the header. Raises
+    ValueError for anything but a stream file for this private key.
+    """
+    if len(data) < STREAM_HEADER.size:
+        return None
+    magic, version, key_length = STREAM_HEADER.unpack_from(data)
+    if magic != STREAM_MAGIC or version not in (STREAM_VERSION, COMPRESSED_VERSION):
+        raise ValueError("Not an RSA stream file")
+    if key_length != private_key.key_size // 8:
+        raise ValueError("Wrapped key does not match the private key size")
+    if version == STREAM_VERSION:
+        return STREAM_HEADER.size, key_length, None
+    if len(data) < COMPRESSED_HEADER.size:
+        return None
+    compression = COMPRESSED_HEADER.unpack_from(data)[3]
+    codec_name(compression)  # rejects unknown codec ids
+    return COMPRESSED_HEADER.size, key_length, compression
+
+class StreamDecryptor:
+    """Incremental decryptor for the streaming hybrid format.
+
+    Buffers only until the header, wrapped key and IV are complete, then
+    decrypts the body as it arrives. `compression` is the codec id from the
+    header (None: not compressed). Raises ValueError on a malformed header
+    or invalid padding.
+    """
+
+    def __init__(self, private_key):
+        self._private_key = private_key
+        self._header = bytearray()
+        self._decryptor = None
+        self._unpadder = sym_padding.PKCS7(algorithms.AES.block_size).unpadder()
+        self.compression = None
+
+    def _start(self):
+        header = _parse_header(self._header, self._private_key)
+        if header is None:
+            return None
+        header_size, key_length, self.compression = header
+        body_start = header_size + key_length + 16
+        if len(self._header) < body_start:
+            return None
+
+        symmetric_key = unwrap_key(self._private_key, bytes(self._header[header_size:body_start - 16]))
+        iv = bytes(self._header[body_start - 16:body_start])
+        cipher = Cipher(algorithms.AES(symmetric_key), modes.CBC(iv), backend=default_backend())
+        self._decryptor = cipher.decryptor()
+        return bytes(self._header[body_start:])
+
+    def update(self, data):
+        if self._decryptor is None:
+            self._header += data
+            data = self._start()
+            if data is None:
+                return b''
+        return self._unpadder.update(self._decryptor.update(data))
+
+    def finalize(self):
+        if self._decryptor is None:
+            raise ValueError("Encrypted data is shorter than the stream header")
+        return self._unpadder.update(self._decryptor.finalize()) + self._unpadder.finalize()
+
+def decrypt_stream(src, dst, private_key, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """Decrypt a streaming hybrid file object src into dst chunk by chunk.
+
+    Compressed plaintext is expanded on the way. progress, if given, is
+    called with the number of input bytes decrypted so far.
+    """
+    expand_stream(StreamDecryptor(private_key), src, dst, chunk_size, progress)
+
+def decrypt_into(data, out, private_key=None, progress=None):
+    """Decrypt a streaming hybrid payload into the writable buffer out.
+
+    out needs room for the length of the AES body. The private key defaults
+    to the key store's default pair. progress, if given, is called with the
+    number of bytes of data decrypted so far. Returns the plaintext length;
+    raises ValueError on a malformed header, wrong key or invalid padding,
+    and for compressed streams, whose plaintext may not fit (use decrypt_stream).
+    """
+    private_key = private_key or default_store.private_key()
+    data = memoryview(data)
+    if is_compressed(data):
+        raise ValueError("Compressed file; decrypt it with decrypt_stream")
+    if len(data) < STREAM_HEADER.size:
+        raise ValueError("Encrypted data is shorter than the stream header")
+    _, key_length, _ = _parse_header(data, private_key)
+    body_start = STREAM_HEADER.size + key_length + 16
+    if len(data) < body_start:
+        raise ValueError("Encrypted data is shorter than the stream header")
+    symmetric_key = unwrap_key(private_key, bytes(data[STREAM_HEADER.size:body_start - 16]))
+    iv = bytes(data[body_start - 16:body_start])
+    cipher = Cipher(algorithms.AES(symmetric_key), modes.CBC(iv), backend=default_backend())
+    reporting = (lambda done: progress(body_start + done)) if progress else None
+    return cbc_buffer.decrypt_into(cipher, data[body_start:], out, 16, reporting)
+
+def decrypt_bytes(data, private_key=None):
+    """Decrypt a streaming hybrid payload held in memory, expanding compressed plaintext."""
+    if is_compressed(data):
+        decryptor = StreamDecryptor(private_key or default_store.private_key())
+        plaintext = decryptor.update(data) + decryptor.finalize()
+        return decompress_bytes(plaintext, decryptor.compression)
+    out = bytearray(len(data))
+    del out[decrypt_into(data, out, private_key):]
+    return bytes(out)
+
+def read_stream_key(file_path, private_key):
+    """Unwrap the session key of a stream file; returns (symmetric_key, body_offset)."""
+    with open(file_path, 'rb') as f:
+        header = _parse_header(f.read(COMPRESSED_HEADER.size), private_key)
+        if header is None:
+            raise ValueError("Encrypted data is shorter than the stream header")
+        header_size, key_length, _ = header
+        f.seek(header_size)
+        symmetric_key = unwrap_key(private_key, f.read(key_length))
+    # The IV sits directly before the body, as parallel_cbc expects
+    return symmetric_key, header_size + key_length + 16
+
+def decrypt_file(file_path, output_path, private_key, password, chunk_size=DEFAULT_CHUNK_SIZE, workers=None,
+                 use_mmap=False, progress=None):
+    """Decrypt a file using RSA and a password-derived symmetric key.
+
+    Files written with rsa.encrypt_file(..., stream=True) are detected and
+    decrypted in chunks from disk to disk, on `workers` processes when
+    workers > 1, or through memory-mapped input and output files when
+    use_mmap is set. Compressed streams are always decrypted and expanded
+    in chunks. progress, if given, is called with the number of input bytes
+    decrypted so far.
+    """
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"File not found: {file_path}")
 
     os.makedirs(output_path, exist_ok=True)
 
+    if is_stream_file(file_path):
+        output_file_path = os.path.join(output_path, os.path.basename(file_path).replace('.enc', ''))
+        try:
+            if is_compressed_file(file_path):
+                with open(file_path, 'rb') as src, open(output_file_path, 'wb') as dst:
+                    decrypt_stream(src, dst, private_key, chunk_size, progress)
+            elif use_mmap:
+                mapped_io.decrypt_mapped(file_path, output_file_path,
+                                         lambda src, out: decrypt_into(src, out, private_key, progress))
+            elif workers and workers > 1:
+                symmetric_key, body_offset = read_stream_key(file_path, private_key)
+                with open(output_file_path, 'wb') as dst:
+                    decrypt_file_ranges('AES', symmetric_key, file_path, body_offset, dst, workers,
+                                        progress=progress)
+            else:
+                with open(file_path, 'rb') as src, open(output_file_path, 'wb') as dst:
+                    decrypt_stream(src, dst, private_key, chunk_size, progress)
+        except Exception:
+            # Never leave a partially decrypted file behind
+            if os.path.exists(output_file_path):
+                os.remove(output_file_path)
+            raise
+        if progress:
+            progress(os.path.getsize(file_path))
+        return
+
     # Read the encrypted file contents
     with open(file_path, 'rb') as f:
         salt = f.read(16)
@@ -27,14 +220,7 @@ def decrypt_file(file_path, output_path, private_key, password):
         encrypted_data = f.read()
 
     # Decrypt the symmetric key using the RSA private key
-    symmetric_key = private_key.decrypt(
-        encrypted_symmetric_key,
-        padding.OAEP(
-            mgf=padding.MGF1(algorithm=hashes.SHA256()),
-            algorithm=hashes.SHA256(),
-            label=None
-        )
-    )
+    symmetric_key = unwrap_key(private_key, encrypted_symmetric_key)
 
     # Decrypt the file contents with AES-256 using the derived symmetric key
     cipher = Cipher(algorithms.AES(symmetric_key), modes.CBC(iv), backend=default_backend())
@@ -53,19 +239,17 @@ def decrypt_file(file_path, output_path, private_key, password):
     with open(output_file_path, 'wb') as f:
         f.write(decrypted_data)
 
-if __name__ == "__main__":
-    input_path = "D:\\Desktop\\Encryption\\Encrypted_files\\rsa"
-    output_path = "D:\\Desktop\\Encryption\\Decrypted_files\\rsa"
-    private_key_path = "D:\\Desktop\\Encryption\\Keys\\private_key.pem"
+    if progress:
+        progress(os.path.getsize(file_path))
 
-    # Load the private key for decryption
-    private_key = load_private_key(private_key_path)
+def decrypt_file_with_key_path(file_path, output_path, private_key_path, password, workers=None, use_mmap=False,
+                               progress=None):
+    """Decrypt with a key from the cached key store; takes only picklable arguments for process pools."""
+    decrypt_file(file_path, output_path, default_store.load_private(private_key_path), password, workers=workers,
+                 use_mmap=use_mmap, progress=progress)
 
-    # Ask the user for the decryption password
-    password = input("Enter the decryption password: ")
-
-    for root, dirs, files in os.walk(input_path):
-        for file in files:
-            if file.endswith('.enc'):
-                file_to_decrypt = os.path.join(root, file)
-                decrypt_file(file_to_decrypt, output_path, private_key, password)
+if __name__ == "__main__":
+    # Decrypt everything under Encrypted_files/rsa in parallel (see Process/batch.py for options)
+    import sys
+    from Process.batch import main
+    sys.exit(main(['decrypt', 'rsa'] + sys.argv[1:]))
@@ -1,9 +1,26 @@
 import os
+import struct
 from cryptography.hazmat.primitives.asymmetric import rsa, padding
 from cryptography.hazmat.primitives import serialization, hashes
+from cryptography.hazmat.primitives import padding as sym_padding
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from cryptography.hazmat.backends import default_backend
+from Process.Asymmetric_algo.key_store import default_store
+from Process import cbc_buffer
+from Process.compression import compress_bytes, input_stream, resolve
+
+# Streaming hybrid format: MAGIC | version | u16 wrapped key length |
+# RSA-OAEP wrapped AES-256 key | IV | AES-256-CBC body with PKCS7 padding
+#
+# Compressed plaintext (see Process/compression.py) is stored with version 2,
+# whose header has one more byte after the key length: the codec id.
+STREAM_MAGIC = b'ENCR'
+STREAM_VERSION = 1
+COMPRESSED_VERSION = 2
+STREAM_HEADER = struct.Struct('>4sBH')
+COMPRESSED_HEADER = struct.Struct('>4sBHB')
+DEFAULT_CHUNK_SIZE = 1024 * 1024
 
 def get_base_path():
     """Get the base path for the encryption project."""
@@ -82,15 +99,112 @@ def encrypt_private_key(private_key, password):
 
     return salt, iv, encrypted_private_key
 
-def encrypt_file(file_path, output_path=None, public_key=None, password=None):
+def load_public_key(public_key_path):
+    """Load the RSA public key from a file."""
+    with open(public_key_path, 'rb') as key_file:
+        return serialization.load_pem_public_key(
+            key_file.read(),
+            backend=default_backend()
+        )
+
+def stream_header(key_length, compression=None):
+    """Stream header for a wrapped key of key_length bytes; compression is the codec id, if any."""
+    if compression is None:
+        return STREAM_HEADER.pack(STREAM_MAGIC, STREAM_VERSION, key_length)
+    return COMPRESSED_HEADER.pack(STREAM_MAGIC, COMPRESSED_VERSION, key_length, compression)
+
+def wrap_key(public_key, symmetric_key):
+    """Encrypt a symmetric session key with the RSA public key (OAEP-SHA256)."""
+    return public_key.encrypt(
+        symmetric_key,
+        padding.OAEP(
+            mgf=padding.MGF1(algorithm=hashes.SHA256()),
+            algorithm=hashes.SHA256(),
+            label=None
+        )
+    )
+
+class StreamEncryptor:
+    """Incremental encryptor for the streaming hybrid format.
+
+    The session key is wrapped with the RSA public key once, up front; the
+    header is returned with the first update() or finalize() call.
+    compression is the codec id of input that is already compressed; the
+    header records it.
+    """
+
+    def __init__(self, public_key, compression=None):
+        symmetric_key = os.urandom(32)
+        iv = os.urandom(16)
+        encrypted_symmetric_key = wrap_key(public_key, symmetric_key)
+        cipher = Cipher(algorithms.AES(symmetric_key), modes.CBC(iv), backend=default_backend())
+        self._encryptor = cipher.encryptor()
+        self._padder = sym_padding.PKCS7(algorithms.AES.block_size).padder()
+        self._pending = stream_header(len(encrypted_symmetric_key), compression) + encrypted_symmetric_key + iv
+
+    def update(self, data):
+        out = self._pending + self._encryptor.update(self._padder.update(data))
+        self._pending = b''
+        return out
+
+    def finalize(self):
+        out = self._pending + self._encryptor.update(self._padder.finalize()) + self._encryptor.finalize()
+        self._pending = b''
+        return out
+
+def encrypted_size(length, public_key=None):
+    """Size of the encrypt_into() output for `length` bytes with this public key."""
+    public_key = public_key or default_store.public_key()
+    return STREAM_HEADER.size + public_key.key_size // 8 + 16 + cbc_buffer.padded_size(length, 16)
+
+def encrypt_into(data, out, public_key=None):
+    """Encrypt data in the streaming hybrid format into the writable buffer out.
+
+    out must hold encrypted_size(len(data), public_key) bytes. The public key
+    defaults to the key store's default pair. Returns the number of bytes written.
+    """
+    public_key = public_key or default_store.public_key()
+    out = memoryview(out)
+    if len(out) < encrypted_size(len(data), public_key):
+        raise ValueError(f"Output buffer too small: need {encrypted_size(len(data), public_key)} bytes, got {len(out)}")
+    symmetric_key = os.urandom(32)
+    iv = os.urandom(16)
+    encrypted_symmetric_key = wrap_key(public_key, symmetric_key)
+    header = stream_header(len(encrypted_symmetric_key)) + encrypted_symmetric_key + iv
+    out[:len(header)] = header
+    cipher = Cipher(algorithms.AES(symmetric_key), modes.CBC(iv), backend=default_backend())
+    return len(header) + cbc_buffer.encrypt_into(cipher, data, out[len(header):], 16)
+
+def encrypt_bytes(data, public_key=None, compression=None):
+    """Encrypt data in memory; returns the same format as encrypt_file(..., stream=True)."""
+    data, compression = compress_bytes(data, compression)
+    public_key = public_key or default_store.public_key()
+    if compression is not None:
+        encryptor = StreamEncryptor(public_key, compression)
+        return encryptor.update(data) + encryptor.finalize()
+    out = bytearray(encrypted_size(len(data), public_key))
+    encrypt_into(data, out, public_key)
+    return bytes(out)
+
+def encrypt_file(file_path, output_path=None, public_key=None, password=None, stream=False, chunk_size=DEFAULT_CHUNK_SIZE,
+                 progress=None, compression=None):
     """Encrypt the file and include the encrypted private key.
     
     Args:
         file_path (str): Path to the file to encrypt
         output_path (str, optional): Directory to save encrypted file. 
                                      Defaults to Encrypted_files/rsa relative to base path.
-        public_key (object, optional): RSA public key. Loads from file if not provided.
+        public_key (object, optional): RSA public key. Loaded from Keys/public_key.pem
+                                       through the cached key store if not provided.
         password (str, optional): Password for private key encryption. Prompts if not provided.
+        stream (bool, optional): Wrap the session key once and encrypt the body in
+                                 chunks from disk to disk (PKCS7-padded stream format).
+        chunk_size (int, optional): Bytes read per chunk in stream mode.
+        progress (callable, optional): Called with the number of input bytes
+                                       encrypted so far.
+        compression (str, optional): Compress the plaintext first with this codec
+                                     ('zlib', 'lzma', 'zstd' or 'auto'). Implies stream:
+                                     the legacy format's zero padding is not reversible.
     """
     # Resolve base path
     base_path = get_base_path()
@@ -104,12 +218,30 @@ def encrypt_file(file_path, output_path=None, public_key=None, password=None):
 
     # Load public key if not provided
     if public_key is None:
-        public_key_path = os.path.join(base_path, 'Keys', 'public_key.pem')
-        with open(public_key_path, 'rb') as key_file:
-            public_key = serialization.load_pem_public_key(
-                key_file.read(),
-                backend=default_backend()
-            )
+        public_key = default_store.load_public(os.path.join(base_path, 'Keys', 'public_key.pem'))
+
+    if stream or resolve(compression):
+        output_file_path = os.path.join(output_path, os.path.basename(file_path) + '.enc')
+        done = 0
+        try:
+            with open(file_path, 'rb') as src, open(output_file_path, 'wb') as dst:
+                src, progress, codec = input_stream(src, compression, progress)
+                encryptor = StreamEncryptor(public_key, codec)
+                while True:
+                    chunk = src.read(chunk_size)
+                    if not chunk:
+                        break
+                    dst.write(encryptor.update(chunk))
+                    done += len(chunk)
+                    if progress:
+                        progress(done)
+                dst.write(encryptor.finalize())
+        except Exception:
+            # Never leave a partially encrypted file behind (e.g. cancelled between chunks)
+            if os.path.exists(output_file_path):
+                os.remove(output_file_path)
+            raise
+        return
 
     # Generate symmetric key for file encryption
     symmetric_key = os.urandom(32)
@@ -128,14 +260,7 @@ def encrypt_file(file_path, output_path=None, public_key=None, password=None):
     encrypted_file_data = encryptor.update(padded_file_data) + encryptor.finalize()
 
     # Encrypt the symmetric key with RSA public key
-    encrypted_symmetric_key = public_key.encrypt(
-        symmetric_key,
-        padding.OAEP(
-            mgf=padding.MGF1(algorithm=hashes.SHA256()),
-            algorithm=hashes.SHA256(),
-            label=None
-        )
-    )
+    encrypted_symmetric_key = wrap_key(public_key, symmetric_key)
 
     # Construct the output file path
     output_file_name = os.path.basename(file_path) + '.enc'
@@ -147,18 +272,14 @@ def encrypt_file(file_path, output_path=None, public_key=None, password=None):
         f.write(encrypted_symmetric_key)
         f.write(encrypted_file_data)
 
+    if progress:
+        progress(len(file_data))
+
 if __name__ == "__main__":
-    # Use dynamic path resolution
-    base_path = get_base_path()
-    
+    # Encrypt everything under Original_files/rsa in parallel (see Process/batch.py for options)
+    import sys
+    from Process.batch import main
     # Generate keys
     generate_rsa_keys()
 
-    # Encrypt files
-    file_path = os.path.join(base_path, 'Original_files', 'rsa')
-    output_path = os.path.join(base_path, 'Encrypted_files', 'rsa')
-    
-    for root, dirs, files in os.walk(file_path):
-        for file in files:
-            file_to_encrypt = os.path.join(root, file)
-            encrypt_file(file_to_encrypt, output_path)
+    sys.exit(main(['encrypt', 'rsa'] + sys.argv[1:]))
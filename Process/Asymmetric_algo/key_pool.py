@@ -0,0 +1,121 @@
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.backends import default_backend
+
+# Pool of pre-generated RSA key pairs. Generation runs in background worker
+# processes and keeps `target` unused pairs ready per key size, so handing out
+# a key pair costs a deque pop instead of a multi-hundred-millisecond
+# rsa.generate_private_key call. Every pair is handed out exactly once.
+
+SUPPORTED_KEY_SIZES = (2048, 3072, 4096)
+
+
+def generate_pem_pair(key_size=2048):
+    """Generate an RSA key pair and return (private_pem, public_pem) bytes."""
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=key_size, backend=default_backend())
+    private_pem = private_key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption()
+    )
+    public_pem = private_key.public_key().public_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    return private_pem, public_pem
+
+
+class KeyPairPool:
+    """Keeps `target` fresh RSA key pairs ready per key size, refilled by worker processes."""
+
+    def __init__(self, key_sizes=(2048,), target=4, workers=None):
+        self.target = target
+        self.workers = workers or max(1, (os.cpu_count() or 1) // 2)
+        self._ready = {size: deque() for size in key_sizes}
+        self._in_flight = {size: 0 for size in key_sizes}
+        self._lock = threading.Lock()
+        self._executor = None
+        self.served_from_pool = 0
+        self.generated_inline = 0
+
+    def start(self):
+        """Start background refilling for every configured key size."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            sizes = list(self._ready)
+        for size in sizes:
+            self._refill(size)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _refill(self, key_size):
+        with self._lock:
+            if self._executor is None:
+                return
+            missing = self.target - len(self._ready[key_size]) - self._in_flight[key_size]
+            for _ in range(max(0, missing)):
+                self._in_flight[key_size] += 1
+                future = self._executor.submit(generate_pem_pair, key_size)
+                future.add_done_callback(lambda f, size=key_size: self._collect(size, f))
+
+    def _collect(self, key_size, future):
+        with self._lock:
+            self._in_flight[key_size] -= 1
+            if future.cancelled() or future.exception() is not None:
+                return
+            self._ready[key_size].append(future.result())
+        self._refill(key_size)
+
+    def get(self, key_size=2048):
+        """Return a fresh (private_pem, public_pem) pair of the given size.
+
+        Served from the pool when a pair is ready; otherwise generated inline
+        while the pool refills in the background. Sizes that were not
+        configured are added to the pool on first use.
+        """
+        if key_size not in SUPPORTED_KEY_SIZES:
+            raise ValueError(f"Unsupported RSA key size: {key_size}")
+        if self._executor is None:
+            self.start()
+        with self._lock:
+            ready = self._ready.setdefault(key_size, deque())
+            self._in_flight.setdefault(key_size, 0)
+            pair = ready.popleft() if ready else None
+        self._refill(key_size)
+        if pair is not None:
+            self.served_from_pool += 1
+            return pair
+        self.generated_inline += 1
+        return generate_pem_pair(key_size)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "target": self.target,
+                "workers": self.workers,
+                "ready": {size: len(pairs) for size, pairs in self._ready.items()},
+                "in_flight": dict(self._in_flight),
+                "served_from_pool": self.served_from_pool,
+                "generated_inline": self.generated_inline,
+            }
+
+
+def _env_key_sizes():
+    sizes = os.environ.get('RSA_POOL_KEY_SIZES', '2048')
+    return tuple(int(size) for size in sizes.split(',') if size.strip())
+
+
+default_pool = KeyPairPool(
+    key_sizes=_env_key_sizes(),
+    target=int(os.environ.get('RSA_POOL_SIZE', '4')),
+    workers=int(os.environ['RSA_POOL_WORKERS']) if os.environ.get('RSA_POOL_WORKERS') else None,
+)
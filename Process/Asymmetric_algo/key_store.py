@@ -0,0 +1,93 @@
+import os
+import threading
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.backends import default_backend
+
+# Process-wide cache of parsed RSA keys. PEM parsing and RSA key validation
+# happen once per file; later lookups are served from memory until the file's
+# mtime, inode or size changes on disk.
+
+
+def get_base_path():
+    """Get the base path for the encryption project."""
+    return os.environ.get('ENCRYPTION_BASE_PATH', os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+
+def _load_private(pem):
+    return serialization.load_pem_private_key(pem, password=None, backend=default_backend())
+
+
+def _load_public(pem):
+    return serialization.load_pem_public_key(pem, backend=default_backend())
+
+
+class KeyStore:
+    """Named RSA key pairs, parsed once and reloaded only when their files change.
+
+    The "default" pair is Keys/private_key.pem and Keys/public_key.pem; any
+    other name resolves to Keys/<name>/ unless registered explicitly.
+    """
+
+    def __init__(self, keys_path=None):
+        self.keys_path = keys_path or os.path.join(get_base_path(), 'Keys')
+        self._pairs = {}
+        self._cache = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.loads = 0
+
+    def register(self, name, private_key_path=None, public_key_path=None):
+        """Point a key pair name at specific PEM files."""
+        self._pairs[name] = (private_key_path, public_key_path)
+
+    def paths(self, name='default'):
+        """Return (private_key_path, public_key_path) for a key pair name."""
+        if name in self._pairs:
+            return self._pairs[name]
+        directory = self.keys_path if name == 'default' else os.path.join(self.keys_path, name)
+        return os.path.join(directory, 'private_key.pem'), os.path.join(directory, 'public_key.pem')
+
+    def private_key(self, name='default'):
+        return self.load_private(self.paths(name)[0])
+
+    def public_key(self, name='default'):
+        return self.load_public(self.paths(name)[1])
+
+    def load_private(self, path):
+        return self._get(path, _load_private)
+
+    def load_public(self, path):
+        return self._get(path, _load_public)
+
+    def _get(self, path, loader):
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        signature = (st.st_mtime_ns, st.st_ino, st.st_size)
+        cached = self._cache.get(path)
+        if cached is not None and cached[0] == signature:
+            self.hits += 1
+            return cached[1]
+        with self._lock:
+            cached = self._cache.get(path)
+            if cached is not None and cached[0] == signature:
+                self.hits += 1
+                return cached[1]
+            with open(path, 'rb') as f:
+                key = loader(f.read())
+            self._cache[path] = (signature, key)
+            self.loads += 1
+            return key
+
+    def invalidate(self, path=None):
+        """Drop one cached key file, or all of them."""
+        with self._lock:
+            if path is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(os.path.abspath(path), None)
+
+    def stats(self):
+        return {"keys_path": self.keys_path, "cached": len(self._cache), "hits": self.hits, "loads": self.loads}
+
+
+default_store = KeyStore()
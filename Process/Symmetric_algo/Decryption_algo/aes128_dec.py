@@ -1,47 +1,104 @@
 import os
-from cryptography.fernet import Fernet, InvalidToken
+from cryptography.fernet import InvalidToken
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.backends import default_backend
 import base64
+from Process import mapped_io
+from Process.compression import decompress_bytes
+from Process.Symmetric_algo import fernet_stream
+from Process.Symmetric_algo.fernet_stream import is_stream_file, decrypt_stream, decrypt_stream_parallel, StreamDecryptor, BinaryFernet
 
-def decrypt_file(file_path, output_path, key_string):
-    
+def derive_key(key_string):
+    """Derive a Fernet key from the input string using SHA-256."""
+    digest = hashes.Hash(hashes.SHA256(), backend=default_backend())
+    digest.update(key_string.encode())
+    return base64.urlsafe_b64encode(digest.finalize())
+
+def stream_decryptor(key_string):
+    """Return an incremental decryptor (update/finalize) for the chunked container."""
+    return StreamDecryptor(BinaryFernet(derive_key(key_string)))
+
+def decrypt_bytes(data, key_string):
+    """Decrypt any AES-128 format held in memory, expanding compressed plaintext. Raises InvalidToken on failure."""
+    decryptor = stream_decryptor(key_string)
+    plaintext = decryptor.update(data) + decryptor.finalize()
+    return decompress_bytes(plaintext, decryptor.compression)
+
+def decrypt_into(data, out, key_string):
+    """Decrypt data into the writable buffer out (at least len(data) bytes); returns the plaintext length."""
+    return fernet_stream.decrypt_into(BinaryFernet(derive_key(key_string)), data, out)
+
+def decrypt_range(source, offset, length, key_string):
+    """Decrypt `length` bytes at plaintext `offset` from a AES-128 chunked container.
+
+    source is a path or seekable binary file object; only the segments covering
+    the range are read. Raises InvalidToken on failure, ValueError for single-token files.
+    """
+    return fernet_stream.decrypt_range(BinaryFernet(derive_key(key_string)), source, offset, length)
+
+def decrypt_file(file_path, output_path, key_string, workers=None, use_mmap=False, progress=None):
+    """Decrypt an AES-128 (Fernet) file; chunked containers can use `workers` processes.
+
+    use_mmap=True memory-maps the input and a pre-sized output file instead of
+    reading the ciphertext into memory, and takes precedence over workers.
+    progress, if given, is called with the number of input bytes decrypted so far.
+    """
 
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"File not found: {file_path}")
 
     os.makedirs(output_path, exist_ok=True)  # Create output directory if needed
 
-    # Derive a 32-byte key from the input string
-    digest = hashes.Hash(hashes.SHA256(), backend=default_backend())
-    digest.update(key_string.encode())
-    key = base64.urlsafe_b64encode(digest.finalize())
+    fernet = BinaryFernet(derive_key(key_string))
 
-    fernet = Fernet(key)
+    # Construct the output file path
+    output_file_name = os.path.basename(file_path)[:-4]  # Remove '.enc' extension
+    output_file_path = os.path.join(output_path, output_file_name)
 
     try:
+        # Compressed plaintext can outgrow the mapped output, so it takes the stream path
+        if use_mmap and not fernet_stream.is_compressed_file(file_path):
+            mapped_io.decrypt_mapped(file_path, output_file_path,
+                                     lambda src, out: fernet_stream.decrypt_mapped(fernet, src, out, progress))
+            if progress:
+                progress(os.path.getsize(file_path))
+            return
+
+        # Chunked container written by encrypt_file(..., stream=True) or (..., binary=True)
+        if is_stream_file(file_path):
+            with open(file_path, 'rb') as src, open(output_file_path, 'wb') as dst:
+                if workers and workers > 1:
+                    decrypt_stream_parallel(fernet, src, dst, workers, progress)
+                else:
+                    decrypt_stream(fernet, src, dst, progress=progress)
+            if progress:
+                progress(os.path.getsize(file_path))
+            return
+
         with open(file_path, 'rb') as f:
-            encrypted_data = f.read()   
+            encrypted_data = f.read()
 
         decrypted_data = fernet.decrypt(encrypted_data)
 
-        # Construct the output file path
-        output_file_name = os.path.basename(file_path)[:-4]  # Remove '.enc' extension
-        output_file_path = os.path.join(output_path, output_file_name)
-
         with open(output_file_path, 'wb') as f:
             f.write(decrypted_data)
 
+        if progress:
+            progress(len(encrypted_data))
+
     except InvalidToken:
+        # Never leave a partially decrypted file behind
+        if os.path.exists(output_file_path):
+            os.remove(output_file_path)
         print(f"Incorrect decryption key for file: {file_path}")
+    except Exception:
+        # e.g. cancelled between chunks
+        if os.path.exists(output_file_path):
+            os.remove(output_file_path)
+        raise
 
 if __name__ == "__main__":
-    input_path = "D:\\Desktop\\Encryption\\Encrypted_files\\aes128"
-    output_path = "D:\\Desktop\\Encryption\\Decrypted_files\\aes128"
-    key_string = input("Enter the decryption key: ")
-
-    for root, dirs, files in os.walk(input_path):
-        for file in files:
-            if file.endswith('.enc'):
-                file_to_decrypt = os.path.join(root, file)
-                decrypt_file(file_to_decrypt, output_path, key_string)
+    # Decrypt everything under Encrypted_files/aes128 in parallel (see Process/batch.py for options)
+    import sys
+    from Process.batch import main
+    sys.exit(main(['decrypt', 'aes128'] + sys.argv[1:]))
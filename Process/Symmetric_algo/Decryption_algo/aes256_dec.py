@@ -1,14 +1,46 @@
 import os
-from cryptography.fernet import Fernet
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.backends import default_backend
 import base64
+from cryptography.fernet import InvalidToken
+from Process import mapped_io
+from Process.compression import decompress_bytes
+from Process.Symmetric_algo import fernet_stream
+from Process.Symmetric_algo.fernet_stream import is_stream_file, decrypt_stream, decrypt_stream_parallel, StreamDecryptor, BinaryFernet
 
 def get_base_path():
     """Get the base path for the encryption project."""
     return os.environ.get('ENCRYPTION_BASE_PATH', os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))))
 
-def decrypt_file(input_path, output_path=None, key_string=None):
+def derive_key(key_string):
+    """Derive a Fernet key from the input string using SHA-256."""
+    digest = hashes.Hash(hashes.SHA256(), backend=default_backend())
+    digest.update(key_string.encode())
+    return base64.urlsafe_b64encode(digest.finalize()[:32])
+
+def stream_decryptor(key_string):
+    """Return an incremental decryptor (update/finalize) for the chunked container."""
+    return StreamDecryptor(BinaryFernet(derive_key(key_string)))
+
+def decrypt_bytes(data, key_string):
+    """Decrypt any AES-256 format held in memory, expanding compressed plaintext. Raises InvalidToken on failure."""
+    decryptor = stream_decryptor(key_string)
+    plaintext = decryptor.update(data) + decryptor.finalize()
+    return decompress_bytes(plaintext, decryptor.compression)
+
+def decrypt_into(data, out, key_string):
+    """Decrypt data into the writable buffer out (at least len(data) bytes); returns the plaintext length."""
+    return fernet_stream.decrypt_into(BinaryFernet(derive_key(key_string)), data, out)
+
+def decrypt_range(source, offset, length, key_string):
+    """Decrypt `length` bytes at plaintext `offset` from a AES-256 chunked container.
+
+    source is a path or seekable binary file object; only the segments covering
+    the range are read. Raises InvalidToken on failure, ValueError for single-token files.
+    """
+    return fernet_stream.decrypt_range(BinaryFernet(derive_key(key_string)), source, offset, length)
+
+def decrypt_file(input_path, output_path=None, key_string=None, workers=None, use_mmap=False, progress=None):
     """Decrypts a file using AES-256 and saves it to a specific path.
     
     Args:
@@ -16,6 +48,12 @@ def decrypt_file(input_path, output_path=None, key_string=None):
         output_path (str, optional): Directory to save decrypted file. 
                                      Defaults to Decrypted_files/aes256 relative to base path.
         key_string (str, optional): Decryption key. Prompts if not provided.
+        workers (int, optional): Decrypt chunked-container segments on this many processes.
+        use_mmap (bool, optional): Memory-map the input and a pre-sized output file
+                                   instead of reading the ciphertext into memory.
+                                   Takes precedence over workers.
+        progress (callable, optional): Called with the number of input bytes
+                                       decrypted so far.
     """
     # Resolve base path
     base_path = get_base_path()
@@ -31,12 +69,55 @@ def decrypt_file(input_path, output_path=None, key_string=None):
     # Ensure output directory exists
     os.makedirs(output_path, exist_ok=True)
 
-    # Derive a key from the input string
-    digest = hashes.Hash(hashes.SHA256(), backend=default_backend())
-    digest.update(key_string.encode())
-    key = base64.urlsafe_b64encode(digest.finalize()[:32])
+    fernet = BinaryFernet(derive_key(key_string))
+
+    # Construct the output file path
+    output_file_name = os.path.splitext(os.path.basename(input_path))[0]
+    output_file_path = os.path.join(output_path, output_file_name)
 
-    fernet = Fernet(key)
+    # Compressed plaintext can outgrow the mapped output, so it takes the stream path
+    if use_mmap and not fernet_stream.is_compressed_file(input_path):
+        try:
+            mapped_io.decrypt_mapped(input_path, output_file_path,
+                                     lambda src, out: fernet_stream.decrypt_mapped(fernet, src, out, progress))
+        except InvalidToken:
+            if os.path.exists(output_file_path):
+                os.remove(output_file_path)
+            print(f"Incorrect decryption key for file: {input_path}")
+            return
+        except Exception:
+            # e.g. cancelled between chunks
+            if os.path.exists(output_file_path):
+                os.remove(output_file_path)
+            raise
+        if progress:
+            progress(os.path.getsize(input_path))
+        print(f"Decrypted {input_path} and saved to {output_file_path}")
+        return
+
+    # Chunked container written by encrypt_file(..., stream=True) or (..., binary=True)
+    if is_stream_file(input_path):
+        try:
+            with open(input_path, 'rb') as src, open(output_file_path, 'wb') as dst:
+                if workers and workers > 1:
+                    decrypt_stream_parallel(fernet, src, dst, workers, progress)
+                else:
+                    decrypt_stream(fernet, src, dst, progress=progress)
+        except InvalidToken:
+            # Never leave a partially decrypted file behind
+            if os.path.exists(output_file_path):
+                os.remove(output_file_path)
+            print(f"Incorrect decryption key for file: {input_path}")
+            return
+        except Exception:
+            # e.g. cancelled between chunks
+            if os.path.exists(output_file_path):
+                os.remove(output_file_path)
+            raise
+        if progress:
+            progress(os.path.getsize(input_path))
+        print(f"Decrypted {input_path} and saved to {output_file_path}")
+        return
 
     # Read encrypted file
     with open(input_path, 'rb') as f:
@@ -45,30 +126,21 @@ def decrypt_file(input_path, output_path=None, key_string=None):
     # Decrypt data
     try:
         decrypted_data = fernet.decrypt(encrypted_data)
-    except Exception as e:
-        print(f"Decryption failed: {e}")
+    except InvalidToken:
+        print(f"Incorrect decryption key for file: {input_path}")
         return
 
-    # Construct the output file path
-    output_file_name = os.path.splitext(os.path.basename(input_path))[0]
-    output_file_path = os.path.join(output_path, output_file_name)
-
     # Write decrypted file
     with open(output_file_path, 'wb') as f:
         f.write(decrypted_data)
 
+    if progress:
+        progress(len(encrypted_data))
+
     print(f"Decrypted {input_path} and saved to {output_file_path}")
 
 if __name__ == "__main__":
-    # Use dynamic path resolution
-    base_path = get_base_path()
-    input_path = os.path.join(base_path, 'Encrypted_files', 'aes256')
-    output_path = os.path.join(base_path, 'Decrypted_files', 'aes256')
-    key_string = input("Enter the decryption key: ")
-
-    # Decrypt all files in the input directory
-    for root, dirs, files in os.walk(input_path):
-        for file in files:
-            if file.endswith('.enc'):
-                file_to_decrypt = os.path.join(root, file)
-                decrypt_file(file_to_decrypt, output_path, key_string)
+    # Decrypt everything under Encrypted_files/aes256 in parallel (see Process/batch.py for options)
+    import sys
+    from Process.batch import main
+    sys.exit(main(['decrypt', 'aes256'] + sys.argv[1:]))
@@ -0,0 +1,41 @@
+from Process.Symmetric_algo import aead_stream
+from Process.Symmetric_algo.aead_stream import StreamDecryptor, derive_key, AES256GCM
+
+# AES-256-GCM bindings for the AEAD container in aead_stream.py
+
+def stream_decryptor(key_string):
+    """Return an incremental decryptor (update/finalize) for the AES-256-GCM container."""
+    return StreamDecryptor(AES256GCM, derive_key(key_string))
+
+def decrypt_bytes(data, key_string):
+    """Decrypt an AES-256-GCM container held in memory. Raises InvalidTag on failure."""
+    return aead_stream.decrypt_bytes(AES256GCM, data, key_string)
+
+def decrypt_into(data, out, key_string):
+    """Decrypt a container into the writable buffer out (at least len(data) bytes).
+
+    Returns the plaintext length. If InvalidTag is raised, discard out.
+    """
+    return aead_stream.decrypt_into(AES256GCM, derive_key(key_string), data, out)
+
+def decrypt_range(source, offset, length, key_string):
+    """Decrypt `length` bytes at plaintext `offset` from an AES-256-GCM container.
+
+    source is a path or seekable binary file object; only the segments covering
+    the range are read and authenticated. Raises InvalidTag on failure.
+    """
+    return aead_stream.decrypt_range(AES256GCM, derive_key(key_string), source, offset, length)
+
+def decrypt_file(input_path, output_path=None, key_string=None, progress=None):
+    """Decrypts an AES-256-GCM file and saves it to a specific path.
+
+    Output defaults to Decrypted_files/aes256gcm; see aead_stream.decrypt_file
+    for the arguments.
+    """
+    aead_stream.decrypt_file(AES256GCM, input_path, output_path, key_string, progress)
+
+if __name__ == "__main__":
+    # Decrypt everything under Encrypted_files/aes256gcm in parallel (see Process/batch.py for options)
+    import sys
+    from Process.batch import main
+    sys.exit(main(['decrypt', 'aes256gcm'] + sys.argv[1:]))
@@ -1,23 +1,117 @@
 import os
+import struct
 import warnings
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from cryptography.hazmat.primitives import padding
 import base64
+from Process.parallel_cbc import decrypt_file_ranges
+from Process import cbc_buffer, mapped_io
+from Process.compression import codec_name, decompress_bytes, expand_stream
 
 # Suppress specific deprecation warning
 from cryptography.utils import CryptographyDeprecationWarning
 warnings.filterwarnings("ignore", category=CryptographyDeprecationWarning)
 
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+# Header of compressed output; must match Process/Symmetric_algo/Encryption_algo/blowfish.py
+MAGIC = b'ENCF'
+VERSION = 1
+_HEADER = struct.Struct('>4sBB')
+
 def derive_key(key_string):
     """Derive a key from the input string using SHA-256."""
     digest = hashes.Hash(hashes.SHA256(), backend=default_backend())
     digest.update(key_string.encode())
     return base64.urlsafe_b64encode(digest.finalize()[:32])
 
-def decrypt_file(encrypted_file_path, output_path, key_string):
-    
+def is_compressed(data):
+    """Return True if data (the start of a file) has the header of compressed output."""
+    return bytes(data[:len(MAGIC)]) == MAGIC
+
+def is_compressed_file(file_path):
+    """Return True if the file has the header of compressed output."""
+    with open(file_path, 'rb') as f:
+        return is_compressed(f.read(len(MAGIC)))
+
+class StreamDecryptor:
+    """Incremental Blowfish-CBC decryptor for the .enc layout (IV + body).
+
+    `compression` is the codec id from the header of compressed output (None:
+    not compressed). Raises ValueError from finalize() if the padding is invalid.
+    """
+
+    def __init__(self, key_string):
+        self._key = derive_key(key_string)
+        self._header = bytearray()
+        self._decryptor = None
+        self._unpadder = padding.PKCS7(algorithms.Blowfish.block_size).unpadder()
+        self.compression = None
+
+    def update(self, data):
+        if self._decryptor is None:
+            # Collect the optional header and the 8-byte initialization vector first
+            self._header += data
+            start = _HEADER.size if is_compressed(self._header) else 0
+            if len(self._header) < max(len(MAGIC), start + 8):
+                return b''
+            if start:
+                _, version, compression = _HEADER.unpack_from(self._header)
+                if version != VERSION:
+                    raise ValueError(f"Unsupported Blowfish header version {version}")
+                codec_name(compression)  # rejects unknown codec ids
+                self.compression = compression
+            iv, data = bytes(self._header[start:start + 8]), bytes(self._header[start + 8:])
+            cipher = Cipher(algorithms.Blowfish(self._key), modes.CBC(iv), backend=default_backend())
+            self._decryptor = cipher.decryptor()
+        return self._unpadder.update(self._decryptor.update(data))
+
+    def finalize(self):
+        if self._decryptor is None:
+            raise ValueError("Encrypted data is shorter than the IV")
+        return self._unpadder.update(self._decryptor.finalize()) + self._unpadder.finalize()
+
+def decrypt_into(data, out, key_string, progress=None):
+    """Decrypt an IV + body buffer into the writable buffer out; returns the plaintext length.
+
+    out needs room for len(data) - 9 bytes. progress, if given, is called with
+    the number of bytes of data decrypted so far. Raises ValueError on a wrong
+    key or corrupted data (invalid padding), and for compressed output, whose
+    plaintext may not fit (use StreamDecryptor).
+    """
+    data = memoryview(data)
+    if is_compressed(data):
+        raise ValueError("Compressed file; decrypt it with StreamDecryptor")
+    if len(data) < 8:
+        raise ValueError("Encrypted data is shorter than the IV")
+    cipher = Cipher(algorithms.Blowfish(derive_key(key_string)), modes.CBC(bytes(data[:8])), backend=default_backend())
+    reporting = (lambda done: progress(8 + done)) if progress else None
+    return cbc_buffer.decrypt_into(cipher, data[8:], out, 8, reporting)
+
+def decrypt_bytes(data, key_string):
+    """Decrypt a Blowfish .enc payload held in memory, expanding compressed plaintext."""
+    if is_compressed(data):
+        decryptor = StreamDecryptor(key_string)
+        plaintext = decryptor.update(data) + decryptor.finalize()
+        return decompress_bytes(plaintext, decryptor.compression)
+    out = bytearray(max(0, len(data) - 8))
+    del out[decrypt_into(data, out, key_string):]
+    return bytes(out)
+
+def decrypt_file(encrypted_file_path, output_path, key_string, stream=False, chunk_size=DEFAULT_CHUNK_SIZE, workers=None,
+                 use_mmap=False, progress=None):
+    """Decrypt a Blowfish-CBC file (8-byte IV followed by the PKCS7-padded body).
+
+    With stream=True the body is decrypted and unpadded in chunks straight to
+    the output file instead of being held in memory. With workers=N the body
+    is split at block boundaries and decrypted on N processes. With
+    use_mmap=True the input and a pre-sized output file are memory-mapped and
+    decrypted in place through the page cache. Compressed output is always
+    decrypted and expanded in chunks, whatever the mode. progress, if given,
+    is called with the number of input bytes decrypted so far.
+    """
     if not os.path.exists(encrypted_file_path):
         print(f"File not found: {encrypted_file_path}")
         return
@@ -26,39 +120,67 @@ def decrypt_file(encrypted_file_path, output_path, key_string):
 
     key = derive_key(key_string)
 
-    try:
-        with open(encrypted_file_path, 'rb') as f:
-            iv = f.read(8)  # Read the 8-byte initialization vector
-            encrypted_data = f.read()
+    # Construct the output file path
+    output_file_name = os.path.basename(encrypted_file_path).replace('.enc', '')
+    output_file_path = os.path.join(output_path, output_file_name)
 
-        cipher = Cipher(algorithms.Blowfish(key), modes.CBC(iv), backend=default_backend())
-        decryptor = cipher.decryptor()
-        decrypted_padded_data = decryptor.update(encrypted_data) + decryptor.finalize()
+    compressed = is_compressed_file(encrypted_file_path)
+    partial_output = stream or compressed or (workers and workers > 1)
+    try:
+        if compressed:
+            with open(encrypted_file_path, 'rb') as src, open(output_file_path, 'wb') as dst:
+                expand_stream(StreamDecryptor(key_string), src, dst, chunk_size, progress)
+        elif use_mmap:
+            mapped_io.decrypt_mapped(encrypted_file_path, output_file_path,
+                                     lambda src, out: decrypt_into(src, out, key_string, progress))
+        elif workers and workers > 1:
+            with open(output_file_path, 'wb') as dst:
+                decrypt_file_ranges('Blowfish', key, encrypted_file_path, 8, dst, workers, progress=progress)
+        elif stream:
+            decryptor = StreamDecryptor(key_string)
+            done = 0
+            with open(encrypted_file_path, 'rb') as src, open(output_file_path, 'wb') as dst:
+                while True:
+                    chunk = src.read(chunk_size)
+                    if not chunk:
+                        break
+                    dst.write(decryptor.update(chunk))
+                    done += len(chunk)
+                    if progress:
+                        progress(done)
+                dst.write(decryptor.finalize())
+        else:
+            with open(encrypted_file_path, 'rb') as f:
+                iv = f.read(8)  # Read the 8-byte initialization vector
+                encrypted_data = f.read()
 
-        unpadder = padding.PKCS7(algorithms.Blowfish.block_size).unpadder()
-        decrypted_data = unpadder.update(decrypted_padded_data) + unpadder.finalize()
+            cipher = Cipher(algorithms.Blowfish(key), modes.CBC(iv), backend=default_backend())
+            decryptor = cipher.decryptor()
+            decrypted_padded_data = decryptor.update(encrypted_data) + decryptor.finalize()
 
-        # Construct the output file path
-        output_file_name = os.path.basename(encrypted_file_path).replace('.enc', '')
-        output_file_path = os.path.join(output_path, output_file_name)
+            unpadder = padding.PKCS7(algorithms.Blowfish.block_size).unpadder()
+            decrypted_data = unpadder.update(decrypted_padded_data) + unpadder.finalize()
 
-        with open(output_file_path, 'wb') as f:
-            f.write(decrypted_data)
+            with open(output_file_path, 'wb') as f:
+                f.write(decrypted_data)
 
+        if progress:
+            progress(os.path.getsize(encrypted_file_path))
         print(f"Successfully decrypted {encrypted_file_path} to {output_file_path}")
 
     except ValueError as e:
+        # Bad padding is only detected at the end; drop the partial output
+        if partial_output and os.path.exists(output_file_path):
+            os.remove(output_file_path)
         print(f"Incorrect key or corrupted data for file {encrypted_file_path}: {e}")
-    except Exception as e:
-        print(f"An error occurred during decryption for file {encrypted_file_path}: {e}")
+    except Exception:
+        # e.g. cancelled between chunks
+        if partial_output and os.path.exists(output_file_path):
+            os.remove(output_file_path)
+        raise
 
 if __name__ == "__main__":
-    encrypted_files_path = "D:\\Desktop\\Encryption\\Encrypted_files\\blowfish"
-    output_path = "D:\\Desktop\\Encryption\\Decrypted_files\\blowfish"
-    key_string = input("Enter the decryption key: ")
-
-    for root, dirs, files in os.walk(encrypted_files_path):
-        for file in files:
-            if file.endswith('.enc'):
-                encrypted_file_path = os.path.join(root, file)
-                decrypt_file(encrypted_file_path, output_path, key_string)
+    # Decrypt everything under Encrypted_files/blowfish in parallel (see Process/batch.py for options)
+    import sys
+    from Process.batch import main
+    sys.exit(main(['decrypt', 'blowfish'] + sys.argv[1:]))
@@ -0,0 +1,41 @@
+from Process.Symmetric_algo import aead_stream
+from Process.Symmetric_algo.aead_stream import StreamDecryptor, derive_key, CHACHA20POLY1305
+
+# ChaCha20-Poly1305 bindings for the AEAD container in aead_stream.py
+
+def stream_decryptor(key_string):
+    """Return an incremental decryptor (update/finalize) for the ChaCha20-Poly1305 container."""
+    return StreamDecryptor(CHACHA20POLY1305, derive_key(key_string))
+
+def decrypt_bytes(data, key_string):
+    """Decrypt a ChaCha20-Poly1305 container held in memory. Raises InvalidTag on failure."""
+    return aead_stream.decrypt_bytes(CHACHA20POLY1305, data, key_string)
+
+def decrypt_into(data, out, key_string):
+    """Decrypt a container into the writable buffer out (at least len(data) bytes).
+
+    Returns the plaintext length. If InvalidTag is raised, discard out.
+    """
+    return aead_stream.decrypt_into(CHACHA20POLY1305, derive_key(key_string), data, out)
+
+def decrypt_range(source, offset, length, key_string):
+    """Decrypt `length` bytes at plaintext `offset` from a ChaCha20-Poly1305 container.
+
+    source is a path or seekable binary file object; only the segments covering
+    the range are read and authenticated. Raises InvalidTag on failure.
+    """
+    return aead_stream.decrypt_range(CHACHA20POLY1305, derive_key(key_string), source, offset, length)
+
+def decrypt_file(input_path, output_path=None, key_string=None, progress=None):
+    """Decrypts a ChaCha20-Poly1305 file and saves it to a specific path.
+
+    Output defaults to Decrypted_files/chacha20poly1305; see aead_stream.decrypt_file
+    for the arguments.
+    """
+    aead_stream.decrypt_file(CHACHA20POLY1305, input_path, output_path, key_string, progress)
+
+if __name__ == "__main__":
+    # Decrypt everything under Encrypted_files/chacha20poly1305 in parallel (see Process/batch.py for options)
+    import sys
+    from Process.batch import main
+    sys.exit(main(['decrypt', 'chacha20poly1305'] + sys.argv[1:]))
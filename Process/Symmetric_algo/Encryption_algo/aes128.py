@@ -1,14 +1,65 @@
 import os
-from cryptography.fernet import Fernet
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.backends import default_backend
 import base64
+from Process.compression import compress_bytes, input_stream, resolve
+from Process.Symmetric_algo import fernet_stream
+from Process.Symmetric_algo.fernet_stream import encrypt_stream, encrypt_stream_parallel, StreamEncryptor, SegmentEncryptor, BinaryFernet, DEFAULT_CHUNK_SIZE
 
 def get_base_path():
     """Get the base path for the encryption project."""
     return os.environ.get('ENCRYPTION_BASE_PATH', os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))))
 
-def encrypt_file(file_path, output_path=None, key_string=None):
+def derive_key(key_string):
+    """Derive a Fernet key from the input string using SHA-256."""
+    digest = hashes.Hash(hashes.SHA256(), backend=default_backend())
+    digest.update(key_string.encode())
+    return base64.urlsafe_b64encode(digest.finalize())
+
+def stream_encryptor(key_string, chunk_size=DEFAULT_CHUNK_SIZE, binary=False, compression=None):
+    """Return an incremental encryptor (update/finalize) for the chunked container.
+
+    compression is the codec id of input that is already compressed; the
+    header records it (see Process/compression.CompressingEncryptor).
+    """
+    return StreamEncryptor(BinaryFernet(derive_key(key_string)), chunk_size, binary, compression)
+
+def segment_encryptor(key_string, chunk_size=DEFAULT_CHUNK_SIZE, binary=False):
+    """Return a SegmentEncryptor that builds the chunked container out of order (chunked uploads)."""
+    return SegmentEncryptor(BinaryFernet(derive_key(key_string)), chunk_size, binary)
+
+def encrypt_bytes(data, key_string, binary=False, compression=None):
+    """Encrypt data in memory: a Fernet token, or a binary single token when binary=True.
+
+    compression names a codec (see Process/compression.py) applied before
+    encryption; compressed data is stored in the chunked container, whose
+    header records the codec.
+    """
+    data, compression = compress_bytes(data, compression)
+    fernet = BinaryFernet(derive_key(key_string))
+    if compression is not None:
+        encryptor = StreamEncryptor(fernet, DEFAULT_CHUNK_SIZE, binary, compression)
+        return encryptor.update(data) + encryptor.finalize()
+    if not binary:
+        return fernet.encrypt(data)
+    out = bytearray(fernet_stream.encrypted_size(len(data)))
+    fernet_stream.encrypt_into(fernet, data, out)
+    return bytes(out)
+
+def encrypted_size(length):
+    """Size of the encrypt_into() output for `length` bytes of plaintext."""
+    return fernet_stream.encrypted_size(length)
+
+def encrypt_into(data, out, key_string):
+    """Encrypt data into the writable buffer out (at least encrypted_size(len(data)) bytes).
+
+    Writes a binary single token, which decrypt_file() and decrypt_bytes()
+    read like any other AES-128 file. Returns the number of bytes written.
+    """
+    return fernet_stream.encrypt_into(BinaryFernet(derive_key(key_string)), data, out)
+
+def encrypt_file(file_path, output_path=None, key_string=None, stream=False, chunk_size=DEFAULT_CHUNK_SIZE, workers=None, binary=False,
+                 progress=None, compression=None):
     """Encrypts a file using AES-128 and saves it to a specific path.
     
     Args:
@@ -16,6 +67,17 @@ def encrypt_file(file_path, output_path=None, key_string=None):
         output_path (str, optional): Directory to save encrypted file. 
                                      Defaults to Encrypted_files/aes128 relative to base path.
         key_string (str, optional): Encryption key. Prompts if not provided.
+        stream (bool, optional): Write the chunked container instead of a single
+                                 Fernet token, keeping memory use bounded.
+        chunk_size (int, optional): Plaintext bytes per segment in stream mode.
+        workers (int, optional): Encrypt segments on this many processes (implies stream).
+        binary (bool, optional): Write the binary container (raw tokens, no base64),
+                                 about 25% smaller than base64 output (implies stream).
+        progress (callable, optional): Called with the number of input bytes
+                                       encrypted so far.
+        compression (str, optional): Compress the plaintext first with this codec
+                                     ('zlib', 'lzma', 'zstd' or 'auto'; implies stream).
+                                     Decryption expands it transparently.
     """
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"File not found: {file_path}")
@@ -34,33 +96,44 @@ def encrypt_file(file_path, output_path=None, key_string=None):
     # Ensure output directory exists
     os.makedirs(output_path, exist_ok=True)
 
-    # Derive a 32-byte key from the input string
-    digest = hashes.Hash(hashes.SHA256(), backend=default_backend())
-    digest.update(key_string.encode())
-    key = base64.urlsafe_b64encode(digest.finalize())
+    fernet = BinaryFernet(derive_key(key_string))
+
+    # Construct the output file path
+    output_file_name = os.path.basename(file_path) + '.enc'
+    output_file_path = os.path.join(output_path, output_file_name)
+
+    try:
+        if workers and workers > 1:
+            with open(file_path, 'rb') as src, open(output_file_path, 'wb') as dst:
+                src, reporting, codec = input_stream(src, compression, progress)
+                encrypt_stream_parallel(fernet, src, dst, chunk_size, workers, binary, reporting, codec)
+            return
 
-    fernet = Fernet(key)
+        # Only the chunked container has a header to record the codec in
+        if stream or binary or resolve(compression):
+            with open(file_path, 'rb') as src, open(output_file_path, 'wb') as dst:
+                src, reporting, codec = input_stream(src, compression, progress)
+                encrypt_stream(fernet, src, dst, chunk_size, binary, reporting, codec)
+            return
+    except Exception:
+        # Never leave a partially encrypted file behind (e.g. cancelled between chunks)
+        if os.path.exists(output_file_path):
+            os.remove(output_file_path)
+        raise
 
     with open(file_path, 'rb') as f:
         data = f.read()
 
     encrypted_data = fernet.encrypt(data)
 
-    # Construct the output file path
-    output_file_name = os.path.basename(file_path) + '.enc'
-    output_file_path = os.path.join(output_path, output_file_name)
-
     with open(output_file_path, 'wb') as f:
         f.write(encrypted_data)
 
+    if progress:
+        progress(len(data))
+
 if __name__ == "__main__":
-    # Use dynamic path resolution
-    base_path = get_base_path()
-    file_path = os.path.join(base_path, 'Original_files', 'aes128')
-    output_path = os.path.join(base_path, 'Encrypted_files', 'aes128')
-    key_string = input("Enter the encryption key: ")
-
-    for root, dirs, files in os.walk(file_path):
-        for file in files:
-            file_to_encrypt = os.path.join(root, file)
-            encrypt_file(file_to_encrypt, output_path, key_string)
+    # Encrypt everything under Original_files/aes128 in parallel (see Process/batch.py for options)
+    import sys
+    from Process.batch import main
+    sys.exit(main(['encrypt', 'aes128'] + sys.argv[1:]))
@@ -0,0 +1,45 @@
+from Process.Symmetric_algo import aead_stream
+from Process.Symmetric_algo.aead_stream import StreamEncryptor, SegmentEncryptor, derive_key, AES256GCM, DEFAULT_CHUNK_SIZE
+
+# AES-256-GCM bindings for the AEAD container in aead_stream.py
+
+def stream_encryptor(key_string, chunk_size=DEFAULT_CHUNK_SIZE, compression=None):
+    """Return an incremental encryptor (update/finalize) for the AES-256-GCM container.
+
+    compression is the codec id of input that is already compressed; the
+    header records it (see Process/compression.CompressingEncryptor).
+    """
+    return StreamEncryptor(AES256GCM, derive_key(key_string), chunk_size, compression)
+
+def segment_encryptor(key_string, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Return a SegmentEncryptor that builds the AES-256-GCM container out of order (chunked uploads)."""
+    return SegmentEncryptor(AES256GCM, derive_key(key_string), chunk_size)
+
+def encrypt_bytes(data, key_string, chunk_size=DEFAULT_CHUNK_SIZE, compression=None):
+    """Encrypt data in memory; returns the same container encrypt_file writes."""
+    return aead_stream.encrypt_bytes(AES256GCM, data, key_string, chunk_size, compression)
+
+def encrypted_size(length, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Size of the encrypt_into() output for `length` bytes of plaintext."""
+    return aead_stream.encrypted_size(length, chunk_size)
+
+def encrypt_into(data, out, key_string, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Encrypt data into the writable buffer out (at least encrypted_size(len(data)) bytes).
+
+    Returns the number of bytes written.
+    """
+    return aead_stream.encrypt_into(AES256GCM, derive_key(key_string), data, out, chunk_size)
+
+def encrypt_file(file_path, output_path=None, key_string=None, chunk_size=DEFAULT_CHUNK_SIZE, progress=None, compression=None):
+    """Encrypts a file using AES-256-GCM in a single streaming pass.
+
+    Output defaults to Encrypted_files/aes256gcm; see aead_stream.encrypt_file
+    for the arguments.
+    """
+    aead_stream.encrypt_file(AES256GCM, file_path, output_path, key_string, chunk_size, progress, compression)
+
+if __name__ == "__main__":
+    # Encrypt everything under Original_files/aes256gcm in parallel (see Process/batch.py for options)
+    import sys
+    from Process.batch import main
+    sys.exit(main(['encrypt', 'aes256gcm'] + sys.argv[1:]))
@@ -1,15 +1,28 @@
 import os
+import struct
 import warnings
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from cryptography.hazmat.primitives import padding
 import base64
+from Process import cbc_buffer
+from Process.compression import compress_bytes, input_stream
 
 # Suppress specific deprecation warning
 from cryptography.utils import CryptographyDeprecationWarning
 warnings.filterwarnings("ignore", category=CryptographyDeprecationWarning)
 
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+# Compressed output starts with a header recording the codec (see
+# Process/compression.py): MAGIC | version (1) | codec id (1), followed by the
+# usual IV + body. Uncompressed output keeps the original IV + body layout,
+# and its IV is never allowed to start with MAGIC, so the two cannot be confused.
+MAGIC = b'ENCF'
+VERSION = 1
+_HEADER = struct.Struct('>4sBB')
+
 def get_base_path():
     """Get the base path for the encryption project."""
     return os.environ.get('ENCRYPTION_BASE_PATH', os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))))
@@ -20,7 +33,70 @@ def derive_key(key_string):
     digest.update(key_string.encode())
     return base64.urlsafe_b64encode(digest.finalize()[:32])
 
-def encrypt_file(file_path, output_path=None, key_string=None):
+def _new_iv():
+    """Random 8-byte IV (the Blowfish block size) that cannot be mistaken for the header."""
+    while True:
+        iv = os.urandom(8)
+        if iv[:len(MAGIC)] != MAGIC:
+            return iv
+
+def _header(compression):
+    """Header for output holding plaintext compressed with codec id compression; b'' if None."""
+    return b'' if compression is None else _HEADER.pack(MAGIC, VERSION, compression)
+
+class StreamEncryptor:
+    """Incremental Blowfish-CBC encryptor producing the .enc layout (IV + body).
+
+    compression is the codec id of input that is already compressed; the
+    output then starts with the header recording it.
+    """
+
+    def __init__(self, key_string, compression=None):
+        iv = _new_iv()
+        cipher = Cipher(algorithms.Blowfish(derive_key(key_string)), modes.CBC(iv), backend=default_backend())
+        self._encryptor = cipher.encryptor()
+        self._padder = padding.PKCS7(algorithms.Blowfish.block_size).padder()
+        self._pending = _header(compression) + iv
+
+    def update(self, data):
+        out = self._pending + self._encryptor.update(self._padder.update(data))
+        self._pending = b''
+        return out
+
+    def finalize(self):
+        out = self._pending + self._encryptor.update(self._padder.finalize()) + self._encryptor.finalize()
+        self._pending = b''
+        return out
+
+def encrypted_size(length):
+    """Size of the encrypt_into() output: 8-byte IV plus the padded body."""
+    return 8 + cbc_buffer.padded_size(length, 8)
+
+def encrypt_into(data, out, key_string):
+    """Encrypt data into the writable buffer out (at least encrypted_size(len(data)) bytes).
+
+    Writes the same IV + body layout as encrypt_file; returns the number of bytes written.
+    """
+    out = memoryview(out)
+    if len(out) < encrypted_size(len(data)):
+        raise ValueError(f"Output buffer too small: need {encrypted_size(len(data))} bytes, got {len(out)}")
+    iv = _new_iv()
+    out[:8] = iv
+    cipher = Cipher(algorithms.Blowfish(derive_key(key_string)), modes.CBC(iv), backend=default_backend())
+    return 8 + cbc_buffer.encrypt_into(cipher, data, out[8:], 8)
+
+def encrypt_bytes(data, key_string, compression=None):
+    """Encrypt data in memory; returns the same layout encrypt_file writes."""
+    data, compression = compress_bytes(data, compression)
+    if compression is not None:
+        encryptor = StreamEncryptor(key_string, compression)
+        return encryptor.update(data) + encryptor.finalize()
+    out = bytearray(encrypted_size(len(data)))
+    encrypt_into(data, out, key_string)
+    return bytes(out)
+
+def encrypt_file(file_path, output_path=None, key_string=None, stream=False, chunk_size=DEFAULT_CHUNK_SIZE, progress=None,
+                 compression=None):
     """Encrypt a file using Blowfish algorithm.
     
     Args:
@@ -28,6 +104,13 @@ def encrypt_file(file_path, output_path=None, key_string=None):
         output_path (str, optional): Directory to save encrypted file. 
                                      Defaults to Encrypted_files/blowfish relative to base path.
         key_string (str, optional): Encryption key. Prompts if not provided.
+        stream (bool, optional): Pad and encrypt in chunks straight to the output
+                                 file. The output is identical either way.
+        chunk_size (int, optional): Bytes read per chunk in stream mode.
+        progress (callable, optional): Called with the number of input bytes
+                                       encrypted so far.
+        compression (str, optional): Compress the plaintext first with this codec
+                                     ('zlib', 'lzma', 'zstd' or 'auto').
     """
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"File not found: {file_path}")
@@ -46,42 +129,63 @@ def encrypt_file(file_path, output_path=None, key_string=None):
     # Ensure output directory exists
     os.makedirs(output_path, exist_ok=True)
 
+    # Construct output file path
+    output_file_name = os.path.basename(file_path) + '.enc'
+    output_file_path = os.path.join(output_path, output_file_name)
+
+    if stream:
+        done = 0
+        try:
+            with open(file_path, 'rb') as src, open(output_file_path, 'wb') as dst:
+                src, progress, codec = input_stream(src, compression, progress)
+                encryptor = StreamEncryptor(key_string, codec)
+                while True:
+                    chunk = src.read(chunk_size)
+                    if not chunk:
+                        break
+                    dst.write(encryptor.update(chunk))
+                    done += len(chunk)
+                    if progress:
+                        progress(done)
+                dst.write(encryptor.finalize())
+        except Exception:
+            # Never leave a partially encrypted file behind (e.g. cancelled between chunks)
+            if os.path.exists(output_file_path):
+                os.remove(output_file_path)
+            raise
+        return
+
     # Derive key
     key = derive_key(key_string)
 
-    # Read file
-    with open(file_path, 'rb') as f:
-        data = f.read()
-
     # Prepare cipher
-    iv = os.urandom(8)  # Blowfish block size is 8 bytes
+    iv = _new_iv()
     cipher = Cipher(algorithms.Blowfish(key), modes.CBC(iv), backend=default_backend())
     encryptor = cipher.encryptor()
+    padder = padding.PKCS7(algorithms.Blowfish.block_size).padder()
+
+    # Read file
+    with open(file_path, 'rb') as f:
+        data = f.read()
 
     # Pad data
-    padder = padding.PKCS7(algorithms.Blowfish.block_size).padder()
-    padded_data = padder.update(data) + padder.finalize()
+    plaintext, codec = compress_bytes(data, compression)
+    padded_data = padder.update(plaintext) + padder.finalize()
 
     # Encrypt
     encrypted_data = encryptor.update(padded_data) + encryptor.finalize()
 
-    # Construct output file path
-    output_file_name = os.path.basename(file_path) + '.enc'
-    output_file_path = os.path.join(output_path, output_file_name)
-
     # Write encrypted file with IV
     with open(output_file_path, 'wb') as f:
+        f.write(_header(codec))
         f.write(iv)  # Write IV first
         f.write(encrypted_data)
 
+    if progress:
+        progress(len(data))
+
 if __name__ == "__main__":
-    # Use dynamic path resolution
-    base_path = get_base_path()
-    files_path = os.path.join(base_path, 'Original_files', 'blowfish')
-    output_path = os.path.join(base_path, 'Encrypted_files', 'blowfish')
-    key_string = input("Enter the encryption key: ")
-
-    for root, dirs, files in os.walk(files_path):
-        for file in files:
-            file_to_encrypt = os.path.join(root, file)
-            encrypt_file(file_to_encrypt, output_path, key_string)
+    # Encrypt everything under Original_files/blowfish in parallel (see Process/batch.py for options)
+    import sys
+    from Process.batch import main
+    sys.exit(main(['encrypt', 'blowfish'] + sys.argv[1:]))
@@ -0,0 +1,45 @@
+from Process.Symmetric_algo import aead_stream
+from Process.Symmetric_algo.aead_stream import StreamEncryptor, SegmentEncryptor, derive_key, CHACHA20POLY1305, DEFAULT_CHUNK_SIZE
+
+# ChaCha20-Poly1305 bindings for the AEAD container in aead_stream.py
+
+def stream_encryptor(key_string, chunk_size=DEFAULT_CHUNK_SIZE, compression=None):
+    """Return an incremental encryptor (update/finalize) for the ChaCha20-Poly1305 container.
+
+    compression is the codec id of input that is already compressed; the
+    header records it (see Process/compression.CompressingEncryptor).
+    """
+    return StreamEncryptor(CHACHA20POLY1305, derive_key(key_string), chunk_size, compression)
+
+def segment_encryptor(key_string, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Return a SegmentEncryptor that builds the ChaCha20-Poly1305 container out of order (chunked uploads)."""
+    return SegmentEncryptor(CHACHA20POLY1305, derive_key(key_string), chunk_size)
+
+def encrypt_bytes(data, key_string, chunk_size=DEFAULT_CHUNK_SIZE, compression=None):
+    """Encrypt data in memory; returns the same container encrypt_file writes."""
+    return aead_stream.encrypt_bytes(CHACHA20POLY1305, data, key_string, chunk_size, compression)
+
+def encrypted_size(length, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Size of the encrypt_into() output for `length` bytes of plaintext."""
+    return aead_stream.encrypted_size(length, chunk_size)
+
+def encrypt_into(data, out, key_string, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Encrypt data into the writable buffer out (at least encrypted_size(len(data)) bytes).
+
+    Returns the number of bytes written.
+    """
+    return aead_stream.encrypt_into(CHACHA20POLY1305, derive_key(key_string), data, out, chunk_size)
+
+def encrypt_file(file_path, output_path=None, key_string=None, chunk_size=DEFAULT_CHUNK_SIZE, progress=None, compression=None):
+    """Encrypts a file using ChaCha20-Poly1305 in a single streaming pass.
+
+    Output defaults to Encrypted_files/chacha20poly1305; see aead_stream.encrypt_file
+    for the arguments.
+    """
+    aead_stream.encrypt_file(CHACHA20POLY1305, file_path, output_path, key_string, chunk_size, progress, compression)
+
+if __name__ == "__main__":
+    # Encrypt everything under Original_files/chacha20poly1305 in parallel (see Process/batch.py for options)
+    import sys
+    from Process.batch import main
+    sys.exit(main(['encrypt', 'chacha20poly1305'] + sys.argv[1:]))
@@ -0,0 +1,449 @@
+import os
+import struct
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM, ChaCha20Poly1305
+from cryptography.hazmat.backends import default_backend
+from Process.compression import compress_bytes, decompress_bytes, input_stream, expand_stream
+
+# Segmented single-pass AEAD container for the aes256gcm and chacha20poly1305
+# algorithms (the STREAM construction). Everything is keyed by the algorithm
+# id stored in the header; the per-algorithm modules are thin bindings.
+#
+# Layout: MAGIC | version (1) | algorithm id (1) | chunk_size (u32) | salt (16)
+# | nonce prefix (7), followed by the raw segments: chunk_size bytes of
+# ciphertext + 16-byte tag each, the last one shorter. A per-file key is
+# derived from the master key and salt with HKDF, and segment i uses nonce
+# prefix || i (u32) || last flag, with the header as associated data. That
+# authenticates segment order and the end of the stream without any
+# per-segment framing, so the output is plaintext size + 33 + 16 per segment.
+#
+# Compressed plaintext is written as version 2, whose header ends with one
+# more byte: the codec id (see Process/compression.py). Being part of the
+# header, it is authenticated with every segment.
+
+MAGIC = b'ENCA'
+VERSION = 1
+COMPRESSED_VERSION = 2
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+TAG_SIZE = 16
+
+AES256GCM = 1
+CHACHA20POLY1305 = 2
+_CIPHERS = {AES256GCM: AESGCM, CHACHA20POLY1305: ChaCha20Poly1305}
+
+_HEADER = struct.Struct('>4sBBI16s7s')
+_COMPRESSED_HEADER = struct.Struct('>4sBBI16s7sB')
+_NONCE_SUFFIX = struct.Struct('>I?')
+
+
+def is_stream_file(file_path):
+    """Return True if the file starts with the AEAD container magic."""
+    with open(file_path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def is_compressed(data):
+    """Return True if data (the start of a container) has a compressed-plaintext header."""
+    return bytes(data[:len(MAGIC) + 1]) == MAGIC + bytes([COMPRESSED_VERSION])
+
+
+def _file_cipher(algorithm_id, master_key, salt):
+    file_key = HKDF(algorithm=hashes.SHA256(), length=32, salt=salt,
+                    info=MAGIC + bytes([algorithm_id]), backend=default_backend()).derive(master_key)
+    return _CIPHERS[algorithm_id](file_key)
+
+
+class StreamEncryptor:
+    """Incremental encryptor for the AEAD container.
+
+    update() returns ready container bytes; finalize() emits the last segment.
+    At most two chunks of plaintext are buffered. compression is the codec id
+    the plaintext was compressed with, recorded in the header (None: not
+    compressed).
+    """
+
+    def __init__(self, algorithm_id, master_key, chunk_size=DEFAULT_CHUNK_SIZE, compression=None):
+        if not 0 < chunk_size <= MAX_CHUNK_SIZE:
+            raise ValueError(f"chunk_size must be between 1 and {MAX_CHUNK_SIZE}")
+        salt = os.urandom(16)
+        self._nonce_prefix = os.urandom(7)
+        if compression is None:
+            self._header = _HEADER.pack(MAGIC, VERSION, algorithm_id, chunk_size, salt, self._nonce_prefix)
+        else:
+            self._header = _COMPRESSED_HEADER.pack(MAGIC, COMPRESSED_VERSION, algorithm_id, chunk_size, salt,
+                                                   self._nonce_prefix, compression)
+        self._cipher = _file_cipher(algorithm_id, master_key, salt)
+        self._chunk_size = chunk_size
+        self._index = 0
+        self._buffer = bytearray()
+        self._pending = self._header
+
+    def _segment(self, chunk, last):
+        nonce = self._nonce_prefix + _NONCE_SUFFIX.pack(self._index, last)
+        self._index += 1
+        return self._cipher.encrypt(nonce, chunk, self._header)
+
+    def _segment_into(self, chunk, last, out):
+        nonce = self._nonce_prefix + _NONCE_SUFFIX.pack(self._index, last)
+        self._index += 1
+        return self._cipher.encrypt_into(nonce, chunk, self._header, out)
+
+    def update(self, data):
+        self._buffer += data
+        out = [self._pending]
+        self._pending = b''
+        # Hold back the last chunk until we know whether it is the final one
+        while len(self._buffer) > self._chunk_size:
+            out.append(self._segment(bytes(self._buffer[:self._chunk_size]), False))
+            del self._buffer[:self._chunk_size]
+        return b''.join(out)
+
+    def finalize(self):
+        out = self._pending + self._segment(bytes(self._buffer), True)
+        self._pending = b''
+        self._buffer = bytearray()
+        return out
+
+
+class SegmentEncryptor:
+    """Encrypts the segments of one container independently, in any order.
+
+    For uploads whose chunks arrive out of order: with the plaintext size
+    known up front, each segment's index and last flag are known, and
+    offset(index) is where it belongs. The header at offset 0 plus every
+    segment(index, last, chunk) at its offset is the same container
+    StreamEncryptor writes. A (index, last) pair must never be encrypted
+    twice with different plaintext, as it fixes the nonce.
+    """
+
+    def __init__(self, algorithm_id, master_key, chunk_size=DEFAULT_CHUNK_SIZE):
+        if not 0 < chunk_size <= MAX_CHUNK_SIZE:
+            raise ValueError(f"chunk_size must be between 1 and {MAX_CHUNK_SIZE}")
+        salt = os.urandom(16)
+        self._nonce_prefix = os.urandom(7)
+        self._cipher = _file_cipher(algorithm_id, master_key, salt)
+        self.chunk_size = chunk_size
+        self.header = _HEADER.pack(MAGIC, VERSION, algorithm_id, chunk_size, salt, self._nonce_prefix)
+
+    def offset(self, index):
+        return _HEADER.size + index * (self.chunk_size + TAG_SIZE)
+
+    def segment(self, index, last, chunk):
+        return self._cipher.encrypt(self._nonce_prefix + _NONCE_SUFFIX.pack(index, last), chunk, self.header)
+
+
+class StreamDecryptor:
+    """Incremental decryptor for the AEAD container.
+
+    Raises InvalidTag if a segment fails authentication (wrong key, tampering,
+    reordering) and, from finalize(), if the stream was truncated. Once the
+    header is read, `compression` is its codec id (None: not compressed).
+    """
+
+    def __init__(self, algorithm_id, master_key):
+        self._algorithm_id = algorithm_id
+        self._master_key = master_key
+        self._buffer = bytearray()
+        self._header = None
+        self.compression = None
+        self._nonce_prefix = None
+        self._cipher = None
+        self._segment_size = None
+        self._index = 0
+
+    def _segment(self, data, last):
+        nonce = self._nonce_prefix + _NONCE_SUFFIX.pack(self._index, last)
+        self._index += 1
+        return self._cipher.decrypt(nonce, data, self._header)
+
+    def _segment_into(self, data, last, out):
+        nonce = self._nonce_prefix + _NONCE_SUFFIX.pack(self._index, last)
+        self._index += 1
+        return self._cipher.decrypt_into(nonce, data, self._header, out)
+
+    def update(self, data):
+        self._buffer += data
+        if self._header is None:
+            if len(self._buffer) <= len(MAGIC):
+                return b''
+            header = _COMPRESSED_HEADER if self._buffer[len(MAGIC)] == COMPRESSED_VERSION else _HEADER
+            if len(self._buffer) < header.size:
+                return b''
+            magic, version, algorithm_id, chunk_size, salt, nonce_prefix, *compression = header.unpack_from(self._buffer)
+            if magic != MAGIC or version not in (VERSION, COMPRESSED_VERSION) or algorithm_id != self._algorithm_id:
+                raise InvalidTag
+            if not 0 < chunk_size <= MAX_CHUNK_SIZE:
+                raise InvalidTag
+            self._header = bytes(self._buffer[:header.size])
+            self._nonce_prefix = nonce_prefix
+            self._segment_size = chunk_size + TAG_SIZE
+            self._cipher = _file_cipher(algorithm_id, self._master_key, salt)
+            self.compression = compression[0] if compression else None
+            del self._buffer[:header.size]
+
+        out = []
+        # A full segment is only known not to be the last once more data follows it
+        while len(self._buffer) > self._segment_size:
+            out.append(self._segment(bytes(self._buffer[:self._segment_size]), False))
+            del self._buffer[:self._segment_size]
+        return b''.join(out)
+
+    def finalize(self):
+        if self._header is None or len(self._buffer) < TAG_SIZE:
+            raise InvalidTag
+        out = self._segment(bytes(self._buffer), True)
+        self._buffer = bytearray()
+        return out
+
+
+def encrypted_size(length, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Exact container size for `length` bytes of plaintext."""
+    return _HEADER.size + length + max(1, -(-length // chunk_size)) * TAG_SIZE
+
+
+def encrypt_into(algorithm_id, master_key, data, out, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Encrypt data into the writable buffer out, each segment in place; returns the container size."""
+    data = memoryview(data)
+    out = memoryview(out)
+    size = encrypted_size(len(data), chunk_size)
+    if len(out) < size:
+        raise ValueError(f"Output buffer too small: need {size} bytes, got {len(out)}")
+    encryptor = StreamEncryptor(algorithm_id, master_key, chunk_size)
+    out[:_HEADER.size] = encryptor._header
+    position = _HEADER.size
+    count = max(1, -(-len(data) // chunk_size))
+    for index in range(count):
+        chunk = data[index * chunk_size:(index + 1) * chunk_size]
+        end = position + len(chunk) + TAG_SIZE
+        position += encryptor._segment_into(chunk, index == count - 1, out[position:end])
+    return position
+
+
+def decrypt_into(algorithm_id, master_key, data, out):
+    """Decrypt a whole container into the writable buffer out; returns the plaintext length.
+
+    out needs room for len(data) bytes. Raises InvalidTag on any failure, in
+    which case the contents of out must be discarded, and ValueError for
+    containers of compressed plaintext, whose size is not bounded by the
+    input (decrypt_bytes expands those).
+    """
+    data = memoryview(data)
+    out = memoryview(out)
+    if is_compressed(data):
+        raise ValueError("Compressed container; its plaintext does not fit a buffer of the input size")
+    if len(out) < len(data):
+        raise ValueError(f"Output buffer too small: need {len(data)} bytes, got {len(out)}")
+    decryptor = StreamDecryptor(algorithm_id, master_key)
+    decryptor.update(data[:_HEADER.size])
+    if decryptor._header is None:
+        raise InvalidTag
+    body = data[_HEADER.size:]
+    count = max(1, -(-len(body) // decryptor._segment_size))
+    written = 0
+    for index in range(count):
+        segment = body[index * decryptor._segment_size:(index + 1) * decryptor._segment_size]
+        if len(segment) < TAG_SIZE:
+            raise InvalidTag
+        end = written + len(segment) - TAG_SIZE
+        written += decryptor._segment_into(segment, index == count - 1, out[written:end])
+    return written
+
+
+def decrypt_range(algorithm_id, master_key, source, offset, length):
+    """Decrypt `length` plaintext bytes starting at `offset` without reading the rest of the file.
+
+    source is a path or a seekable binary file object. Segments have a fixed
+    size, so the ones covering the range are located from the header alone
+    and only those are read and authenticated: the cost is O(range), not
+    O(file). Reads past the end return fewer bytes. Raises InvalidTag if a
+    covering segment fails authentication or the file was truncated, and
+    ValueError for compressed files, whose offsets do not match the original
+    data.
+    """
+    if offset < 0 or length < 0:
+        raise ValueError("offset and length must not be negative")
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as src:
+            return decrypt_range(algorithm_id, master_key, src, offset, length)
+
+    source.seek(0)
+    head = source.read(_HEADER.size)
+    if is_compressed(head):
+        raise ValueError("Compressed file; its plaintext offsets cannot be read as ranges")
+    decryptor = StreamDecryptor(algorithm_id, master_key)
+    decryptor.update(head)
+    if decryptor._header is None:
+        raise InvalidTag
+    body = source.seek(0, os.SEEK_END) - _HEADER.size
+    segment_size = decryptor._segment_size
+    chunk_size = segment_size - TAG_SIZE
+    count = max(1, -(-body // segment_size))
+    size = body - count * TAG_SIZE
+    if size < (count - 1) * chunk_size:
+        raise InvalidTag  # last segment shorter than a tag
+
+    def read_segment(index):
+        source.seek(_HEADER.size + index * segment_size)
+        decryptor._index = index
+        return decryptor._segment(source.read(segment_size), index == count - 1)
+
+    end = min(offset + length, size)
+    if offset >= end:
+        return b''
+    first = offset // chunk_size
+    out = [read_segment(index) for index in range(first, (end - 1) // chunk_size + 1)]
+    start = offset - first * chunk_size
+    return b''.join(out)[start:start + end - offset]
+
+
+def pipe(cipher, src, dst, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """Feed file object src through an incremental encryptor or decryptor into dst.
+
+    progress, if given, is called with the number of input bytes processed so far.
+    """
+    done = 0
+    while True:
+        chunk = src.read(chunk_size)
+        if not chunk:
+            break
+        dst.write(cipher.update(chunk))
+        done += len(chunk)
+        if progress:
+            progress(done)
+    dst.write(cipher.finalize())
+
+
+# File and in-memory API shared by the aes256gcm and chacha20poly1305 modules,
+# which only bind their algorithm id. Default folders are named after it.
+
+NAMES = {AES256GCM: 'aes256gcm', CHACHA20POLY1305: 'chacha20poly1305'}
+
+
+def get_base_path():
+    """Get the base path for the encryption project."""
+    return os.environ.get('ENCRYPTION_BASE_PATH', os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+
+def derive_key(key_string):
+    """Derive a 32-byte key from the input string using SHA-256."""
+    digest = hashes.Hash(hashes.SHA256(), backend=default_backend())
+    digest.update(key_string.encode())
+    return digest.finalize()
+
+
+def encrypt_bytes(algorithm_id, data, key_string, chunk_size=DEFAULT_CHUNK_SIZE, compression=None):
+    """Encrypt data in memory; returns the same container encrypt_file writes."""
+    data, codec = compress_bytes(data, compression)
+    if codec is not None:
+        encryptor = StreamEncryptor(algorithm_id, derive_key(key_string), chunk_size, codec)
+        return encryptor.update(data) + encryptor.finalize()
+    out = bytearray(encrypted_size(len(data), chunk_size))
+    encrypt_into(algorithm_id, derive_key(key_string), data, out, chunk_size)
+    return bytes(out)
+
+
+def decrypt_bytes(algorithm_id, data, key_string):
+    """Decrypt a container held in memory, expanding compressed plaintext. Raises InvalidTag on failure."""
+    if is_compressed(data):
+        decryptor = StreamDecryptor(algorithm_id, derive_key(key_string))
+        return decompress_bytes(decryptor.update(data) + decryptor.finalize(), decryptor.compression)
+    out = bytearray(len(data))
+    del out[decrypt_into(algorithm_id, derive_key(key_string), data, out):]
+    return bytes(out)
+
+
+def encrypt_file(algorithm_id, file_path, output_path=None, key_string=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                 progress=None, compression=None):
+    """Encrypts a file into the AEAD container in a single streaming pass.
+
+    Args:
+        algorithm_id (int): AES256GCM or CHACHA20POLY1305
+        file_path (str): Path to the file to encrypt
+        output_path (str, optional): Directory to save encrypted file.
+                                     Defaults to Encrypted_files/<algorithm> relative to base path.
+        key_string (str, optional): Encryption key. Prompts if not provided.
+        chunk_size (int, optional): Plaintext bytes per authenticated segment.
+        progress (callable, optional): Called with the number of input bytes
+                                       encrypted so far.
+        compression (str, optional): Compress the plaintext first with this codec
+                                     ('zlib', 'lzma', 'zstd' or 'auto').
+    """
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"File not found: {file_path}")
+
+    # If no output path provided, use default
+    if output_path is None:
+        output_path = os.path.join(get_base_path(), 'Encrypted_files', NAMES[algorithm_id])
+
+    # If no key provided, prompt user
+    if key_string is None:
+        key_string = input("Enter the encryption key: ")
+
+    # Ensure output directory exists
+    os.makedirs(output_path, exist_ok=True)
+
+    # Construct the output file path
+    output_file_name = os.path.basename(file_path) + '.enc'
+    output_file_path = os.path.join(output_path, output_file_name)
+
+    try:
+        with open(file_path, 'rb') as src, open(output_file_path, 'wb') as dst:
+            src, reporting, codec = input_stream(src, compression, progress)
+            encryptor = StreamEncryptor(algorithm_id, derive_key(key_string), chunk_size, codec)
+            pipe(encryptor, src, dst, chunk_size, reporting)
+    except Exception:
+        # Never leave a partially encrypted file behind (e.g. cancelled between chunks)
+        if os.path.exists(output_file_path):
+            os.remove(output_file_path)
+        raise
+
+
+def decrypt_file(algorithm_id, input_path, output_path=None, key_string=None, progress=None):
+    """Decrypts an AEAD container file and saves it to a specific path.
+
+    Args:
+        algorithm_id (int): AES256GCM or CHACHA20POLY1305
+        input_path (str): Path to the encrypted file
+        output_path (str, optional): Directory to save decrypted file.
+                                     Defaults to Decrypted_files/<algorithm> relative to base path.
+        key_string (str, optional): Decryption key. Prompts if not provided.
+        progress (callable, optional): Called with the number of input bytes
+                                       decrypted so far.
+    """
+    if not os.path.exists(input_path):
+        raise FileNotFoundError(f"File not found: {input_path}")
+
+    # If no output path provided, use default
+    if output_path is None:
+        output_path = os.path.join(get_base_path(), 'Decrypted_files', NAMES[algorithm_id])
+
+    # If no key provided, prompt user
+    if key_string is None:
+        key_string = input("Enter the decryption key: ")
+
+    # Ensure output directory exists
+    os.makedirs(output_path, exist_ok=True)
+
+    # Construct the output file path
+    output_file_name = os.path.splitext(os.path.basename(input_path))[0]
+    output_file_path = os.path.join(output_path, output_file_name)
+
+    try:
+        with open(input_path, 'rb') as src, open(output_file_path, 'wb') as dst:
+            expand_stream(StreamDecryptor(algorithm_id, derive_key(key_string)), src, dst, DEFAULT_CHUNK_SIZE, progress)
+    except InvalidTag:
+        # Never leave a partially decrypted file behind
+        if os.path.exists(output_file_path):
+            os.remove(output_file_path)
+        print(f"Incorrect key or corrupted data for file: {input_path}")
+        return
+    except Exception:
+        # e.g. cancelled between chunks
+        if os.path.exists(output_file_path):
+            os.remove(output_file_path)
+        raise
+
+    print(f"Decrypted {input_path} and saved to {output_file_path}")
@@ -0,0 +1,797 @@
+import os
+import time
+import base64
+import shutil
+import struct
+import argparse
+from collections import deque
+from cryptography.exceptions import InvalidSignature
+from cryptography.fernet import Fernet, InvalidToken
+from cryptography.hazmat.primitives import hashes, hmac, padding
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.backends import default_backend
+from Process import cbc_buffer, worker_pool
+from Process.compression import Decompressor, expand_stream
+
+# Chunked Fernet container used by the aes128/aes256 streaming mode.
+#
+# Layout: MAGIC | version (1) | chunk_size (u32) | stream_id (16), followed by
+# records of u32 token length + Fernet token. Each token's plaintext starts
+# with the stream id, the segment index and a final flag, so segments cannot
+# be reordered, spliced in from another file or silently dropped at the end.
+#
+# Segments are independent (own IV and HMAC), so the *_parallel functions
+# encrypt and decrypt them on a process pool and still produce the same format.
+#
+# The binary variant (BINARY_MAGIC) has the same layout, but each record holds
+# the raw token bytes (version | timestamp | IV | ciphertext | HMAC) instead
+# of their URL-safe base64, which is a third smaller and skips the base64
+# pass on both sides. A binary header with chunk_size 0 is followed by one
+# unsegmented raw token (no record length), which is how single-token files
+# are stored after conversion.
+#
+# Compressed plaintext is stored in a chunked container with version 2. The
+# final flag is then a flags byte, final | codec id << 1 (see
+# Process/compression.py), so the codec is authenticated in every segment;
+# the version only says to expect it. Single tokens are never compressed.
+
+MAGIC = b'ENCS'
+BINARY_MAGIC = b'ENCB'
+VERSION = 1
+COMPRESSED_VERSION = 2
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+_HEADER = struct.Struct('>4sBI16s')
+_RECORD_LEN = struct.Struct('>I')
+_SEGMENT_PREFIX = struct.Struct('>16sQB')
+
+# version + timestamp + IV + HMAC around the padded ciphertext
+_TOKEN_OVERHEAD = 1 + 8 + 16 + 32
+
+
+class BinaryFernet(Fernet):
+    """Fernet that can also write and read tokens as raw bytes.
+
+    encrypt_raw()/decrypt_raw() produce and accept exactly the bytes a normal
+    token base64-encodes, so the two forms convert without the key.
+    """
+
+    def __init__(self, key):
+        super().__init__(key)
+        key = base64.urlsafe_b64decode(key)
+        self._raw_signing_key = key[:16]
+        self._raw_encryption_key = key[16:]
+
+    def _mac(self):
+        return hmac.HMAC(self._raw_signing_key, hashes.SHA256(), backend=default_backend())
+
+    def encrypt_raw(self, data):
+        iv = os.urandom(16)
+        padder = padding.PKCS7(128).padder()
+        encryptor = Cipher(algorithms.AES(self._raw_encryption_key), modes.CBC(iv), backend=default_backend()).encryptor()
+        parts = (b'\x80' + int(time.time()).to_bytes(8, 'big') + iv
+                 + encryptor.update(padder.update(data) + padder.finalize()) + encryptor.finalize())
+        mac = self._mac()
+        mac.update(parts)
+        return parts + mac.finalize()
+
+    def decrypt_raw(self, token):
+        if len(token) < _TOKEN_OVERHEAD + 16 or token[0] != 0x80 or (len(token) - _TOKEN_OVERHEAD) % 16:
+            raise InvalidToken
+        mac = self._mac()
+        mac.update(memoryview(token)[:-32])
+        try:
+            mac.verify(token[-32:])
+        except InvalidSignature:
+            raise InvalidToken
+        decryptor = Cipher(algorithms.AES(self._raw_encryption_key), modes.CBC(token[9:25]), backend=default_backend()).decryptor()
+        unpadder = padding.PKCS7(128).unpadder()
+        try:
+            return unpadder.update(decryptor.update(memoryview(token)[25:-32]) + decryptor.finalize()) + unpadder.finalize()
+        except ValueError:
+            raise InvalidToken
+
+    def encrypt_raw_into(self, data, out):
+        """Write the raw token for data into out; returns its length."""
+        out = memoryview(out)
+        iv = os.urandom(16)
+        if len(out) < 25:
+            raise ValueError("Output buffer too small")
+        out[:25] = b'\x80' + int(time.time()).to_bytes(8, 'big') + iv
+        cipher = Cipher(algorithms.AES(self._raw_encryption_key), modes.CBC(iv), backend=default_backend())
+        end = 25 + cbc_buffer.encrypt_into(cipher, data, out[25:], 16)
+        if len(out) < end + 32:
+            raise ValueError("Output buffer too small")
+        mac = self._mac()
+        mac.update(out[:end])
+        out[end:end + 32] = mac.finalize()
+        return end + 32
+
+    def decrypt_raw_into(self, token, out):
+        """Verify a raw token and write its plaintext into out; returns the plaintext length."""
+        token = memoryview(token)
+        if len(token) < _TOKEN_OVERHEAD + 16 or token[0] != 0x80 or (len(token) - _TOKEN_OVERHEAD) % 16:
+            raise InvalidToken
+        mac = self._mac()
+        mac.update(token[:-32])
+        try:
+            mac.verify(bytes(token[-32:]))
+        except InvalidSignature:
+            raise InvalidToken
+        cipher = Cipher(algorithms.AES(self._raw_encryption_key), modes.CBC(bytes(token[9:25])), backend=default_backend())
+        try:
+            return cbc_buffer.decrypt_into(cipher, token[25:-32], out, 16)
+        except ValueError:
+            raise InvalidToken
+
+    def decrypt_raw_pieces(self, pieces, raw_length, out, progress=None):
+        """Verify a raw token given as (progress value, bytes) pieces and decrypt it into out.
+
+        Each piece is MACed and decrypted from the same bytes, so a source
+        changed while it is read cannot slip unauthenticated bytes into out.
+        The tag is checked at the end; on failure out holds garbage and
+        InvalidToken is raised. Returns the plaintext length.
+        """
+        if raw_length < _TOKEN_OVERHEAD + 16 or (raw_length - _TOKEN_OVERHEAD) % 16:
+            raise InvalidToken
+        if len(out) < raw_length - _TOKEN_OVERHEAD + 15:
+            raise ValueError("Output buffer too small")
+        mac_end = raw_length - 32
+
+        mac = self._mac()
+        decryptor = None
+        tag = bytearray()
+        out = memoryview(out)
+        written = 0
+        position = 0
+        for done, piece in pieces:
+            if decryptor is None:
+                if piece[0] != 0x80:
+                    raise InvalidToken
+                decryptor = Cipher(algorithms.AES(self._raw_encryption_key), modes.CBC(piece[9:25]),
+                                   backend=default_backend()).decryptor()
+            take = max(0, min(len(piece), mac_end - position))
+            mac.update(piece[:take])
+            tag += piece[take:]
+            start = max(0, 25 - position)
+            if start < take:
+                written += decryptor.update_into(piece[start:take], out[written:])
+            position += len(piece)
+            if progress:
+                progress(done)
+        if position != raw_length:
+            raise InvalidToken
+        decryptor.finalize()
+        try:
+            mac.verify(bytes(tag))
+        except InvalidSignature:
+            raise InvalidToken
+
+        pad = out[written - 1]
+        if not 1 <= pad <= 16 or out[written - pad:written] != bytes([pad]) * pad:
+            raise InvalidToken
+        return written - pad
+
+
+def _encrypt_token(fernet, data, binary):
+    if not binary:
+        return fernet.encrypt(data)
+    if isinstance(fernet, BinaryFernet):
+        return fernet.encrypt_raw(data)
+    return base64.urlsafe_b64decode(fernet.encrypt(data))
+
+
+def _decrypt_token(fernet, token, binary):
+    if not binary:
+        return fernet.decrypt(token)
+    if isinstance(fernet, BinaryFernet):
+        return fernet.decrypt_raw(token)
+    return fernet.decrypt(base64.urlsafe_b64encode(token))
+
+
+def is_stream_file(file_path):
+    """Return True if the file starts with a (base64 or binary) container magic."""
+    with open(file_path, 'rb') as f:
+        return f.read(len(MAGIC)) in (MAGIC, BINARY_MAGIC)
+
+
+def is_compressed(data):
+    """Return True if data (the start of a file) is a container of compressed plaintext."""
+    return bytes(data[:len(MAGIC)]) in (MAGIC, BINARY_MAGIC) and bytes(data[len(MAGIC):len(MAGIC) + 1]) == bytes([COMPRESSED_VERSION])
+
+
+def is_compressed_file(file_path):
+    """Return True if the file is a container of compressed plaintext."""
+    with open(file_path, 'rb') as f:
+        return is_compressed(f.read(len(MAGIC) + 1))
+
+
+def _flags(final, compression):
+    return int(final) | (compression or 0) << 1
+
+
+def _segment_compression(flags, version):
+    """Codec id in a segment's flags; InvalidToken if it does not match the header version."""
+    compression = flags >> 1 or None
+    if (compression is not None) != (version == COMPRESSED_VERSION):
+        raise InvalidToken
+    return compression
+
+
+def max_token_size(chunk_size, binary=False):
+    """Upper bound on the size of a Fernet token for one segment."""
+    # plus at most one block of padding
+    raw = _TOKEN_OVERHEAD + _SEGMENT_PREFIX.size + chunk_size + 16
+    return raw if binary else 4 * ((raw + 2) // 3)
+
+
+class StreamEncryptor:
+    """Incremental encryptor producing the chunked container.
+
+    update() accepts input of any size and returns whatever container bytes
+    are ready; finalize() flushes the last (final-flagged) segment. At most
+    two chunks of plaintext are buffered. With binary=True the records hold
+    raw tokens (fastest with a BinaryFernet). compression is the codec id the
+    plaintext was compressed with, recorded in every segment (None: not
+    compressed).
+    """
+
+    def __init__(self, fernet, chunk_size=DEFAULT_CHUNK_SIZE, binary=False, compression=None):
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be positive")
+        self._fernet = fernet
+        self._chunk_size = chunk_size
+        self._binary = binary
+        self._compression = compression
+        self._stream_id = os.urandom(16)
+        self._index = 0
+        self._buffer = bytearray()
+        version = VERSION if compression is None else COMPRESSED_VERSION
+        self._pending = _HEADER.pack(BINARY_MAGIC if binary else MAGIC, version, chunk_size, self._stream_id)
+
+    def _segment(self, chunk, final):
+        prefix = _SEGMENT_PREFIX.pack(self._stream_id, self._index, _flags(final, self._compression))
+        token = _encrypt_token(self._fernet, prefix + chunk, self._binary)
+        self._index += 1
+        return _RECORD_LEN.pack(len(token)) + token
+
+    def update(self, data):
+        self._buffer += data
+        out = [self._pending]
+        self._pending = b''
+        # Hold back the last chunk until we know whether it is final
+        while len(self._buffer) > self._chunk_size:
+            out.append(self._segment(bytes(self._buffer[:self._chunk_size]), False))
+            del self._buffer[:self._chunk_size]
+        return b''.join(out)
+
+    def finalize(self):
+        out = self._pending + self._segment(bytes(self._buffer), True)
+        self._pending = b''
+        self._buffer = bytearray()
+        return out
+
+
+class SegmentEncryptor:
+    """Encrypts the segments of one container independently, in any order.
+
+    For uploads whose chunks arrive out of order: with the plaintext size
+    known up front, each segment's index and final flag are known, and
+    offset(index) is where its record belongs. The header at offset 0 plus
+    every segment(index, final, chunk) record at its offset is the same
+    container StreamEncryptor writes.
+    """
+
+    def __init__(self, fernet, chunk_size=DEFAULT_CHUNK_SIZE, binary=False):
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be positive")
+        self._fernet = fernet
+        self._binary = binary
+        self._stream_id = os.urandom(16)
+        self._record_size = _full_record_size(chunk_size, binary)
+        self.chunk_size = chunk_size
+        self.header = _HEADER.pack(BINARY_MAGIC if binary else MAGIC, VERSION, chunk_size, self._stream_id)
+
+    def offset(self, index):
+        return _HEADER.size + index * self._record_size
+
+    def segment(self, index, final, chunk):
+        return _encrypt_segment(self._fernet, self._stream_id, index, _flags(final, None), chunk, self._binary)
+
+
+class StreamDecryptor:
+    """Incremental decryptor for the chunked container.
+
+    update() returns plaintext for every complete, authenticated segment.
+    Raises InvalidToken if a segment fails authentication or is out of
+    order, or (from finalize) if the stream is truncated or has trailing data.
+
+    Both the base64 and the binary container are accepted. Input without
+    either magic is treated as a legacy single Fernet token: it is buffered
+    whole and decrypted in finalize(), as is a converted binary single token.
+    `compression` is the codec id from the first authenticated segment (None:
+    not compressed).
+    """
+
+    def __init__(self, fernet):
+        self._fernet = fernet
+        self._buffer = bytearray()
+        self._version = None
+        self.compression = None
+        self._stream_id = None
+        self._limit = None
+        self._index = 0
+        self._done = False
+        self._binary = False
+        self._single = False
+
+    def update(self, data):
+        self._buffer += data
+        if self._single:
+            return b''
+        if self._stream_id is None:
+            if len(self._buffer) >= len(MAGIC) and self._buffer[:len(MAGIC)] not in (MAGIC, BINARY_MAGIC):
+                self._single = True
+                return b''
+            if len(self._buffer) < _HEADER.size:
+                return b''
+            magic, version, chunk_size, stream_id = _HEADER.unpack_from(self._buffer)
+            if version not in (VERSION, COMPRESSED_VERSION):
+                raise InvalidToken
+            if chunk_size == 0 and (magic != BINARY_MAGIC or version != VERSION):
+                raise InvalidToken
+            self._version = version
+            self._binary = magic == BINARY_MAGIC
+            del self._buffer[:_HEADER.size]
+            if chunk_size == 0:
+                self._single = True
+                return b''
+            self._stream_id = stream_id
+            self._limit = max_token_size(chunk_size, self._binary)
+
+        out = []
+        while len(self._buffer) >= _RECORD_LEN.size:
+            if self._done:
+                raise InvalidToken  # trailing data after the final segment
+            (length,) = _RECORD_LEN.unpack_from(self._buffer)
+            if length > self._limit:
+                raise InvalidToken
+            end = _RECORD_LEN.size + length
+            if len(self._buffer) < end:
+                break
+            segment = _decrypt_token(self._fernet, bytes(self._buffer[_RECORD_LEN.size:end]), self._binary)
+            del self._buffer[:end]
+
+            segment_id, segment_index, flags = _SEGMENT_PREFIX.unpack_from(segment)
+            if segment_id != self._stream_id or segment_index != self._index:
+                raise InvalidToken
+            compression = _segment_compression(flags, self._version)
+            if self._index and compression != self.compression:
+                raise InvalidToken
+            self.compression = compression
+            out.append(segment[_SEGMENT_PREFIX.size:])
+            self._index += 1
+            self._done = bool(flags & 1)
+        return b''.join(out)
+
+    def finalize(self):
+        if self._single:
+            return _decrypt_token(self._fernet, bytes(self._buffer), self._binary)
+        if not self._done or self._buffer:
+            raise InvalidToken  # truncated before the final segment, or trailing bytes
+        return b''
+
+
+def encrypt_stream(fernet, src, dst, chunk_size=DEFAULT_CHUNK_SIZE, binary=False, progress=None, compression=None):
+    """Encrypt file object src into dst one chunk at a time.
+
+    Memory use is bounded by the chunk size, whatever the size of the input.
+    progress, if given, is called with the number of input bytes processed so far.
+    compression is the codec id src is already compressed with (see StreamEncryptor).
+    """
+    encryptor = StreamEncryptor(fernet, chunk_size, binary, compression)
+    done = 0
+    while True:
+        chunk = src.read(chunk_size)
+        if not chunk:
+            break
+        dst.write(encryptor.update(chunk))
+        done += len(chunk)
+        if progress:
+            progress(done)
+    dst.write(encryptor.finalize())
+
+
+def decrypt_stream(fernet, src, dst, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """Decrypt a chunked container from src into dst.
+
+    Raises InvalidToken if any segment fails authentication, is out of
+    order, or if the stream is truncated or has trailing data. Compressed
+    plaintext is expanded. progress, if given, is called with the number of
+    input bytes processed so far.
+    """
+    expand_stream(StreamDecryptor(fernet), src, dst, chunk_size, progress)
+
+
+def _encrypt_segment(fernet, stream_id, index, flags, chunk, binary):
+    token = _encrypt_token(fernet, _SEGMENT_PREFIX.pack(stream_id, index, flags) + chunk, binary)
+    return _RECORD_LEN.pack(len(token)) + token
+
+
+def encrypt_stream_parallel(fernet, src, dst, chunk_size=DEFAULT_CHUNK_SIZE, workers=None, binary=False, progress=None,
+                            compression=None):
+    """Like encrypt_stream, but segments are encrypted on `workers` processes of the shared pool.
+
+    At most 2 * workers segments are in flight, so memory stays bounded;
+    records are written in order as their results arrive. progress counts
+    the input bytes of the records written so far.
+    """
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive")
+    workers = worker_pool.clamp(workers)
+    stream_id = os.urandom(16)
+    version = VERSION if compression is None else COMPRESSED_VERSION
+    dst.write(_HEADER.pack(BINARY_MAGIC if binary else MAGIC, version, chunk_size, stream_id))
+
+    done = 0
+
+    def write_record(future, length):
+        nonlocal done
+        dst.write(future.result())
+        done += length
+        if progress:
+            progress(done)
+
+    pool = worker_pool.get()
+    in_flight = deque()
+    index = 0
+    try:
+        chunk = src.read(chunk_size)
+        while True:
+            next_chunk = src.read(chunk_size)
+            final = not next_chunk
+            flags = _flags(final, compression)
+            in_flight.append((pool.submit(_encrypt_segment, fernet, stream_id, index, flags, chunk, binary), len(chunk)))
+            if len(in_flight) >= 2 * workers:
+                write_record(*in_flight.popleft())
+            if final:
+                break
+            chunk = next_chunk
+            index += 1
+        while in_flight:
+            write_record(*in_flight.popleft())
+    except BaseException as e:
+        # Failed or cancelled from progress: drop the queued segments instead of waiting for them
+        worker_pool.cancel(in_flight, e)
+        raise
+
+
+def _read_records(src, chunk_size, binary=False):
+    """Yield the Fernet tokens of a container body, checking only the framing."""
+    limit = max_token_size(chunk_size, binary)
+    while True:
+        length_bytes = src.read(_RECORD_LEN.size)
+        if not length_bytes:
+            return
+        if len(length_bytes) != _RECORD_LEN.size:
+            raise InvalidToken
+        (length,) = _RECORD_LEN.unpack(length_bytes)
+        if length > limit:
+            raise InvalidToken
+        token = src.read(length)
+        if len(token) != length:
+            raise InvalidToken
+        yield token
+
+
+def decrypt_stream_parallel(fernet, src, dst, workers=None, progress=None):
+    """Like decrypt_stream, but segments are authenticated and decrypted on `workers` processes of the shared pool.
+
+    Segment ids, order and the final flag are still checked in sequence here,
+    so reordering, splicing and truncation are rejected exactly as in the
+    serial path, and compressed plaintext is expanded in order as segments
+    are written. progress counts the input bytes of the segments written so far.
+    """
+    workers = worker_pool.clamp(workers)
+    header = src.read(_HEADER.size)
+    if len(header) != _HEADER.size:
+        raise InvalidToken
+    magic, version, chunk_size, stream_id = _HEADER.unpack(header)
+    if magic not in (MAGIC, BINARY_MAGIC) or version not in (VERSION, COMPRESSED_VERSION):
+        raise InvalidToken
+    binary = magic == BINARY_MAGIC
+    if chunk_size == 0:
+        if not binary or version != VERSION:
+            raise InvalidToken
+        dst.write(_decrypt_token(fernet, src.read(), True))  # single token, nothing to split
+        return
+
+    state = {'index': 0, 'done': False, 'bytes': _HEADER.size, 'compression': None, 'decompressor': None}
+
+    def write_segment(future, length):
+        segment = future.result()
+        if state['done']:
+            raise InvalidToken  # trailing segment after the final one
+        segment_id, segment_index, flags = _SEGMENT_PREFIX.unpack_from(segment)
+        if segment_id != stream_id or segment_index != state['index']:
+            raise InvalidToken
+        compression = _segment_compression(flags, version)
+        if state['index'] == 0 and compression is not None:
+            state['compression'] = compression
+            state['decompressor'] = Decompressor(compression)
+        elif compression != state['compression']:
+            raise InvalidToken
+        plaintext = memoryview(segment)[_SEGMENT_PREFIX.size:]
+        if state['decompressor'] is None:
+            dst.write(plaintext)
+        else:
+            for out in state['decompressor'].update_chunks(plaintext):
+                dst.write(out)
+        state['index'] += 1
+        state['done'] = bool(flags & 1)
+        state['bytes'] += length
+        if progress:
+            progress(state['bytes'])
+
+    pool = worker_pool.get()
+    in_flight = deque()
+    try:
+        for token in _read_records(src, chunk_size, binary):
+            in_flight.append((pool.submit(_decrypt_token, fernet, token, binary), _RECORD_LEN.size + len(token)))
+            if len(in_flight) >= 2 * workers:
+                write_segment(*in_flight.popleft())
+        while in_flight:
+            write_segment(*in_flight.popleft())
+    except BaseException as e:
+        # Failed or cancelled from progress: drop the queued segments instead of waiting for them
+        worker_pool.cancel(in_flight, e)
+        raise
+
+    if not state['done']:
+        raise InvalidToken  # truncated before the final segment
+    if state['decompressor'] is not None:
+        for out in state['decompressor'].finalize_chunks():
+            dst.write(out)
+
+
+def _full_record_size(chunk_size, binary):
+    """Exact size of a record holding a full chunk_size segment."""
+    raw = _TOKEN_OVERHEAD + (_SEGMENT_PREFIX.size + chunk_size) // 16 * 16 + 16
+    return _RECORD_LEN.size + (raw if binary else 4 * ((raw + 2) // 3))
+
+
+def decrypt_range(fernet, source, offset, length):
+    """Decrypt `length` plaintext bytes starting at `offset` from a chunked container.
+
+    source is a path or a seekable binary file object. Every record but the
+    last holds a full chunk and so has the same size, which locates the
+    records covering the range without reading the others: the cost is
+    O(range), not O(file). Each one is authenticated and its stream id,
+    index and final flag are checked. Reads past the end return fewer bytes.
+    Raises InvalidToken on failure, and ValueError for single-token files,
+    which have no segments to seek to, and for compressed files, whose
+    offsets do not match the original data.
+    """
+    if offset < 0 or length < 0:
+        raise ValueError("offset and length must not be negative")
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as src:
+            return decrypt_range(fernet, src, offset, length)
+
+    source.seek(0)
+    header = source.read(_HEADER.size)
+    if len(header) < _HEADER.size or header[:len(MAGIC)] not in (MAGIC, BINARY_MAGIC):
+        raise ValueError("Not a chunked container; only stream-mode files support range decryption")
+    magic, version, chunk_size, stream_id = _HEADER.unpack(header)
+    if version == COMPRESSED_VERSION:
+        raise ValueError("Compressed file; its plaintext offsets cannot be read as ranges")
+    if version != VERSION:
+        raise InvalidToken
+    if chunk_size == 0:
+        raise ValueError("Single-token file; only stream-mode files support range decryption")
+    binary = magic == BINARY_MAGIC
+    record_size = _full_record_size(chunk_size, binary)
+    file_size = source.seek(0, os.SEEK_END)
+    count = max(1, -(-(file_size - _HEADER.size) // record_size))
+
+    def read_segment(index):
+        position = _HEADER.size + index * record_size
+        source.seek(position)
+        length_bytes = source.read(_RECORD_LEN.size)
+        if len(length_bytes) != _RECORD_LEN.size:
+            raise InvalidToken
+        (token_length,) = _RECORD_LEN.unpack(length_bytes)
+        last = index == count - 1
+        # Full records must be exactly record_size; the last one must end the file
+        if token_length + _RECORD_LEN.size != (file_size - position if last else record_size):
+            raise InvalidToken
+        segment = _decrypt_token(fernet, source.read(token_length), binary)
+        segment_id, segment_index, flags = _SEGMENT_PREFIX.unpack_from(segment)
+        if segment_id != stream_id or segment_index != index or flags != _flags(last, None):
+            raise InvalidToken
+        return segment[_SEGMENT_PREFIX.size:]
+
+    first = offset // chunk_size
+    if length == 0 or first >= count:
+        return b''
+    out = [read_segment(index) for index in range(first, min(count - 1, (offset + length - 1) // chunk_size) + 1)]
+    start = offset - first * chunk_size
+    return b''.join(out)[start:start + length]
+
+
+def encrypted_size(length):
+    """Exact size of encrypt_into() output for `length` bytes of plaintext."""
+    return _HEADER.size + _TOKEN_OVERHEAD + cbc_buffer.padded_size(length, 16)
+
+
+def encrypt_into(fernet, data, out):
+    """Encrypt data as a binary single token (header + raw token) into out.
+
+    The result is a complete file that decrypt_file() reads. out must hold
+    encrypted_size(len(data)) bytes; returns the number of bytes written.
+    """
+    out = memoryview(out)
+    if len(out) < encrypted_size(len(data)):
+        raise ValueError(f"Output buffer too small: need {encrypted_size(len(data))} bytes, got {len(out)}")
+    out[:_HEADER.size] = _HEADER.pack(BINARY_MAGIC, VERSION, 0, bytes(16))
+    return _HEADER.size + fernet.encrypt_raw_into(data, out[_HEADER.size:])
+
+
+def decrypt_into(fernet, data, out):
+    """Decrypt any aes128/aes256 format into out; returns the plaintext length.
+
+    Single tokens (binary or base64) are decrypted straight into out, which
+    needs room for the ciphertext length in bytes. Chunked containers go
+    through StreamDecryptor and are copied in. Raises InvalidToken on failure,
+    and ValueError for compressed containers, whose plaintext may not fit.
+    """
+    data = memoryview(data)
+    out = memoryview(out)
+    if is_compressed(data):
+        raise ValueError("Compressed container; decrypt it with decrypt_stream")
+    if len(data) >= _HEADER.size and data[:len(MAGIC)] == BINARY_MAGIC:
+        _, version, chunk_size, _ = _HEADER.unpack_from(data)
+        if chunk_size == 0:
+            if version != VERSION:
+                raise InvalidToken
+            return fernet.decrypt_raw_into(data[_HEADER.size:], out)
+    if data[:len(MAGIC)] in (MAGIC, BINARY_MAGIC):
+        decryptor = StreamDecryptor(fernet)
+        plaintext = decryptor.update(data) + decryptor.finalize()
+        if len(out) < len(plaintext):
+            raise ValueError(f"Output buffer too small: need {len(plaintext)} bytes, got {len(out)}")
+        out[:len(plaintext)] = plaintext
+        return len(plaintext)
+    try:
+        token = base64.urlsafe_b64decode(data.tobytes())
+    except ValueError:
+        raise InvalidToken
+    return fernet.decrypt_raw_into(token, out)
+
+
+def _raw_pieces(token, binary, step=3 * 1024 * 1024):
+    """Yield (end, raw bytes) for a token buffer a piece at a time, decoding base64 on the fly.
+
+    end is the offset in token up to which the piece was read.
+    """
+    if binary:
+        for start in range(0, len(token), step):
+            yield min(start + step, len(token)), token[start:start + step]
+        return
+    step = step // 3 * 4
+    for start in range(0, len(token), step):
+        try:
+            yield min(start + step, len(token)), base64.urlsafe_b64decode(bytes(token[start:start + step]))
+        except ValueError:
+            raise InvalidToken
+
+
+def _decrypt_single_mapped(fernet, token, out, binary, progress=None, offset=0):
+    # One pass over the (mapped) token so it is never decoded in full; each
+    # piece is copied once, then MACed and decrypted from that copy
+    if binary:
+        raw_length = len(token)
+    else:
+        if len(token) % 4:
+            raise InvalidToken
+        raw_length = len(token) // 4 * 3 - bytes(token[-2:]).count(b'=')
+    pieces = ((offset + end, bytes(piece)) for end, piece in _raw_pieces(token, binary))
+    return fernet.decrypt_raw_pieces(pieces, raw_length, out, progress)
+
+
+def decrypt_mapped(fernet, src, out, progress=None):
+    """Decrypt an aes128/aes256 file held in a (memory-mapped) buffer into out.
+
+    out must be at least len(src) bytes; returns the plaintext length. Single
+    tokens are never decoded whole, and chunked containers go through
+    StreamDecryptor one record at a time, so memory use stays bounded by the
+    chunk size. fernet must be a BinaryFernet. progress, if given, is called
+    with the number of input bytes decrypted so far. Raises InvalidToken on
+    failure, and ValueError for compressed containers (see decrypt_into).
+    """
+    src = memoryview(src)
+    out = memoryview(out)
+    if is_compressed(src):
+        raise ValueError("Compressed container; decrypt it with decrypt_stream")
+    magic = bytes(src[:len(MAGIC)])
+    if magic not in (MAGIC, BINARY_MAGIC):
+        return _decrypt_single_mapped(fernet, src, out, False, progress)
+    if len(src) < _HEADER.size:
+        raise InvalidToken
+    _, version, chunk_size, _ = _HEADER.unpack_from(src)
+    if magic == BINARY_MAGIC and chunk_size == 0:
+        if version != VERSION:
+            raise InvalidToken
+        return _decrypt_single_mapped(fernet, src[_HEADER.size:], out, True, progress, _HEADER.size)
+
+    decryptor = StreamDecryptor(fernet)
+    written = 0
+    for start in range(0, len(src), DEFAULT_CHUNK_SIZE):
+        piece = decryptor.update(src[start:start + DEFAULT_CHUNK_SIZE])
+        out[written:written + len(piece)] = piece
+        written += len(piece)
+        if progress:
+            progress(min(start + DEFAULT_CHUNK_SIZE, len(src)))
+    piece = decryptor.finalize()
+    out[written:written + len(piece)] = piece
+    return written + len(piece)
+
+
+def convert(src, dst, binary=True):
+    """Rewrite a Fernet file between the base64 and binary forms.
+
+    Tokens are only re-encoded, never decrypted, so no key is needed and the
+    HMACs carry over. Chunked containers map to each other record by record;
+    a legacy single-token file becomes a binary single token and back.
+    """
+    magic = src.read(len(MAGIC))
+    single = magic not in (MAGIC, BINARY_MAGIC)
+    if magic == (BINARY_MAGIC if binary else MAGIC) or (single and not binary):
+        # Already in the requested form
+        dst.write(magic)
+        shutil.copyfileobj(src, dst)
+        return
+    if single:
+        token = base64.urlsafe_b64decode(magic + src.read())
+        dst.write(_HEADER.pack(BINARY_MAGIC, VERSION, 0, bytes(16)) + token)
+        return
+
+    header = magic + src.read(_HEADER.size - len(magic))
+    if len(header) != _HEADER.size:
+        raise InvalidToken
+    _, version, chunk_size, stream_id = _HEADER.unpack(header)
+    if version not in (VERSION, COMPRESSED_VERSION):
+        raise InvalidToken
+    if chunk_size == 0:
+        if version != VERSION:
+            raise InvalidToken
+        # Binary single token back to a plain Fernet token
+        dst.write(base64.urlsafe_b64encode(src.read()))
+        return
+
+    dst.write(_HEADER.pack(BINARY_MAGIC if binary else MAGIC, version, chunk_size, stream_id))
+    recode = base64.urlsafe_b64decode if binary else base64.urlsafe_b64encode
+    for token in _read_records(src, chunk_size, not binary):
+        token = recode(token)
+        dst.write(_RECORD_LEN.pack(len(token)) + token)
+
+
+def convert_file(input_path, output_path, binary=True):
+    """Convert input_path into output_path (see convert); no partial output is left on failure."""
+    try:
+        with open(input_path, 'rb') as src, open(output_path, 'wb') as dst:
+            convert(src, dst, binary)
+    except Exception:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        raise
+
+
+if __name__ == "__main__":
+    # python -m Process.Symmetric_algo.fernet_stream {binary,base64} input.enc output.enc
+    parser = argparse.ArgumentParser(description="Convert aes128/aes256 .enc files between the base64 and binary formats")
+    parser.add_argument('to', choices=('binary', 'base64'))
+    parser.add_argument('input')
+    parser.add_argument('output')
+    args = parser.parse_args()
+    convert_file(args.input, args.output, binary=args.to == 'binary')
@@ -0,0 +1,196 @@
+"""Parallel batch encryption/decryption over a directory tree.
+
+Usage:
+    python -m Process.batch encrypt aes256 --jobs 8
+    python -m Process.batch decrypt rsa --input Encrypted_files/rsa --output Decrypted_files/rsa
+    python -m Process.batch encrypt aes256gcm --compress auto
+
+Input and output default to Original_files/<algo>, Encrypted_files/<algo> and
+Decrypted_files/<algo> under the base path. Sub-directories are mirrored in
+the output. Failures are collected per file and reported at the end together
+with the throughput, instead of being printed as they happen.
+"""
+import os
+import io
+import sys
+import time
+import argparse
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+
+from Process.Symmetric_algo.Encryption_algo import aes256, aes128, blowfish, aes256gcm, chacha20poly1305
+from Process.Symmetric_algo.Decryption_algo import aes256_dec, aes128_dec, blowfish_dec, aes256gcm_dec, chacha20poly1305_dec
+from Process.Asymmetric_algo.Encryption.rsa import rsa
+from Process.Asymmetric_algo.Decryption.rsa import rsa_dec
+from Process.Asymmetric_algo.key_store import default_store
+from Process.compression import available as compression_codecs
+
+ALGORITHMS = ('aes256', 'aes128', 'blowfish', 'rsa', 'aes256gcm', 'chacha20poly1305')
+
+
+def get_base_path():
+    """Get the base path for the encryption project."""
+    return os.environ.get('ENCRYPTION_BASE_PATH', os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def output_name(operation, algorithm, file_name):
+    """Name of the file each module writes for file_name."""
+    if operation == 'encrypt':
+        return file_name + '.enc'
+    if algorithm in ('aes256', 'aes256gcm', 'chacha20poly1305'):
+        return os.path.splitext(file_name)[0]
+    if algorithm == 'aes128':
+        return file_name[:-4]
+    return file_name.replace('.enc', '')
+
+
+def _run(operation, algorithm, file_path, output_dir, key_string, key_path, compression=None):
+    if operation == 'encrypt':
+        if algorithm == 'aes256':
+            aes256.encrypt_file(file_path, output_dir, key_string, stream=True, compression=compression)
+        elif algorithm == 'aes128':
+            aes128.encrypt_file(file_path, output_dir, key_string, stream=True, compression=compression)
+        elif algorithm == 'blowfish':
+            blowfish.encrypt_file(file_path, output_dir, key_string, stream=True, compression=compression)
+        elif algorithm == 'aes256gcm':
+            aes256gcm.encrypt_file(file_path, output_dir, key_string, compression=compression)
+        elif algorithm == 'chacha20poly1305':
+            chacha20poly1305.encrypt_file(file_path, output_dir, key_string, compression=compression)
+        else:
+            rsa.encrypt_file(file_path, output_dir, default_store.load_public(key_path), key_string, stream=True,
+                             compression=compression)
+    else:
+        if algorithm == 'aes256':
+            aes256_dec.decrypt_file(file_path, output_dir, key_string)
+        elif algorithm == 'aes128':
+            aes128_dec.decrypt_file(file_path, output_dir, key_string)
+        elif algorithm == 'blowfish':
+            blowfish_dec.decrypt_file(file_path, output_dir, key_string, stream=True)
+        elif algorithm == 'aes256gcm':
+            aes256gcm_dec.decrypt_file(file_path, output_dir, key_string)
+        elif algorithm == 'chacha20poly1305':
+            chacha20poly1305_dec.decrypt_file(file_path, output_dir, key_string)
+        else:
+            rsa_dec.decrypt_file(file_path, output_dir, default_store.load_private(key_path), key_string)
+
+
+def process_file(task):
+    """Encrypt or decrypt one file; returns (file_path, bytes_processed, error).
+
+    The modules report some failures by printing and returning, so their
+    output is captured and success is judged by a fresh output file.
+    """
+    operation, algorithm, file_path, output_dir, key_string, key_path, compression = task
+    expected = os.path.join(output_dir, output_name(operation, algorithm, os.path.basename(file_path)))
+    started = time.time()
+    messages = io.StringIO()
+    try:
+        size = os.path.getsize(file_path)
+        os.makedirs(output_dir, exist_ok=True)
+        with contextlib.redirect_stdout(messages):
+            _run(operation, algorithm, file_path, output_dir, key_string, key_path, compression)
+    except Exception as e:
+        return file_path, 0, f"{type(e).__name__}: {e}"
+    if not os.path.exists(expected) or os.path.getmtime(expected) < started - 1:
+        return file_path, 0, messages.getvalue().strip() or "no output file produced"
+    return file_path, size, None
+
+
+def collect_tasks(operation, algorithm, input_dir, output_dir, key_string, key_path, compression=None):
+    """Walk input_dir and build one task per file, mirroring sub-directories."""
+    for root, dirs, files in os.walk(input_dir):
+        target = os.path.join(output_dir, os.path.relpath(root, input_dir))
+        for file in sorted(files):
+            if operation == 'decrypt' and not file.endswith('.enc'):
+                continue
+            yield (operation, algorithm, os.path.join(root, file), os.path.normpath(target), key_string, key_path, compression)
+
+
+def run_batch(operation, algorithm, input_dir, output_dir, key_string=None, key_path=None, jobs=None, compression=None):
+    """Process every file under input_dir with a pool of `jobs` processes.
+
+    compression names a codec for encryption (see Process/compression.py);
+    decryption detects compressed files by itself.
+
+    Returns a summary dict with counts, bytes, elapsed time, throughput and
+    a list of (file_path, error) pairs for the files that failed.
+    """
+    jobs = jobs or os.cpu_count() or 1
+    tasks = list(collect_tasks(operation, algorithm, input_dir, output_dir, key_string, key_path, compression))
+
+    start = time.perf_counter()
+    if jobs == 1:
+        results = [process_file(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(process_file, tasks, chunksize=max(1, len(tasks) // (jobs * 8))))
+    elapsed = time.perf_counter() - start
+
+    errors = [(path, error) for path, _, error in results if error]
+    total_bytes = sum(size for _, size, error in results if not error)
+    return {
+        'operation': operation,
+        'algorithm': algorithm,
+        'jobs': jobs,
+        'files': len(results),
+        'succeeded': len(results) - len(errors),
+        'failed': len(errors),
+        'bytes': total_bytes,
+        'seconds': elapsed,
+        'files_per_second': len(results) / elapsed if elapsed else 0.0,
+        'mb_per_second': total_bytes / (1024 * 1024) / elapsed if elapsed else 0.0,
+        'errors': errors,
+    }
+
+
+def format_summary(summary):
+    lines = [
+        f"{summary['operation']} {summary['algorithm']}: {summary['succeeded']}/{summary['files']} files "
+        f"in {summary['seconds']:.2f}s with {summary['jobs']} jobs",
+        f"  {summary['files_per_second']:.1f} files/s, {summary['mb_per_second']:.1f} MB/s "
+        f"({summary['bytes'] / (1024 * 1024):.1f} MB)",
+    ]
+    if summary['errors']:
+        lines.append(f"  {summary['failed']} failed:")
+        lines.extend(f"    {path}: {error}" for path, error in summary['errors'])
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Encrypt or decrypt every file in a directory tree in parallel.")
+    parser.add_argument('operation', choices=('encrypt', 'decrypt'))
+    parser.add_argument('algorithm', choices=ALGORITHMS)
+    parser.add_argument('--input', help="Input directory (default: Original_files/<algo> or Encrypted_files/<algo>)")
+    parser.add_argument('--output', help="Output directory (default: Encrypted_files/<algo> or Decrypted_files/<algo>)")
+    parser.add_argument('--key', help="Encryption key or RSA password (prompted if omitted)")
+    parser.add_argument('--key-file', help="RSA public key (encrypt) or private key (decrypt) PEM file")
+    parser.add_argument('--jobs', '-j', type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument('--compress', choices=('none', 'auto') + tuple(compression_codecs()), default=None,
+                        help="Compress before encrypting; incompressible files are stored as they are")
+    args = parser.parse_args(argv)
+
+    base_path = get_base_path()
+    if args.operation == 'encrypt':
+        input_dir = args.input or os.path.join(base_path, 'Original_files', args.algorithm)
+        output_dir = args.output or os.path.join(base_path, 'Encrypted_files', args.algorithm)
+    else:
+        input_dir = args.input or os.path.join(base_path, 'Encrypted_files', args.algorithm)
+        output_dir = args.output or os.path.join(base_path, 'Decrypted_files', args.algorithm)
+
+    key_path = None
+    if args.algorithm == 'rsa':
+        default_key = 'public_key.pem' if args.operation == 'encrypt' else 'private_key.pem'
+        key_path = args.key_file or os.path.join(base_path, 'Keys', default_key)
+
+    key_string = args.key
+    if key_string is None and not (args.algorithm == 'rsa' and args.operation == 'encrypt'):
+        key_string = input(f"Enter the {args.operation}ion key: ")
+
+    summary = run_batch(args.operation, args.algorithm, input_dir, output_dir, key_string, key_path, args.jobs,
+                        args.compress)
+    print(format_summary(summary))
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
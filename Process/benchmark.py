@@ -0,0 +1,313 @@
+"""Throughput, latency and memory benchmark of the file encrypt/decrypt paths.
+
+Usage:
+    python -m Process.benchmark
+    python -m Process.benchmark --sizes 1K,1M,256M,4G --algorithms aes256,rsa --output bench.json
+    python -m Process.benchmark --baseline bench.json --tolerance 0.15
+
+Each algorithm encrypts and then decrypts a file of random data at every
+size, through the same calls Process.batch makes. Every (operation,
+algorithm, size) case runs `repeat` times in a fresh worker process and
+reports MB/s, per-call latency percentiles, peak RSS and the tracemalloc
+peak of one extra traced call. Inputs, ciphertexts and outputs are written
+under --work-dir, so it needs about three times the largest size in free
+disk space.
+
+With --baseline, results are compared with an earlier --output file and
+the exit code is 1 if any case got slower or needs more memory than the
+tolerance allows.
+"""
+import os
+import sys
+import json
+import math
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows: peak RSS is reported as None there
+    resource = None
+
+import cryptography
+
+from Process.batch import ALGORITHMS, output_name, process_file
+from Process.Asymmetric_algo.Encryption.rsa import rsa
+
+DEFAULT_ALGORITHMS = ('aes128', 'aes256', 'blowfish', 'rsa')
+DEFAULT_SIZES = '1K,64K,1M,16M,256M'
+KEY = 'benchmark-key'
+# Bytes each case processes at least when --repeat is not given, within MIN/MAX_REPEAT calls
+REPEAT_BUDGET = 64 * 1024 * 1024
+MIN_REPEAT = 3
+MAX_REPEAT = 200
+# Memory growth below this is noise, whatever the tolerance
+MEMORY_SLACK = 1024 * 1024
+_UNITS = {'': 1, 'B': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+_WRITE_SIZE = 1024 * 1024
+
+
+def parse_size(text):
+    """Parse a size such as 512, 64K, 16M or 2G (binary units) into bytes."""
+    text = text.strip().upper().removesuffix('IB').removesuffix('B')
+    unit = text[-1:] if text[-1:] in _UNITS else ''
+    try:
+        size = int(float(text[:len(text) - len(unit)]) * _UNITS[unit])
+    except ValueError:
+        raise ValueError(f"Invalid size {text!r}; use e.g. 512, 64K, 16M or 2G") from None
+    if size <= 0:
+        raise ValueError(f"Size must be positive: {text!r}")
+    return size
+
+
+def format_size(size):
+    for unit in ('G', 'M', 'K'):
+        if size >= _UNITS[unit] and size % _UNITS[unit] == 0:
+            return f"{size // _UNITS[unit]}{unit}"
+    return f"{size}B"
+
+
+def default_repeat(size):
+    return max(MIN_REPEAT, min(MAX_REPEAT, REPEAT_BUDGET // size))
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    index = max(0, min(len(sorted_values) - 1, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def peak_rss():
+    """Peak resident set size of this process in bytes, None where it cannot be read."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def write_random_file(path, size):
+    with open(path, 'wb') as f:
+        remaining = size
+        while remaining:
+            chunk = os.urandom(min(remaining, _WRITE_SIZE))
+            f.write(chunk)
+            remaining -= len(chunk)
+
+
+def run_case(case):
+    """Time one (operation, algorithm, size) case; runs in its own worker process when isolated.
+
+    Returns the result dict for the case. Raises RuntimeError if a call fails.
+    """
+    operation, algorithm, size, file_path, output_dir, key_path, repeat = case
+    task = (operation, algorithm, file_path, output_dir, KEY, key_path, None)
+    rss_before = peak_rss()
+
+    def call():
+        _, _, error = process_file(task)
+        if error:
+            raise RuntimeError(f"{operation} {algorithm} {format_size(size)} failed: {error}")
+
+    # Warm-up: imports, key loading and the page cache are not part of the timings
+    call()
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - started)
+
+    # tracemalloc slows every allocation down, so it gets a call of its own
+    tracemalloc.start()
+    try:
+        call()
+        traced_peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    rss_after = peak_rss()
+    latencies.sort()
+    total = sum(latencies)
+    return {
+        'operation': operation,
+        'algorithm': algorithm,
+        'size': size,
+        'calls': repeat,
+        'mb_per_second': size * repeat / (1024 * 1024) / total if total else 0.0,
+        'latency': {
+            'min': latencies[0],
+            'p50': percentile(latencies, 0.5),
+            'p90': percentile(latencies, 0.9),
+            'p99': percentile(latencies, 0.99),
+            'max': latencies[-1],
+            'mean': total / repeat,
+        },
+        'peak_rss': rss_after,
+        'rss_growth': rss_after - rss_before if rss_after is not None else None,
+        'tracemalloc_peak': traced_peak,
+    }
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'cryptography': cryptography.__version__,
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+    }
+
+
+def run_benchmark(algorithms=DEFAULT_ALGORITHMS, sizes=None, repeat=None, work_dir=None, isolate=True, report=None):
+    """Benchmark encryption then decryption of every algorithm at every size.
+
+    sizes are in bytes (default DEFAULT_SIZES); repeat is the number of timed
+    calls per case, by default enough for REPEAT_BUDGET bytes. With isolate,
+    each case runs in a fresh process, so its peak RSS is its own. report,
+    if given, is called with each case result as it completes.
+
+    Returns {'environment': ..., 'results': [...]}. A work_dir that is not
+    given is a temporary directory, removed afterwards.
+    """
+    sizes = sizes or [parse_size(size) for size in DEFAULT_SIZES.split(',')]
+    temporary = work_dir is None
+    work_dir = work_dir or tempfile.mkdtemp(prefix='benchmark-')
+    results = []
+    try:
+        keys_dir = os.path.join(work_dir, 'Keys')
+        if 'rsa' in algorithms:
+            rsa.generate_rsa_keys(keys_dir)
+        for size in sizes:
+            plain_dir = os.path.join(work_dir, 'plain')
+            os.makedirs(plain_dir, exist_ok=True)
+            file_name = f"input-{format_size(size)}.bin"
+            input_path = os.path.join(plain_dir, file_name)
+            write_random_file(input_path, size)
+            for algorithm in algorithms:
+                encrypted_dir = os.path.join(work_dir, 'enc', algorithm)
+                decrypted_dir = os.path.join(work_dir, 'dec', algorithm)
+                encrypted_path = os.path.join(encrypted_dir, output_name('encrypt', algorithm, file_name))
+                is_rsa = algorithm == 'rsa'
+                cases = [
+                    ('encrypt', algorithm, size, input_path, encrypted_dir,
+                     os.path.join(keys_dir, 'public_key.pem') if is_rsa else None, repeat or default_repeat(size)),
+                    ('decrypt', algorithm, size, encrypted_path, decrypted_dir,
+                     os.path.join(keys_dir, 'private_key.pem') if is_rsa else None, repeat or default_repeat(size)),
+                ]
+                for case in cases:
+                    if isolate:
+                        with ProcessPoolExecutor(max_workers=1) as pool:
+                            result = pool.submit(run_case, case).result()
+                    else:
+                        result = run_case(case)
+                    results.append(result)
+                    if report:
+                        report(result)
+                # Only one size's files are kept at a time
+                shutil.rmtree(encrypted_dir, ignore_errors=True)
+                shutil.rmtree(decrypted_dir, ignore_errors=True)
+            os.remove(input_path)
+    finally:
+        if temporary:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return {'environment': environment(), 'results': results}
+
+
+def compare(results, baseline, tolerance=0.1):
+    """Compare benchmark results with a baseline produced by run_benchmark.
+
+    Returns a list of (case, message) regressions: cases whose throughput
+    dropped by more than `tolerance` (a fraction), or whose tracemalloc
+    peak grew by more than that and by at least MEMORY_SLACK bytes. Cases
+    missing from either side are ignored.
+    """
+    def key(result):
+        return result['operation'], result['algorithm'], result['size']
+
+    previous = {key(result): result for result in baseline['results']}
+    regressions = []
+    for result in results['results']:
+        old = previous.get(key(result))
+        if old is None:
+            continue
+        case = f"{result['operation']} {result['algorithm']} {format_size(result['size'])}"
+        if result['mb_per_second'] < old['mb_per_second'] * (1 - tolerance):
+            regressions.append((case, f"{result['mb_per_second']:.1f} MB/s, was {old['mb_per_second']:.1f} MB/s"))
+        peak, old_peak = result['tracemalloc_peak'], old['tracemalloc_peak']
+        if peak > old_peak * (1 + tolerance) and peak - old_peak >= MEMORY_SLACK:
+            regressions.append((case, f"tracemalloc peak {peak / (1024 * 1024):.1f} MB, "
+                                      f"was {old_peak / (1024 * 1024):.1f} MB"))
+    return regressions
+
+
+def format_result(result):
+    latency = result['latency']
+    rss = result['peak_rss']
+    return (f"{result['operation']:<8} {result['algorithm']:<16} {format_size(result['size']):>6} "
+            f"{result['mb_per_second']:9.1f} MB/s  "
+            f"p50 {latency['p50'] * 1000:9.2f} ms  p90 {latency['p90'] * 1000:9.2f} ms  "
+            f"p99 {latency['p99'] * 1000:9.2f} ms  "
+            f"rss {'-' if rss is None else f'{rss / (1024 * 1024):.0f} MB':>7}  "
+            f"traced {result['tracemalloc_peak'] / (1024 * 1024):.1f} MB  ({result['calls']} calls)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark file encryption and decryption of each algorithm.")
+    parser.add_argument('--algorithms', default=','.join(DEFAULT_ALGORITHMS),
+                        help=f"Comma-separated algorithms out of {', '.join(ALGORITHMS)} (default: %(default)s)")
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help="Comma-separated file sizes (default: %(default)s)")
+    parser.add_argument('--repeat', '-n', type=int, default=None,
+                        help=f"Timed calls per case (default: {REPEAT_BUDGET // (1024 * 1024)} MB worth, "
+                             f"{MIN_REPEAT} to {MAX_REPEAT} calls)")
+    parser.add_argument('--work-dir', help="Directory for the benchmark files (default: a temporary directory)")
+    parser.add_argument('--output', '-o', help="Write the results as JSON to this file")
+    parser.add_argument('--baseline', help="JSON results of an earlier run to compare with")
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help="Allowed slowdown or memory growth against the baseline, as a fraction (default: %(default)s)")
+    parser.add_argument('--no-isolate', action='store_true',
+                        help="Run every case in this process; faster, but peak RSS becomes cumulative")
+    args = parser.parse_args(argv)
+
+    algorithms = [name.strip() for name in args.algorithms.split(',') if name.strip()]
+    unknown = [name for name in algorithms if name not in ALGORITHMS]
+    if unknown:
+        parser.error(f"unknown algorithm(s): {', '.join(unknown)}")
+    try:
+        sizes = [parse_size(size) for size in args.sizes.split(',') if size.strip()]
+    except ValueError as e:
+        parser.error(str(e))
+    if args.repeat is not None and args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results = run_benchmark(algorithms, sizes, args.repeat, args.work_dir, not args.no_isolate,
+                            report=lambda result: print(format_result(result), flush=True))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if baseline is None:
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance)
+    if not regressions:
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+        return 0
+    print(f"{len(regressions)} regression(s) against {args.baseline} (tolerance {args.tolerance:.0%}):")
+    for case, message in regressions:
+        print(f"  {case}: {message}")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+import os
+import time
+import threading
+
+# Cooperative cancellation for the chunked encrypt/decrypt loops. The
+# algorithm functions call their progress callback between chunks, so a
+# callback from CancelToken.watch() stops the work at the next chunk
+# boundary by raising Cancelled. Functions that raise remove their partial
+# output first.
+
+
+class Cancelled(Exception):
+    """Raised between chunks once a CancelToken has been cancelled."""
+
+
+class DeadlineExceeded(Cancelled):
+    """Raised between chunks once a CancelToken's deadline has passed."""
+
+
+class CancelToken:
+    """Cancellation flag shared by the code that owns the work and the thread doing it.
+
+    deadline is a time.monotonic() value; the token counts as cancelled
+    from then on.
+    """
+
+    def __init__(self, deadline=None):
+        self.deadline = deadline
+        self.reason = None
+        self._event = threading.Event()
+        self._flag_paths = []
+
+    def cancel(self, reason="Cancelled"):
+        if not self._event.is_set():
+            self.reason = reason
+            self._event.set()
+            for path in list(self._flag_paths):
+                _write_flag(path, reason)
+
+    @property
+    def expired(self):
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    @property
+    def cancelled(self):
+        return self._event.is_set() or self.expired
+
+    def check(self):
+        if self._event.is_set():
+            raise Cancelled(self.reason)
+        if self.expired:
+            raise DeadlineExceeded("Deadline exceeded")
+
+    def watch(self, progress=None):
+        """Return a progress callback that checks the token, then forwards to progress."""
+        def check_then_report(done):
+            self.check()
+            if progress:
+                progress(done)
+        return check_then_report
+
+    def flag_file(self, path):
+        """Return a CancelFlag for work running in another process.
+
+        path is created when the token is cancelled (at once if it already
+        is); the caller removes it with the rest of its workspace.
+        """
+        self._flag_paths.append(path)
+        if self._event.is_set():
+            _write_flag(path, self.reason)
+        deadline = None
+        if self.deadline is not None:
+            deadline = time.time() + (self.deadline - time.monotonic())
+        return CancelFlag(path, deadline)
+
+
+class CancelFlag:
+    """Picklable progress callback that stops work in a worker process.
+
+    Raises Cancelled once path exists, DeadlineExceeded once deadline (a
+    time.time() value: monotonic clocks are per process) has passed.
+    Progress reports themselves do not reach the owning process.
+    """
+
+    def __init__(self, path, deadline=None):
+        self.path = path
+        self.deadline = deadline
+
+    def __call__(self, done):
+        if self.deadline is not None and time.time() >= self.deadline:
+            raise DeadlineExceeded("Deadline exceeded")
+        if os.path.exists(self.path):
+            try:
+                with open(self.path) as f:
+                    reason = f.read()
+            except OSError:
+                reason = ""
+            raise Cancelled(reason or "Cancelled")
+
+
+def _write_flag(path, reason):
+    try:
+        with open(path, "w") as f:
+            f.write(reason or "")
+    except OSError:
+        pass  # the workspace is already gone, and the work with it
@@ -0,0 +1,64 @@
+from cryptography.hazmat.primitives import padding
+
+# CBC + PKCS7 straight into a caller-supplied buffer, for the *_into functions
+# of the Blowfish, RSA-hybrid and Fernet modules. The whole blocks go through
+# update_into() with no intermediate copy; only the final (padded) block is
+# built separately. Large inputs (e.g. memory-mapped files) are processed in
+# STEP-sized calls.
+
+STEP = 16 * 1024 * 1024
+
+
+def padded_size(length, block_size):
+    """Size of `length` bytes after PKCS7 padding (always at least one byte of padding)."""
+    return (length // block_size + 1) * block_size
+
+
+def encrypt_into(cipher, data, out, block_size):
+    """Pad and encrypt data with a CBC cipher into out; returns the bytes written."""
+    data = memoryview(data)
+    out = memoryview(out)
+    size = padded_size(len(data), block_size)
+    if len(out) < size:
+        raise ValueError(f"Output buffer too small: need {size} bytes, got {len(out)}")
+
+    encryptor = cipher.encryptor()
+    whole = len(data) - len(data) % block_size
+    written = 0
+    for start in range(0, whole, STEP):
+        written += encryptor.update_into(data[start:min(start + STEP, whole)], out[written:])
+    padder = padding.PKCS7(block_size * 8).padder()
+    last = encryptor.update(padder.update(bytes(data[whole:])) + padder.finalize()) + encryptor.finalize()
+    out[written:written + len(last)] = last
+    return written + len(last)
+
+
+def decrypt_into(cipher, data, out, block_size, progress=None):
+    """Decrypt and unpad a CBC body into out; returns the plaintext length.
+
+    out needs room for len(data) - 1 bytes, the largest possible plaintext.
+    progress, if given, is called with the number of bytes of data decrypted
+    so far after every STEP. Raises ValueError if the body is not whole
+    blocks or the padding is invalid.
+    """
+    data = memoryview(data)
+    out = memoryview(out)
+    if not data or len(data) % block_size:
+        raise ValueError("Encrypted body is not a whole number of blocks")
+    if len(out) < len(data) - 1:
+        raise ValueError(f"Output buffer too small: need {len(data) - 1} bytes, got {len(out)}")
+
+    decryptor = cipher.decryptor()
+    body = len(data) - block_size
+    written = 0
+    for start in range(0, body, STEP):
+        end = min(start + STEP, body)
+        written += decryptor.update_into(data[start:end], out[written:])
+        if progress:
+            progress(end)
+    unpadder = padding.PKCS7(block_size * 8).unpadder()
+    last = unpadder.update(decryptor.update(data[body:]) + decryptor.finalize()) + unpadder.finalize()
+    out[written:written + len(last)] = last
+    if progress:
+        progress(len(data))
+    return written + len(last)
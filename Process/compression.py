@@ -0,0 +1,370 @@
+import itertools
+import lzma
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    # Optional: zstd is only offered when the package is installed
+    zstandard = None
+
+# Optional compression ahead of the cipher. The plaintext is compressed with
+# one of the codecs below and then encrypted like any other plaintext; the
+# codec id is recorded in the container header of each format (see the
+# format modules), never in the plaintext itself. Decryption expands the
+# output only when that header says so, so any plaintext, including one that
+# looks like compressed data, round-trips unchanged.
+#
+# The first SAMPLE_SIZE bytes are test-compressed with fast deflate. Input
+# that does not shrink by at least MIN_SAVING (media, archives, ciphertext)
+# is encrypted uncompressed, in the format's original layout.
+
+ZLIB = 1
+LZMA = 2
+ZSTD = 3
+_CODEC_IDS = {'zlib': ZLIB, 'lzma': LZMA, 'zstd': ZSTD}
+
+SAMPLE_SIZE = 64 * 1024
+MIN_SAVING = 0.1
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 3
+READ_SIZE = 1024 * 1024
+# Most output produced per zlib/lzma call while expanding, so a highly
+# compressed chunk cannot turn into one huge bytes object
+_EXPAND_STEP = 4 * 1024 * 1024
+# zstd takes no output limit, but one input byte expands to at most 32 KiB
+# (an RLE block), so feeding it this much at a time bounds each piece to 32 MiB
+_ZSTD_FEED = 1024
+# Most output decompress_bytes() builds in memory; the file and stream paths
+# write bounded pieces and have no such limit
+MAX_EXPANDED_SIZE = 256 * 1024 * 1024
+
+
+def available():
+    """Codec names usable here; zstd needs the optional zstandard package."""
+    return [name for name in _CODEC_IDS if name != 'zstd' or zstandard is not None]
+
+
+def resolve(codec):
+    """Normalize a codec name: None for no compression, 'auto' picks the best available codec.
+
+    Raises ValueError for unknown or unavailable codecs.
+    """
+    if codec is None or codec in ('', 'none'):
+        return None
+    if codec == 'auto':
+        return 'zstd' if zstandard is not None else 'zlib'
+    if codec not in available():
+        raise ValueError(f"Unsupported compression {codec!r}; use one of: none, auto, {', '.join(available())}")
+    return codec
+
+
+def codec_name(codec_id):
+    """Name of a codec id as stored in a container header; raises ValueError for unknown ids."""
+    for name, known_id in _CODEC_IDS.items():
+        if known_id == codec_id:
+            return name
+    raise ValueError(f"Unknown compression codec {codec_id}")
+
+
+def choose(codec, sample):
+    """Codec id to compress with, or None: the sample decides whether codec is worth using at all."""
+    codec = resolve(codec)
+    probe = bytes(sample[:SAMPLE_SIZE])
+    if codec is None or not probe or len(zlib.compress(probe, 1)) > len(probe) * (1 - MIN_SAVING):
+        return None
+    return _CODEC_IDS[codec]
+
+
+def _compressobj(codec_id):
+    if codec_id == ZLIB:
+        return zlib.compressobj(ZLIB_LEVEL)
+    if codec_id == LZMA:
+        return lzma.LZMACompressor()
+    return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+
+
+def _decompressobj(codec_id):
+    if codec_id == ZLIB:
+        return zlib.decompressobj()
+    if codec_id == LZMA:
+        return lzma.LZMADecompressor()
+    if codec_id == ZSTD:
+        if zstandard is None:
+            raise ValueError("Data is zstd-compressed but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompressobj()
+    raise ValueError(f"Unknown compression codec {codec_id}")
+
+
+class Compressor:
+    """Incremental compressor (update/finalize) for a codec id."""
+
+    def __init__(self, codec_id):
+        self._compressor = _compressobj(codec_id)
+
+    def update(self, data):
+        return self._compressor.compress(data)
+
+    def finalize(self):
+        return self._compressor.flush()
+
+
+class Decompressor:
+    """Incremental counterpart of Compressor for a codec id.
+
+    update_chunks()/finalize_chunks() yield the output in bounded pieces;
+    update()/finalize() join them. Raises ValueError for truncated or
+    corrupted compressed data.
+    """
+
+    def __init__(self, codec_id):
+        self._codec_id = codec_id
+        self._decompressor = _decompressobj(codec_id)
+
+    def update_chunks(self, data):
+        decompressor = self._decompressor
+        try:
+            if self._codec_id == ZLIB:
+                while data:
+                    out = decompressor.decompress(data, _EXPAND_STEP)
+                    data = decompressor.unconsumed_tail
+                    if out:
+                        yield out
+            elif self._codec_id == LZMA:
+                while data or not (decompressor.needs_input or decompressor.eof):
+                    out = decompressor.decompress(data, _EXPAND_STEP)
+                    data = b''
+                    if out:
+                        yield out
+            else:
+                data = memoryview(data)
+                for start in range(0, len(data), _ZSTD_FEED):
+                    out = decompressor.decompress(data[start:start + _ZSTD_FEED])
+                    if out:
+                        yield out
+        except (zlib.error, lzma.LZMAError, EOFError) as e:
+            raise ValueError(f"Corrupted compressed data: {e}") from e
+        if getattr(decompressor, 'unused_data', b''):
+            raise ValueError("Unexpected data after the compressed stream")
+
+    def finalize_chunks(self):
+        if self._codec_id == ZLIB:
+            out = self._decompressor.flush()
+            if out:
+                yield out
+        if not getattr(self._decompressor, 'eof', True):
+            raise ValueError("Compressed data is truncated")
+
+    def update(self, data):
+        return b''.join(self.update_chunks(data))
+
+    def finalize(self):
+        return b''.join(self.finalize_chunks())
+
+
+class CompressingEncryptor:
+    """Incremental encryptor (update/finalize) that compresses its input first.
+
+    Input is held back until SAMPLE_SIZE bytes have arrived (or finalize()),
+    then the sample decides the codec and build(compression=codec_id) creates
+    the container's encryptor, whose header records it (None: the input is
+    encrypted as it is). `compression` is the codec id once decided.
+    """
+
+    def __init__(self, build, codec):
+        self._build = build
+        self._codec = resolve(codec)
+        self._sample = bytearray()
+        self._encryptor = None
+        self._compressor = None
+        self.compression = None
+
+    def _start(self):
+        sample, self._sample = bytes(self._sample), None
+        self.compression = choose(self._codec, sample)
+        self._encryptor = self._build(compression=self.compression)
+        if self.compression is None:
+            return self._encryptor.update(sample)
+        self._compressor = Compressor(self.compression)
+        return self._encryptor.update(self._compressor.update(sample))
+
+    def update(self, data):
+        if self._sample is not None:
+            self._sample += data
+            if len(self._sample) < SAMPLE_SIZE:
+                return b''
+            return self._start()
+        if self._compressor is None:
+            return self._encryptor.update(data)
+        return self._encryptor.update(self._compressor.update(data))
+
+    def finalize(self):
+        out = self._start() if self._sample is not None else b''
+        if self._compressor is not None:
+            out += self._encryptor.update(self._compressor.finalize())
+        return out + self._encryptor.finalize()
+
+
+class DecompressingDecryptor:
+    """Wraps an incremental decryptor (update/finalize) so compressed plaintext is expanded.
+
+    The decryptor's `compression` attribute (the codec id from its container
+    header, None for uncompressed data) is read once plaintext starts to
+    arrive, and only then decides whether anything is expanded.
+    """
+
+    def __init__(self, decryptor):
+        self._decryptor = decryptor
+        self._decompressor = None
+        self._decided = False
+
+    def _expand(self, plaintext):
+        if not self._decided:
+            if not plaintext:
+                return
+            self._decided = True
+            if self._decryptor.compression is not None:
+                self._decompressor = Decompressor(self._decryptor.compression)
+        if self._decompressor is None:
+            if plaintext:
+                yield plaintext
+            return
+        yield from self._decompressor.update_chunks(plaintext)
+
+    def update_chunks(self, data):
+        yield from self._expand(self._decryptor.update(data))
+
+    def finalize_chunks(self):
+        last = self._decryptor.finalize()
+        if not self._decided and self._decryptor.compression is not None:
+            self._decided = True
+            self._decompressor = Decompressor(self._decryptor.compression)
+        yield from self._expand(last)
+        if self._decompressor is not None:
+            yield from self._decompressor.finalize_chunks()
+
+    def update(self, data):
+        return b''.join(self.update_chunks(data))
+
+    def finalize(self):
+        return b''.join(self.finalize_chunks())
+
+
+class CompressingReader:
+    """Read-only file wrapper whose read(size) returns the compressed form of src.
+
+    The sample is read when the reader is created, so `compression` (the
+    codec id, or None if the input is passed through) is known before the
+    container header is written. Reads are full-sized until the end, like a
+    regular file, so the chunked encrypt loops work on it unchanged.
+    progress, if given, is called with the number of input bytes read so
+    far; the loops themselves only see compressed bytes.
+    """
+
+    def __init__(self, src, codec, progress=None):
+        self._src = src
+        self._progress = progress
+        self._done = 0
+        self._eof = False
+        sample = bytearray()
+        while len(sample) < SAMPLE_SIZE:
+            chunk = src.read(SAMPLE_SIZE - len(sample))
+            if not chunk:
+                break
+            sample += chunk
+        self.compression = choose(codec, sample)
+        self._compressor = Compressor(self.compression) if self.compression is not None else None
+        self._buffer = bytearray()
+        self._add(bytes(sample))
+
+    def _add(self, chunk):
+        if chunk:
+            self._buffer += self._compressor.update(chunk) if self._compressor else chunk
+            self._done += len(chunk)
+            if self._progress:
+                self._progress(self._done)
+
+    def read(self, size=-1):
+        unbounded = size is None or size < 0
+        while not self._eof and (unbounded or len(self._buffer) < size):
+            chunk = self._src.read(READ_SIZE if unbounded else max(size, READ_SIZE))
+            if chunk:
+                self._add(chunk)
+            else:
+                if self._compressor:
+                    self._buffer += self._compressor.finalize()
+                self._eof = True
+        if unbounded:
+            size = len(self._buffer)
+        out = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return out
+
+
+def input_stream(src, codec, progress=None):
+    """Return (src, progress, compression) for an encrypt loop reading the file object src.
+
+    With a codec, src is wrapped in a CompressingReader that reports input
+    bytes to progress itself, and the loop gets no callback of its own.
+    compression is the codec id the container header must record, None if
+    the input is encrypted as it is.
+    """
+    if resolve(codec) is None:
+        return src, progress, None
+    reader = CompressingReader(src, codec, progress)
+    return reader, None, reader.compression
+
+
+def compress_bytes(data, codec):
+    """Compress data held in memory; returns (data, compression).
+
+    compression is the codec id for the container header, or None when data
+    is returned unchanged (no codec, or the sample did not compress).
+    """
+    compression = choose(codec, data[:SAMPLE_SIZE])
+    if compression is None:
+        return data, None
+    compressor = Compressor(compression)
+    return compressor.update(data) + compressor.finalize(), compression
+
+
+def decompress_bytes(data, compression, max_size=MAX_EXPANDED_SIZE):
+    """Expand plaintext held in memory that its container header marks as compressed.
+
+    data is returned unchanged when compression is None. Raises ValueError
+    once the output grows past max_size bytes, so a small payload cannot
+    expand into gigabytes.
+    """
+    if compression is None:
+        return data
+    decompressor = Decompressor(compression)
+    pieces = []
+    size = 0
+    for out in itertools.chain(decompressor.update_chunks(data), decompressor.finalize_chunks()):
+        size += len(out)
+        if size > max_size:
+            raise ValueError(f"Decompressed data exceeds {max_size} bytes")
+        pieces.append(out)
+    return b''.join(pieces)
+
+
+def expand_stream(decryptor, src, dst, chunk_size=READ_SIZE, progress=None):
+    """Decrypt file object src into dst with an incremental decryptor, expanding compressed plaintext.
+
+    Output is written in bounded pieces whatever the compression ratio.
+    progress, if given, is called with the number of input bytes processed
+    so far.
+    """
+    expanding = DecompressingDecryptor(decryptor)
+    done = 0
+    while True:
+        chunk = src.read(chunk_size)
+        if not chunk:
+            break
+        for out in expanding.update_chunks(chunk):
+            dst.write(out)
+        done += len(chunk)
+        if progress:
+            progress(done)
+    for out in expanding.finalize_chunks():
+        dst.write(out)
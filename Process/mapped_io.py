@@ -0,0 +1,47 @@
+import os
+import mmap
+
+# Memory-mapped decryption for large files. The input is mapped read-only and
+# the output file is pre-sized to the input length and mapped read-write, so
+# ciphertext is read and plaintext written through the page cache instead of
+# being held as full-size bytes objects. The output is trimmed to the real
+# plaintext length afterwards.
+
+
+def _close(mapping):
+    try:
+        mapping.close()
+    except BufferError:
+        # A view into the mapping is still held by an exception traceback;
+        # the mapping is released together with it
+        pass
+
+
+def decrypt_mapped(input_path, output_path, decrypt):
+    """Run decrypt(src, out) -> plaintext length over mapped input and output files.
+
+    `out` is as large as the input, which bounds the plaintext of every
+    format in this project. On any error the output file is removed and the
+    exception re-raised.
+    """
+    try:
+        with open(input_path, 'rb') as src_file, open(output_path, 'w+b') as dst_file:
+            size = os.fstat(src_file.fileno()).st_size
+            if size == 0:
+                raise ValueError("Encrypted file is empty")
+            dst_file.truncate(size)
+            src = mmap.mmap(src_file.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                out = mmap.mmap(dst_file.fileno(), size)
+                try:
+                    length = decrypt(src, out)
+                finally:
+                    _close(out)
+            finally:
+                _close(src)
+            dst_file.truncate(length)
+    except Exception:
+        # Never leave a partially decrypted file behind
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        raise
@@ -0,0 +1,70 @@
+import os
+from collections import deque
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives import padding
+from cryptography.hazmat.backends import default_backend
+from Process import worker_pool
+
+# Parallel CBC decryption for existing .enc files (Blowfish and the RSA-hybrid
+# AES body). In CBC each plaintext block only depends on its own ciphertext
+# block and the one before it, so the body can be split at block boundaries
+# and each range decrypted independently with the preceding ciphertext block
+# as its IV. Only the last range carries the PKCS7 padding.
+
+DEFAULT_RANGE_SIZE = 4 * 1024 * 1024
+
+
+def _decrypt_range(algorithm_name, key, file_path, offset, length, block_size):
+    """Decrypt `length` bytes of CBC body at `offset`; the IV is the block before it."""
+    with open(file_path, 'rb') as f:
+        f.seek(offset - block_size)
+        iv = f.read(block_size)
+        data = f.read(length)
+    if len(iv) != block_size or len(data) != length:
+        raise ValueError("Encrypted file changed while it was being decrypted")
+    cipher = Cipher(getattr(algorithms, algorithm_name)(key), modes.CBC(iv), backend=default_backend())
+    decryptor = cipher.decryptor()
+    return decryptor.update(data) + decryptor.finalize()
+
+
+def decrypt_file_ranges(algorithm_name, key, file_path, body_offset, dst, workers=None,
+                        range_size=None, progress=None):
+    """Decrypt the CBC body of file_path into dst on `workers` processes of the shared pool.
+
+    The IV must be the `block_size` bytes immediately before body_offset, as in
+    both the Blowfish (IV + body) and RSA stream (header + key + IV + body)
+    layouts. progress, if given, is called with the number of input bytes
+    (header included) decrypted so far each time a range is written. Raises
+    ValueError if the body is not block aligned or the padding is invalid.
+    """
+    block_size = getattr(algorithms, algorithm_name).block_size // 8
+    body_length = os.path.getsize(file_path) - body_offset
+    if body_length <= 0 or body_length % block_size:
+        raise ValueError("Encrypted body is not a whole number of blocks")
+    range_size = range_size or DEFAULT_RANGE_SIZE
+    range_size = max(block_size, range_size - range_size % block_size)
+    workers = worker_pool.clamp(workers)
+
+    unpadder = padding.PKCS7(block_size * 8).unpadder()
+
+    def write_range(future, end):
+        dst.write(unpadder.update(future.result()))
+        if progress:
+            progress(end)
+
+    pool = worker_pool.get()
+    in_flight = deque()
+    try:
+        for offset in range(body_offset, body_offset + body_length, range_size):
+            length = min(range_size, body_offset + body_length - offset)
+            in_flight.append((pool.submit(_decrypt_range, algorithm_name, key, file_path, offset, length, block_size),
+                              offset + length))
+            if len(in_flight) >= 2 * workers:
+                write_range(*in_flight.popleft())
+        while in_flight:
+            write_range(*in_flight.popleft())
+    except BaseException as e:
+        # Failed or cancelled from progress: drop the queued ranges instead of waiting for them
+        worker_pool.cancel(in_flight, e)
+        raise
+    dst.write(unpadder.finalize())
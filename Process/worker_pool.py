@@ -0,0 +1,64 @@
+import os
+import threading
+from multiprocessing import util
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Process pool shared by the parallel file functions (fernet_stream's
+# *_parallel, parallel_cbc). Starting worker processes costs far more than
+# decrypting a few segments, and a pool per call also let every concurrent
+# call start its own set of processes. The pool is created on first use
+# with MAX_WORKERS processes and kept for the life of the process; a call's
+# `workers` only limits how many of its segments are in flight.
+
+MAX_WORKERS = os.cpu_count() or 1
+
+_lock = threading.Lock()
+_pool = None
+_pool_pid = None
+
+
+def clamp(workers):
+    """Segments a call keeps in flight per round: `workers`, at most MAX_WORKERS (None: all of them)."""
+    return max(1, min(workers or MAX_WORKERS, MAX_WORKERS))
+
+
+def get():
+    """Return the shared pool, starting it if needed.
+
+    A child forked from a process that already had a pool starts its own,
+    since the inherited one's worker processes belong to the parent.
+    """
+    global _pool, _pool_pid
+    with _lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ProcessPoolExecutor(max_workers=MAX_WORKERS)
+            _pool_pid = os.getpid()
+            # A pool worker process (CRYPTO_EXECUTOR=process) joins its children
+            # before threading's exit hooks run, so this pool must stop first,
+            # and before the finalizers of its own queues (exitpriority 10)
+            util.Finalize(_pool, _shutdown, args=(_pool, _pool_pid), exitpriority=100)
+        return _pool
+
+
+def _shutdown(pool, pid):
+    # The pool's own worker processes inherit this finalizer when forked
+    if os.getpid() == pid:
+        pool.shutdown(cancel_futures=True)
+
+
+def cancel(in_flight, error=None):
+    """Drop the queued work of a call that failed with error; in_flight holds (future, ...) tuples.
+
+    A BrokenProcessPool (a worker process died) breaks the pool for every
+    caller, so it is replaced on the next get().
+    """
+    global _pool
+    for future, *_ in in_flight:
+        future.cancel()
+    in_flight.clear()
+    if isinstance(error, BrokenProcessPool):
+        with _lock:
+            pool, _pool = _pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,350 @@
+"""
+Managed store for /encrypt and /decrypt results served by /download
+"""
+import os
+import time
+import shutil
+import secrets
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+class Artifact:
+    """A published result: a file at `path`, or `data` held in memory (path is None)."""
+    __slots__ = ("path", "filename", "size", "created", "last_access", "data", "spilling")
+
+    def __init__(self, filename, size, created, path=None, data=None):
+        self.path = path
+        self.filename = filename
+        self.size = size
+        self.created = created
+        self.last_access = created
+        self.data = data
+        self.spilling = False
+
+
+class ArtifactStore:
+    """Request workspaces and their published outputs under one root directory.
+
+    Every request gets a workspace <root>/<id[:2]>/<id>, so no directory
+    grows without bound. publish() keeps only the output file and adds it to
+    an in-memory index (id -> path, size) in LRU order. lookup() for
+    /download is a dict access with no filesystem probing. Artifacts expire
+    `ttl` seconds after publishing, and the least recently downloaded ones
+    are evicted when the published bytes exceed `max_bytes`. A background
+    sweeper expires artifacts and removes workspaces that were never
+    published or discarded, including ones left over from a previous run.
+
+    put() is the memory tier for results that are already in memory.
+    Outputs up to `memory_item_size` are kept as bytes, with no workspace
+    and no file I/O, and are served straight from RAM. Larger ones go to
+    disk. When the memory tier exceeds `memory_bytes`, its least recently
+    used entries spill to disk and remain downloadable under the same id.
+    """
+
+    def __init__(self, root=None, ttl=3600, max_bytes=10 * 1024 ** 3, sweep_interval=60,
+                 memory_bytes=64 * 1024 * 1024, memory_item_size=1024 * 1024):
+        self.root = root or os.path.join(tempfile.gettempdir(), "encryption-artifacts")
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self.memory_bytes = memory_bytes
+        self.memory_item_size = memory_item_size
+        self._artifacts = OrderedDict()
+        self._pending = {}
+        self._bytes = 0
+        self._memory_used = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sweeper = None
+        self.expired = 0
+        self.evicted = 0
+        self.reclaimed = 0
+        self.spilled = 0
+
+    def _workspace_path(self, artifact_id):
+        return os.path.join(self.root, artifact_id[:2], artifact_id)
+
+    def workspace(self):
+        """Create a workspace for one request; returns (artifact_id, directory)."""
+        artifact_id = secrets.token_hex(16)
+        path = self._workspace_path(artifact_id)
+        os.makedirs(path)
+        with self._lock:
+            self._pending[artifact_id] = time.time()
+        return artifact_id, path
+
+    def touch(self, artifact_id):
+        """Mark a workspace as still in use, so the sweeper does not reclaim it."""
+        with self._lock:
+            if artifact_id in self._pending:
+                self._pending[artifact_id] = time.time()
+
+    def hold(self, artifact_id):
+        """Keep a workspace until it is published or discarded, however long that takes (queued jobs)."""
+        with self._lock:
+            if artifact_id in self._pending:
+                self._pending[artifact_id] = float("inf")
+
+    def publish(self, artifact_id, output_path):
+        """Make output_path downloadable under artifact_id.
+
+        Everything else in the workspace (the uploaded input, ...) is removed.
+        """
+        workspace = self._workspace_path(artifact_id)
+        keep = os.path.relpath(output_path, workspace).split(os.sep)[0]
+        for entry in os.listdir(workspace):
+            if entry != keep:
+                _remove(os.path.join(workspace, entry))
+
+        artifact = Artifact(os.path.basename(output_path), os.path.getsize(output_path), time.time(), path=output_path)
+        with self._lock:
+            self._pending.pop(artifact_id, None)
+            self._artifacts[artifact_id] = artifact
+            self._bytes += artifact.size
+            victims = self._over_quota(artifact_id)
+        for victim in victims:
+            _remove(victim)
+
+    def restore(self, artifact_id, filename, created):
+        """Re-register an output published by a previous process; returns False if it is gone or expired.
+
+        The artifact keeps its original publishing time `created`, so it
+        expires on the same schedule as before the restart.
+        """
+        if time.time() - created > self.ttl:
+            return False
+        for directory, _, files in os.walk(self._workspace_path(artifact_id)):
+            if filename in files:
+                path = os.path.join(directory, filename)
+                break
+        else:
+            return False
+        artifact = Artifact(filename, os.path.getsize(path), created, path=path)
+        with self._lock:
+            if artifact_id in self._artifacts:
+                return True
+            self._artifacts[artifact_id] = artifact
+            self._bytes += artifact.size
+            victims = self._over_quota(artifact_id)
+        for victim in victims:
+            _remove(victim)
+        return True
+
+    def put(self, filename, data):
+        """Publish an in-memory result under a new id; returns the artifact id.
+
+        Small results stay in the memory tier, larger ones are written to a
+        workspace on disk. May write files, so call it off the event loop.
+        """
+        if len(data) > self.memory_item_size:
+            artifact_id, workspace = self.workspace()
+            output_path = os.path.join(workspace, filename)
+            try:
+                _write(output_path, data)
+                self.publish(artifact_id, output_path)
+            except Exception:
+                self.discard(artifact_id)
+                raise
+            return artifact_id
+
+        artifact_id = secrets.token_hex(16)
+        artifact = Artifact(filename, len(data), time.time(), data=bytes(data))
+        with self._lock:
+            self._artifacts[artifact_id] = artifact
+            self._memory_used += artifact.size
+            spills = self._over_memory()
+        for spill_id, spill in spills:
+            self._spill(spill_id, spill)
+        return artifact_id
+
+    def _over_memory(self):
+        # Called with the lock held; picks the least recently used memory
+        # artifacts to move to disk. They keep serving from memory until
+        # _spill() swaps them over.
+        spills = []
+        for artifact_id, artifact in self._artifacts.items():
+            if self._memory_used <= self.memory_bytes:
+                break
+            if artifact.data is not None and not artifact.spilling:
+                artifact.spilling = True
+                self._memory_used -= artifact.size
+                spills.append((artifact_id, artifact))
+        return spills
+
+    def _spill(self, artifact_id, artifact):
+        workspace = self._workspace_path(artifact_id)
+        output_path = os.path.join(workspace, artifact.filename)
+        try:
+            os.makedirs(workspace, exist_ok=True)
+            _write(output_path, artifact.data)
+        except OSError as e:
+            print(f"Artifact spill failed: {e}")
+            self.discard(artifact_id)
+            return
+        with self._lock:
+            if self._artifacts.get(artifact_id) is not artifact:
+                # Discarded or expired while being written
+                victims = [workspace]
+            else:
+                artifact.path, artifact.data = output_path, None
+                self._bytes += artifact.size
+                self.spilled += 1
+                victims = self._over_quota(artifact_id)
+        for victim in victims:
+            _remove(victim)
+
+    def _forget(self, artifact_id):
+        # Called with the lock held; drops an artifact from the index and totals
+        artifact = self._artifacts.pop(artifact_id)
+        if artifact.data is None:
+            self._bytes -= artifact.size
+        elif not artifact.spilling:
+            self._memory_used -= artifact.size
+        return artifact
+
+    def discard(self, artifact_id):
+        """Drop a workspace or artifact and its files."""
+        with self._lock:
+            self._pending.pop(artifact_id, None)
+            if artifact_id in self._artifacts:
+                self._forget(artifact_id)
+        _remove(self._workspace_path(artifact_id))
+
+    def lookup(self, artifact_id, filename):
+        """Return the live Artifact for a download, or None.
+
+        Serve artifact.data when it is not None, otherwise the file at artifact.path.
+        """
+        with self._lock:
+            artifact = self._artifacts.get(artifact_id)
+            if artifact is None or artifact.filename != filename:
+                return None
+            now = time.time()
+            if now - artifact.created <= self.ttl:
+                artifact.last_access = now
+                self._artifacts.move_to_end(artifact_id)
+                return artifact
+            self._forget(artifact_id)
+            self.expired += 1
+        _remove(self._workspace_path(artifact_id))
+        return None
+
+    def _over_quota(self, keep):
+        # Called with the lock held; returns the workspaces to delete
+        victims = []
+        for artifact_id, artifact in list(self._artifacts.items()):
+            if self._bytes <= self.max_bytes:
+                break
+            if artifact_id == keep or artifact.data is not None:
+                continue
+            self._forget(artifact_id)
+            self.evicted += 1
+            victims.append(self._workspace_path(artifact_id))
+        return victims
+
+    def sweep(self, now=None):
+        """Expire artifacts and reclaim abandoned workspaces; returns the number of directories removed."""
+        now = time.time() if now is None else now
+        victims = []
+        with self._lock:
+            for artifact_id, artifact in list(self._artifacts.items()):
+                if now - artifact.created > self.ttl:
+                    self._forget(artifact_id)
+                    self.expired += 1
+                    victims.append(self._workspace_path(artifact_id))
+            for artifact_id, created in list(self._pending.items()):
+                if now - created > self.ttl:
+                    del self._pending[artifact_id]
+                    self.reclaimed += 1
+                    victims.append(self._workspace_path(artifact_id))
+            known = set(self._artifacts) | set(self._pending)
+        for path in victims:
+            _remove(path)
+
+        # Directories nobody knows about: leaked by a crash or a previous process
+        removed = len(victims)
+        for shard in _listdir(self.root):
+            shard_path = os.path.join(self.root, shard)
+            for artifact_id in _listdir(shard_path):
+                path = os.path.join(shard_path, artifact_id)
+                if artifact_id not in known and now - _mtime(path) > self.ttl:
+                    self.reclaimed += 1
+                    removed += 1
+                    _remove(path)
+        return removed
+
+    def start(self):
+        """Start the background sweeper thread."""
+        os.makedirs(self.root, exist_ok=True)
+        if self._sweeper is None:
+            self._stop.clear()
+            self._sweeper = threading.Thread(target=self._run_sweeper, name="artifact-sweeper", daemon=True)
+            self._sweeper.start()
+
+    def _run_sweeper(self):
+        while not self._stop.wait(self.sweep_interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Artifact sweep failed: {e}")
+
+    def shutdown(self):
+        self._stop.set()
+        if self._sweeper is not None:
+            self._sweeper.join()
+            self._sweeper = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "root": self.root,
+                "artifacts": len(self._artifacts),
+                "pending": len(self._pending),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "memory_bytes": self._memory_used,
+                "max_memory_bytes": self.memory_bytes,
+                "ttl": self.ttl,
+                "expired": self.expired,
+                "evicted": self.evicted,
+                "reclaimed": self.reclaimed,
+                "spilled": self.spilled,
+            }
+
+
+def _remove(path):
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def _write(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def _listdir(path):
+    try:
+        return os.listdir(path)
+    except OSError:
+        return []
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return 0
+
+
+artifact_store = ArtifactStore(
+    root=os.environ.get("ARTIFACT_DIR"),
+    ttl=int(os.environ.get("ARTIFACT_TTL", 3600)),
+    max_bytes=int(os.environ.get("ARTIFACT_MAX_BYTES", 10 * 1024 ** 3)),
+    sweep_interval=int(os.environ.get("ARTIFACT_SWEEP_INTERVAL", 60)),
+    memory_bytes=int(os.environ.get("ARTIFACT_MEMORY_BYTES", 64 * 1024 * 1024)),
+    memory_item_size=int(os.environ.get("ARTIFACT_MEMORY_ITEM_SIZE", 1024 * 1024)),
+)
@@ -0,0 +1,102 @@
+"""
+Bounded executors that keep blocking crypto and file I/O off the event loop
+"""
+import os
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+
+class ExecutorBusy(Exception):
+    """Raised when an executor already has max_workers + max_queue jobs admitted."""
+
+
+class BoundedExecutor:
+    """Thread or process pool with a bounded admission queue.
+
+    Jobs beyond max_workers wait in the pool's queue; once max_queue jobs are
+    waiting, run() raises ExecutorBusy instead of letting the backlog grow.
+    """
+
+    def __init__(self, name, kind="thread", max_workers=None, max_queue=None):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown executor kind: {kind}")
+        self.name = name
+        self.kind = kind
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_queue = self.max_workers * 4 if max_queue is None else max_queue
+        self._executor = None
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+
+    def _get_executor(self):
+        # Created lazily so importing the app does not spawn worker processes
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+        return self._executor
+
+    async def run(self, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) in the pool and await its result."""
+        if self._pending >= self.max_workers + self.max_queue:
+            self._rejected += 1
+            raise ExecutorBusy(f"{self.name} executor queue is full")
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), functools.partial(fn, *args, **kwargs))
+        finally:
+            self._pending -= 1
+            self._completed += 1
+
+    def stats(self):
+        return {
+            "kind": self.kind,
+            "workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "running": min(self._pending, self.max_workers),
+            "queued": max(0, self._pending - self.max_workers),
+            "completed": self._completed,
+            "rejected": self._rejected,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+def _env_int(name):
+    value = os.environ.get(name)
+    return int(value) if value else None
+
+
+# Whole-file encrypt/decrypt jobs; set CRYPTO_EXECUTOR=process for CPU isolation
+crypto_executor = BoundedExecutor(
+    "crypto",
+    kind=os.environ.get("CRYPTO_EXECUTOR", "thread"),
+    max_workers=_env_int("CRYPTO_WORKERS"),
+    max_queue=_env_int("CRYPTO_QUEUE_SIZE"),
+)
+
+# Upload copies and stateful incremental ciphers, which cannot leave the process
+io_executor = BoundedExecutor(
+    "io",
+    kind="thread",
+    max_workers=_env_int("IO_WORKERS"),
+    max_queue=_env_int("IO_QUEUE_SIZE"),
+)
+
+EXECUTORS = {"crypto": crypto_executor, "io": io_executor}
+
+
+def executor_stats():
+    return {name: executor.stats() for name, executor in EXECUTORS.items()}
+
+
+def shutdown_executors():
+    for executor in EXECUTORS.values():
+        executor.shutdown()
@@ -7,6 +7,8 @@ const algorithms = [
   { value: 'aes128', label: 'AES-128' },
   { value: 'blowfish', label: 'Blowfish' },
   { value: 'rsa', label: 'RSA' },
+  { value: 'aes256gcm', label: 'AES-256-GCM' },
+  { value: 'chacha20poly1305', label: 'ChaCha20-Poly1305' },
 ];
 
 
@@ -1,4 +1,4 @@
-import React, { useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import { Box, Typography, Paper, TextField, Button, MenuItem, InputLabel, Select, FormControl, LinearProgress, Alert } from '@mui/material';
 import axios from 'axios';
 
@@ -7,23 +7,89 @@ const algorithms = [
   { value: 'aes128', label: 'AES-128' },
   { value: 'blowfish', label: 'Blowfish' },
   { value: 'rsa', label: 'RSA' },
+  { value: 'aes256gcm', label: 'AES-256-GCM' },
+  { value: 'chacha20poly1305', label: 'ChaCha20-Poly1305' },
+];
+
+// Compression happens before encryption; files that do not compress are stored as they are
+const compressionOptions = [
+  { value: 'none', label: 'No compression' },
+  { value: 'auto', label: 'Automatic' },
+  { value: 'zlib', label: 'zlib (fast)' },
+  { value: 'lzma', label: 'LZMA (smallest, slow)' },
 ];
 
 const backendUrl = "http://localhost:8000";
 
+const stageLabels = {
+  upload: 'Uploading',
+  received: 'Starting',
+  save: 'Saving upload',
+  queued: 'Queued',
+  encrypt: 'Encrypting',
+  done: 'Done',
+};
+
+const formatRate = (bytesPerSecond) => bytesPerSecond ? `${(bytesPerSecond / (1024 * 1024)).toFixed(1)} MB/s` : '';
+
+// Server-Sent Events from /progress/{id}; calls onState for each update until the work finishes
+function watchProgress(progressId, onState) {
+  const source = new EventSource(`/api/progress/${progressId}`);
+  source.addEventListener('progress', (event) => {
+    const state = JSON.parse(event.data);
+    onState(state);
+    if (['done', 'failed', 'cancelled'].includes(state.stage)) source.close();
+  });
+  source.addEventListener('unknown', () => source.close());
+  return source;
+}
+
 function EncryptPage() {
   const [file, setFile] = useState(null);
   const [algorithm, setAlgorithm] = useState('aes256');
   const [key, setKey] = useState('');
+  const [compress, setCompress] = useState('none');
   const [loading, setLoading] = useState(false);
   const [result, setResult] = useState(null);
   const [error, setError] = useState('');
+  const [progress, setProgress] = useState(null);
+  const abortRef = useRef(null);
+  const sourceRef = useRef(null);
+  const cancelJobRef = useRef(null);
+
+  const stopWatching = () => {
+    sourceRef.current?.close();
+    sourceRef.current = null;
+  };
+
+  useEffect(() => stopWatching, []);
+
+  // Large uploads are queued as a job (202); follow it until its result link is ready
+  const followJob = (job) => new Promise((resolve, reject) => {
+    stopWatching();
+    sourceRef.current = watchProgress(job.job_id, (state) => {
+      setProgress(state);
+      if (state.stage === 'done') resolve({ original_file: job.filename, encrypted_file: state.result });
+      if (state.stage === 'failed' || state.stage === 'cancelled') reject(new Error(state.error || `Job ${state.stage}`));
+    });
+    // Queued jobs are dropped; a running one stops at its next chunk
+    cancelJobRef.current = () => {
+      axios.delete(`/api/jobs/${job.job_id}`).catch(() => {});
+      reject(new axios.Cancel('Job cancelled'));
+    };
+  });
 
   const handleSubmit = async (e) => {
     e.preventDefault();
     setLoading(true);
     setError('');
     setResult(null);
+    setProgress({ stage: 'upload', progress: 0 });
+    const progressId = crypto.randomUUID();
+    const controller = new AbortController();
+    abortRef.current = controller;
+    // Subscribe before sending; the server waits for the id to appear
+    sourceRef.current = watchProgress(progressId, (state) => setProgress(state));
     try {
       const formData = new FormData();
       formData.append('file', file);
@@ -32,15 +98,36 @@ function EncryptPage() {
       // You may need to adjust the API endpoint and payload as per your backend
       const response = await axios.post('/api/encrypt', formData, {
         headers: { 'Content-Type': 'multipart/form-data' },
+        params: { progress_id: progressId, ...(compress !== 'none' && { compress }) },
+        signal: controller.signal,
+        onUploadProgress: (event) => setProgress((current) => current?.stage && current.stage !== 'upload' ? current : {
+          stage: 'upload',
+          progress: event.total ? event.loaded / event.total : null,
+          bytes_per_second: event.rate,
+        }),
       });
-      setResult(response.data);
+      setResult(response.status === 202 ? await followJob(response.data) : response.data);
     } catch (err) {
-      setError(err.response?.data?.detail || 'Encryption failed');
+      if (axios.isCancel(err)) {
+        setError('Encryption cancelled');
+      } else {
+        setError(err.response?.data?.detail || err.message || 'Encryption failed');
+      }
     } finally {
+      stopWatching();
+      abortRef.current = null;
+      cancelJobRef.current = null;
       setLoading(false);
     }
   };
 
+  const handleCancel = () => {
+    abortRef.current?.abort();
+    cancelJobRef.current?.();
+  };
+
+  const percent = progress?.progress != null ? Math.round(progress.progress * 100) : null;
+
   return (
     <Paper sx={{ p: 4 }}>
       <Typography variant="h5" gutterBottom>Encrypt a File</Typography>
@@ -51,6 +138,12 @@ function EncryptPage() {
             {algorithms.map(a => <MenuItem key={a.value} value={a.value}>{a.label}</MenuItem>)}
           </Select>
         </FormControl>
+        <FormControl fullWidth>
+          <InputLabel>Compression</InputLabel>
+          <Select value={compress} label="Compression" onChange={e => setCompress(e.target.value)}>
+            {compressionOptions.map(c => <MenuItem key={c.value} value={c.value}>{c.label}</MenuItem>)}
+          </Select>
+        </FormControl>
         <TextField label="Encryption Key" value={key} onChange={e => setKey(e.target.value)} required type="password" />
         <Button variant="contained" component="label">
           Choose File
@@ -58,7 +151,20 @@ function EncryptPage() {
         </Button>
         {file && <Typography variant="body2">Selected: {file.name}</Typography>}
         <Button type="submit" variant="contained" disabled={loading || !file || !key}>Encrypt</Button>
-        {loading && <LinearProgress />}
+        {loading && (
+          <Box>
+            <LinearProgress variant={percent != null ? 'determinate' : 'indeterminate'} value={percent ?? 0} />
+            <Box sx={{ display: 'flex', justifyContent: 'space-between', alignItems: 'center', mt: 1 }}>
+              <Typography variant="body2">
+                {stageLabels[progress?.stage] || progress?.stage}
+                {percent != null && ` ${percent}%`}
+                {progress?.bytes_per_second ? ` at ${formatRate(progress.bytes_per_second)}` : ''}
+                {progress?.eta_seconds != null && ` (about ${Math.ceil(progress.eta_seconds)} s left)`}
+              </Typography>
+              <Button size="small" color="secondary" onClick={handleCancel}>Cancel</Button>
+            </Box>
+          </Box>
+        )}
         {result && (
           <Alert severity="success">
             Encrypted successfully!
@@ -0,0 +1,99 @@
+"""
+Range requests and validators for /download (RFC 9110 sections 13 and 14)
+"""
+import secrets
+
+# More ranges than this (after merging) are ignored and the whole file is sent
+MAX_RANGES = 16
+
+
+def make_etag(artifact_id, size, created):
+    """Strong ETag for an artifact; ids are never reused, so metadata identifies the content."""
+    return f'"{artifact_id}-{size:x}-{int(created * 1000):x}"'
+
+
+def etag_matches(header, etag):
+    """If-None-Match check (weak comparison, so W/ tags match too)."""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    tags = (tag.strip() for tag in header.split(","))
+    return any((tag[2:] if tag.startswith("W/") else tag) == etag for tag in tags)
+
+
+def if_range_matches(header, etag):
+    """If-Range check: ranges apply only when the header is absent or the exact strong ETag.
+
+    HTTP dates are not accepted as validators and mean the whole file is sent.
+    """
+    return header is None or header.strip() == etag
+
+
+def parse_range(header, size):
+    """Parse a Range header against a representation of `size` bytes.
+
+    Returns None when the header is absent, malformed or asks for too many
+    ranges (the whole file is sent), [] when no range is satisfiable (416),
+    and otherwise a sorted list of merged, inclusive (start, end) pairs.
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or not spec.strip():
+        return None
+
+    ranges = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, dash, last = part.partition("-")
+        first, last = first.strip(), last.strip()
+        if not dash or not (first or last) or not all(value.isdigit() for value in (first, last) if value):
+            return None
+        if not first:
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length and size:
+                ranges.append((max(0, size - length), size - 1))
+            continue
+        start = int(first)
+        end = int(last) if last else size - 1
+        if last and end < start:
+            return None
+        if start < size:
+            ranges.append((start, min(end, size - 1)))
+
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    if len(merged) > MAX_RANGES:
+        return None
+    return merged
+
+
+def content_range(start, end, size):
+    return f"bytes {start}-{end}/{size}"
+
+
+def multipart_layout(ranges, size, content_type):
+    """Lay out a multipart/byteranges body.
+
+    Returns (media_type, parts, trailer, length): parts is a list of
+    (part header bytes, start, end); each part's data is followed by CRLF, and
+    the body ends with trailer. length is the exact body size for Content-Length.
+    """
+    boundary = secrets.token_hex(16)
+    parts = []
+    length = 0
+    for start, end in ranges:
+        header = (f"--{boundary}\r\nContent-Type: {content_type}\r\n"
+                  f"Content-Range: {content_range(start, end, size)}\r\n\r\n").encode("ascii")
+        parts.append((header, start, end))
+        length += len(header) + end - start + 1 + 2
+    trailer = f"--{boundary}--\r\n".encode("ascii")
+    return f"multipart/byteranges; boundary={boundary}", parts, trailer, length + len(trailer)
@@ -0,0 +1,243 @@
+"""
+Asynchronous encrypt/decrypt jobs for /jobs, persisted in SQLite
+"""
+import os
+import time
+import sqlite3
+import threading
+from artifacts import artifact_store
+from Process.cancellation import CancelToken, Cancelled
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    operation TEXT NOT NULL,
+    algorithm TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    input_path TEXT NOT NULL,
+    binary INTEGER NOT NULL DEFAULT 0,
+    compression TEXT,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    bytes_total INTEGER NOT NULL,
+    bytes_done INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority DESC, created);
+"""
+
+# Progress is written to the database at most this often per job
+_PROGRESS_INTERVAL = 1.0
+
+
+class JobQueue:
+    """Priority queue of file jobs run by `workers` background threads.
+
+    Jobs, their status, progress and result links are rows in a SQLite
+    database, so they survive a restart and stay visible to /jobs. On the
+    next start, the outputs of finished jobs are registered with the
+    artifact store again for the rest of their TTL. Links whose output has
+    expired or is gone are cleared. Keys are deliberately kept in memory
+    only. A job that was queued or running when the process stopped is
+    therefore marked failed on the next start, rather than run with a key
+    written to disk.
+
+    Each job's input and output live in its own artifact store workspace;
+    the output is published under the job id, so results are served by
+    /download like any other artifact.
+    """
+
+    def __init__(self, db_path=None, workers=2, store=artifact_store):
+        self.store = store
+        self.db_path = db_path or os.path.join(store.root, "jobs.sqlite3")
+        self.workers = workers
+        self.handler = None
+        self._db = None
+        self._keys = {}
+        self._progress = {}
+        self._tokens = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._threads = []
+        self._stopping = False
+
+    def _connect(self):
+        # Called with the lock held
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+            self._db.row_factory = sqlite3.Row
+            self._db.executescript(_SCHEMA)
+            # Databases created before jobs could compress lack the column
+            columns = {row["name"] for row in self._db.execute("PRAGMA table_info(jobs)")}
+            if "compression" not in columns:
+                self._db.execute("ALTER TABLE jobs ADD COLUMN compression TEXT")
+            # Keys did not survive the restart, so unfinished jobs cannot run
+            self._db.execute("UPDATE jobs SET status = ?, error = ?, finished = ? WHERE status IN (?, ?)",
+                             (FAILED, "Interrupted by a server restart; submit the file again", time.time(), QUEUED, RUNNING))
+            # The artifact index is in memory: serve finished outputs again, published when the job finished
+            for row in self._db.execute("SELECT id, result, finished FROM jobs WHERE status = ? AND result IS NOT NULL",
+                                        (DONE,)).fetchall():
+                if not self.store.restore(row["id"], os.path.basename(row["result"]), row["finished"]):
+                    self._db.execute("UPDATE jobs SET result = NULL WHERE id = ?", (row["id"],))
+        return self._db
+
+    def start(self, handler=None):
+        """Start the worker threads. handler(job, key, progress) runs one job and returns the output path."""
+        with self._lock:
+            if handler is not None:
+                self.handler = handler
+            self._connect()
+            self._stopping = False
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._run_worker, name=f"job-worker-{len(self._threads)}", daemon=True)
+                self._threads.append(thread)
+                thread.start()
+
+    def shutdown(self):
+        with self._lock:
+            self._stopping = True
+            self._wakeup.notify_all()
+            threads, self._threads = self._threads, []
+        for thread in threads:
+            thread.join(timeout=1)
+
+    def submit(self, operation, algorithm, key, filename, input_path, priority=0, binary=False, compression=None):
+        """Queue a job for a file saved in a store workspace; returns the job id (= the workspace id).
+
+        compression is the codec an encrypt job compresses with, None for none.
+        """
+        job_id = os.path.basename(os.path.dirname(input_path))
+        size = os.path.getsize(input_path)
+        if not self._threads:
+            self.start()
+        with self._lock:
+            self._connect().execute(
+                "INSERT INTO jobs (id, operation, algorithm, filename, input_path, binary, compression, priority, status, bytes_total, "
+                "created) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, operation, algorithm, filename, input_path, int(binary), compression, priority, QUEUED, size,
+                 time.time()))
+            self._keys[job_id] = key
+            self._wakeup.notify()
+        self.store.hold(job_id)
+        return job_id
+
+    def get(self, job_id):
+        """Job status as a dict, with live progress and an ETA for running jobs; None if unknown."""
+        with self._lock:
+            row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            job = dict(row)
+            job["binary"] = bool(job["binary"])
+            if job_id in self._progress:
+                job["bytes_done"] = self._progress[job_id][0]
+            if job["status"] == QUEUED:
+                job["position"] = self._connect().execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = ? AND (priority > ? OR (priority = ? AND created < ?))",
+                    (QUEUED, job["priority"], job["priority"], job["created"])).fetchone()[0]
+        job["eta"] = None
+        if job["status"] == RUNNING and job["bytes_done"]:
+            rate = job["bytes_done"] / max(time.time() - job["started"], 1e-6)
+            job["eta"] = (job["bytes_total"] - job["bytes_done"]) / rate
+        return job
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job; returns False if it is unknown or already finished.
+
+        A running job stops at its next chunk; its worker records the
+        cancellation and removes the workspace.
+        """
+        with self._lock:
+            token = self._tokens.get(job_id)
+            if token is not None:
+                token.cancel("Cancelled by request")
+                return True
+            cursor = self._connect().execute("UPDATE jobs SET status = ?, finished = ? WHERE id = ? AND status = ?",
+                                             (CANCELLED, time.time(), job_id, QUEUED))
+            if not cursor.rowcount:
+                return False
+            self._keys.pop(job_id, None)
+        self.store.discard(job_id)
+        return True
+
+    def _claim(self):
+        # Called with the lock held: the highest-priority, oldest queued job becomes running
+        rows = self._connect().execute(
+            "UPDATE jobs SET status = ?, started = ? WHERE id = "
+            "(SELECT id FROM jobs WHERE status = ? ORDER BY priority DESC, created LIMIT 1) RETURNING *",
+            (RUNNING, time.time(), QUEUED)).fetchall()
+        return dict(rows[0]) if rows else None
+
+    def _run_worker(self):
+        while True:
+            with self._lock:
+                job = None
+                while not self._stopping:
+                    job = self._claim()
+                    if job is not None:
+                        break
+                    self._wakeup.wait()
+                if job is None:
+                    return
+                key = self._keys.pop(job["id"], None)
+                self._progress[job["id"]] = [0, 0.0]
+                self._tokens[job["id"]] = CancelToken()
+            self._run(job, key)
+
+    def _run(self, job, key):
+        job_id = job["id"]
+        token = self._tokens[job_id]
+
+        def progress(done):
+            # Called by the handler with the number of input bytes processed so far;
+            # raises Cancelled once the job is cancelled
+            token.check()
+            now = time.time()
+            with self._lock:
+                state = self._progress[job_id]
+                state[0] = done
+                if now - state[1] >= _PROGRESS_INTERVAL:
+                    state[1] = now
+                    self._db.execute("UPDATE jobs SET bytes_done = ? WHERE id = ?", (done, job_id))
+
+        try:
+            if key is None:
+                raise RuntimeError("Job key is not available")
+            job["binary"] = bool(job["binary"])
+            output_path = self.handler(job, key, progress)
+            self.store.publish(job_id, output_path)
+            status, result, error = DONE, f"/download/{job_id}/{os.path.basename(output_path)}", None
+        except Cancelled as e:
+            self.store.discard(job_id)
+            status, result, error = CANCELLED, None, str(e)
+        except Exception as e:
+            self.store.discard(job_id)
+            status, result, error = FAILED, None, f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+        with self._lock:
+            del self._tokens[job_id]
+            done = self._progress.pop(job_id)[0]
+            self._db.execute("UPDATE jobs SET status = ?, result = ?, error = ?, bytes_done = ?, finished = ? WHERE id = ?",
+                             (status, result, error, job["bytes_total"] if status == DONE else done, time.time(), job_id))
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._connect().execute(
+                "SELECT status, COUNT(*) FROM jobs WHERE status IN (?, ?) GROUP BY status", (QUEUED, RUNNING)).fetchall())
+        return {"workers": self.workers, "queued": counts.get(QUEUED, 0), "running": counts.get(RUNNING, 0)}
+
+
+job_queue = JobQueue(
+    db_path=os.environ.get("JOBS_DB"),
+    workers=int(os.environ.get("JOB_WORKERS", 2)),
+)
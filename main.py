@@ -1,18 +1,39 @@
 import os
-import tempfile
+import sys
+import json
+import time
 import shutil
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form
+import asyncio
+import functools
+from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Request, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse, JSONResponse, Response
 from pydantic import BaseModel, Field
 from typing import List, Optional
 import base64
+import urllib.parse
+from email.utils import formatdate
 
 # Import existing encryption modules
 from Process.Symmetric_algo.Encryption_algo.aes256 import encrypt_file as aes256_encrypt
 from Process.Symmetric_algo.Encryption_algo.aes128 import encrypt_file as aes128_encrypt
 from Process.Symmetric_algo.Encryption_algo.blowfish import encrypt_file as blowfish_encrypt
 from Process.Asymmetric_algo.Encryption.rsa.rsa import encrypt_file as rsa_encrypt
+from Process.Symmetric_algo.Encryption_algo import aes256, aes128, blowfish, aes256gcm, chacha20poly1305
+from Process.Symmetric_algo.Decryption_algo import aes256_dec, aes128_dec, blowfish_dec, aes256gcm_dec, chacha20poly1305_dec
+from Process.Asymmetric_algo.Encryption.rsa import rsa
+from Process.Asymmetric_algo.Decryption.rsa import rsa_dec
+from Process.Asymmetric_algo.key_store import default_store as key_store
+from Process.Asymmetric_algo.key_pool import default_pool as rsa_key_pool, SUPPORTED_KEY_SIZES
+from executors import crypto_executor, io_executor, executor_stats, shutdown_executors, ExecutorBusy
+from artifacts import artifact_store
+from uploads import upload_sessions, ChunkConflict
+from jobs import job_queue
+from progress import progress_tracker, valid_id as valid_progress_id
+from Process.cancellation import Cancelled, DeadlineExceeded
+from Process import compression
+import http_ranges
 
 # Create FastAPI app
 app = FastAPI(
@@ -30,13 +51,46 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+def start_key_pool():
+    # Pre-generate RSA key pairs in the background for /generate-key?algorithm=rsa
+    rsa_key_pool.start()
+
+@app.on_event("startup")
+def start_artifact_sweeper():
+    # Expires /download artifacts and reclaims workspaces leaked on error paths
+    artifact_store.start()
+
+@app.on_event("startup")
+def start_job_workers():
+    # Background workers for /jobs and for large uploads routed to jobs
+    job_queue.start()
+
+@app.on_event("shutdown")
+def stop_executors():
+    rsa_key_pool.shutdown()
+    job_queue.shutdown()
+    artifact_store.shutdown()
+    shutdown_executors()
+
+# A full executor queue is backpressure, not a server error
+@app.exception_handler(ExecutorBusy)
+async def executor_busy_handler(request: Request, exc: ExecutorBusy):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+# Work stopped by REQUEST_DEADLINE, or by the client going away (499, as nginx logs it; nobody reads the body)
+@app.exception_handler(Cancelled)
+async def cancelled_handler(request: Request, exc: Cancelled):
+    status_code = 504 if isinstance(exc, DeadlineExceeded) else 499
+    return JSONResponse(status_code=status_code, content={"detail": str(exc)})
+
 # Root endpoint for friendly landing page
 @app.get("/")
 async def root():
     return {
         "message": "Welcome to the Encryption Service API!",
         "docs": "/docs",
-        "endpoints": ["/encrypt", "/decrypt", "/generate-key", "/health", "/docs"]
+        "endpoints": ["/encrypt", "/decrypt", "/encrypt/stream", "/decrypt/stream", "/generate-key", "/health", "/docs"]
     }
 
 # Encryption algorithm types
@@ -45,6 +99,76 @@ class EncryptionAlgorithm:
     AES128 = "aes128"
     BLOWFISH = "blowfish"
     RSA = "rsa"
+    AES256GCM = "aes256gcm"
+    CHACHA20POLY1305 = "chacha20poly1305"
+
+# Upper bound for the per-file ?workers= option (segment-parallel AES, range-parallel CBC decrypt)
+MAX_FILE_WORKERS = int(os.environ.get("MAX_FILE_WORKERS", os.cpu_count() or 1))
+
+# Saved uploads at least this large are decrypted with memory-mapped input and output files
+MMAP_DECRYPT_SIZE = int(os.environ.get("MMAP_DECRYPT_SIZE", 64 * 1024 * 1024))
+
+def file_workers(requested):
+    """Clamp a requested per-file worker count to MAX_FILE_WORKERS."""
+    if not requested or requested < 2:
+        return None
+    return min(requested, MAX_FILE_WORKERS)
+
+def compression_codec(requested):
+    """Validate a ?compress= codec name; None means no compression."""
+    try:
+        return compression.resolve(requested)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# Encrypt/decrypt work still running this many seconds into a request is cancelled (0 disables)
+REQUEST_DEADLINE = float(os.environ.get("REQUEST_DEADLINE", 0))
+DISCONNECT_POLL_INTERVAL = 0.5
+CANCEL_FLAG = ".cancel"
+
+def start_progress(progress_id, operation, total=None):
+    """Progress for a request; published on /progress/{progress_id} when the client chose an id."""
+    if progress_id is not None and not valid_progress_id(progress_id):
+        raise HTTPException(status_code=400, detail="progress_id must be 1-64 letters, digits, '-' or '_'")
+    deadline = time.monotonic() + REQUEST_DEADLINE if REQUEST_DEADLINE else None
+    return progress_tracker.begin(progress_id, operation, total, deadline)
+
+def crypto_progress(progress, workspace):
+    # Callbacks cannot be sent to a process pool: there the worker polls a flag
+    # file in the workspace for cancellation, and a stage only reports when it ends
+    if crypto_executor.kind == "thread":
+        return {"progress": progress}
+    return {"progress": progress.token.flag_file(os.path.join(workspace, CANCEL_FLAG))}
+
+def error_message(exc):
+    if isinstance(exc, HTTPException):
+        return str(exc.detail)
+    return str(exc) or type(exc).__name__
+
+async def watch_disconnect(request, token):
+    # Runs beside a request's work; the crypto stops at its next chunk once the client is gone
+    while not await request.is_disconnected():
+        await asyncio.sleep(DISCONNECT_POLL_INTERVAL)
+    token.cancel("Client disconnected")
+
+async def tracked(progress, work, request=None):
+    """Await a route's work and finish its progress; inline (streamed) bodies finish it when they end.
+
+    With request set, a client disconnect cancels progress.token, so
+    the work stops between chunks and its workspace is discarded.
+    """
+    watcher = asyncio.ensure_future(watch_disconnect(request, progress.token)) if request is not None else None
+    try:
+        response = await work
+    except Exception as e:
+        progress.finish(error=error_message(e))
+        raise
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+    if not isinstance(response, StreamingResponse):
+        progress.finish()
+    return response
 
 # Encryption response model
 class EncryptionResponse(BaseModel):
@@ -57,42 +181,99 @@ class EncryptionResponse(BaseModel):
 @app.post("/encrypt", response_model=EncryptionResponse)
 @app.post("/api/encrypt", response_model=EncryptionResponse)  # Add both endpoints
 async def encrypt_file_upload(
+    request: Request,
     file: UploadFile = File(...),
     algorithm: str = Form(...),
-    key: str = Form(...)
+    key: str = Form(...),
+    inline: bool = False,
+    workers: Optional[int] = None,
+    binary: bool = False,
+    compress: Optional[str] = None,
+    progress_id: Optional[str] = None
 ):
+    # ?compress=zlib|lzma|zstd|auto compresses the plaintext before encryption
+    codec = compression_codec(compress)
+    # A client-chosen progress_id publishes this request's progress on /progress/{progress_id}
+    progress = start_progress(progress_id, "encrypt", file.size)
+    return await tracked(progress, encrypt_upload(file, algorithm, key, inline, workers, binary, codec, progress), request)
+
+async def encrypt_upload(file, algorithm, key, inline, workers, binary, codec, progress):
     try:
         # Validate algorithm
         if algorithm not in [EncryptionAlgorithm.AES256, EncryptionAlgorithm.AES128,
-                           EncryptionAlgorithm.BLOWFISH, EncryptionAlgorithm.RSA]:
+                           EncryptionAlgorithm.BLOWFISH, EncryptionAlgorithm.RSA,
+                           EncryptionAlgorithm.AES256GCM, EncryptionAlgorithm.CHACHA20POLY1305]:
             raise HTTPException(status_code=400, detail="Unsupported encryption algorithm")
+        workers = file_workers(workers)
+
+        # Stream the ciphertext back in this response instead of a /download link
+        if inline:
+            progress.set_stage("encrypt")
+            if is_small_upload(file):
+                encrypted = await encrypt_payload(algorithm, key, await file.read(), binary, codec)
+                return Response(encrypted, media_type='application/octet-stream',
+                                headers=attachment_headers(f"{file.filename}.enc"))
+            encryptor = await io_executor.run(make_stream_encryptor, algorithm, key, binary, codec)
+            return await inline_response(encryptor, upload_chunks(file), f"{file.filename}.enc", progress)
+
+        # Very large uploads become a background job instead of holding the request open
+        if routes_to_job(file, workers):
+            return await submit_job("encrypt", file, algorithm, key, binary=binary, compression=codec)
         
-        # Create temporary directory for processing
-        temp_dir = tempfile.mkdtemp()
+        if is_small_upload(file):
+            # Small uploads are encrypted in memory and kept in the artifact
+            # store's memory tier; nothing touches the filesystem
+            progress.set_stage("encrypt")
+            output_filename = f"{file.filename}.enc"
+            encrypted = await encrypt_payload(algorithm, key, await file.read(), binary, codec)
+            artifact_id = await io_executor.run(artifact_store.put, output_filename, encrypted)
+            return EncryptionResponse(
+                original_file=file.filename,
+                encrypted_file=f"/download/{artifact_id}/{output_filename}",
+                algorithm=algorithm,
+                message="File encrypted successfully"
+            )
+
+        # Create a workspace in the artifact store for processing
+        artifact_id, temp_dir = artifact_store.workspace()
         
         try:
-            # Save uploaded file to temporary location
-            input_path = os.path.join(temp_dir, file.filename)
-            with open(input_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            
             # Create output directory (not file path)
             output_dir = os.path.join(temp_dir, "encrypted")
             os.makedirs(output_dir, exist_ok=True)
-            
+
+            # Save uploaded file to temporary location
+            progress.set_stage("save")
+            input_path = os.path.join(temp_dir, file.filename)
+            await io_executor.run(save_upload, file.file, input_path)
+            progress.set_stage("encrypt", os.path.getsize(input_path))
+            reporting = crypto_progress(progress, temp_dir)
+
             # Determine encryption algorithm and call with correct parameters
+            # (run in the crypto executor so the event loop stays responsive)
             if algorithm == EncryptionAlgorithm.AES256:
-                aes256_encrypt(input_path, output_dir, key)
+                await crypto_executor.run(aes256_encrypt, input_path, output_dir, key, stream=True, workers=workers, binary=binary,
+                                          compression=codec, **reporting)
                 output_filename = f"{file.filename}.enc"
             elif algorithm == EncryptionAlgorithm.AES128:
-                aes128_encrypt(input_path, output_dir, key)
+                await crypto_executor.run(aes128_encrypt, input_path, output_dir, key, stream=True, workers=workers, binary=binary,
+                                          compression=codec, **reporting)
                 output_filename = f"{file.filename}.enc"
             elif algorithm == EncryptionAlgorithm.BLOWFISH:
-                blowfish_encrypt(input_path, output_dir, key)
+                await crypto_executor.run(blowfish_encrypt, input_path, output_dir, key, stream=True, compression=codec,
+                                          **reporting)
                 output_filename = f"{file.filename}.enc"
             elif algorithm == EncryptionAlgorithm.RSA:
                 # RSA has different parameters - it needs a password, not a key
-                rsa_encrypt(input_path, output_dir, None, key)  # Using key as password
+                await crypto_executor.run(rsa_encrypt, input_path, output_dir, None, key, stream=True,  # Using key as password
+                                          compression=codec, **reporting)
+                output_filename = f"{file.filename}.enc"
+            elif algorithm == EncryptionAlgorithm.AES256GCM:
+                await crypto_executor.run(aes256gcm.encrypt_file, input_path, output_dir, key, compression=codec, **reporting)
+                output_filename = f"{file.filename}.enc"
+            elif algorithm == EncryptionAlgorithm.CHACHA20POLY1305:
+                await crypto_executor.run(chacha20poly1305.encrypt_file, input_path, output_dir, key, compression=codec,
+                                          **reporting)
                 output_filename = f"{file.filename}.enc"
             
             # Get the actual output file path
@@ -100,8 +281,9 @@ async def encrypt_file_upload(
             
             # Check if the encrypted file was created
             if os.path.exists(actual_output_path):
-                # Store the temp directory path for later cleanup/download
-                download_path = f"/download/{temp_dir.split('/')[-1]}/{output_filename}"
+                # Keep only the result; the store expires it after ARTIFACT_TTL
+                await io_executor.run(artifact_store.publish, artifact_id, actual_output_path)
+                download_path = f"/download/{artifact_id}/{output_filename}"
                 
                 return EncryptionResponse(
                     original_file=file.filename,
@@ -111,30 +293,79 @@ async def encrypt_file_upload(
                 )
             else:
                 raise HTTPException(status_code=500, detail="Encryption completed but output file not found")
-            
+
         finally:
-            # Keep temp files for download - clean up later or implement cleanup mechanism
+            # Outputs stay for /download; the artifact store expires them
             pass
-    
+                
+    except Cancelled:
+        if 'artifact_id' in locals():
+            artifact_store.discard(artifact_id)
+        raise
+    except ExecutorBusy as e:
+        if 'artifact_id' in locals():
+            artifact_store.discard(artifact_id)
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         # Clean up on error
-        if 'temp_dir' in locals():
-            shutil.rmtree(temp_dir, ignore_errors=True)
+        if 'artifact_id' in locals():
+            artifact_store.discard(artifact_id)
         raise HTTPException(status_code=500, detail=f"Encryption failed: {str(e)}")
 
-# Add endpoint to download encrypted files
+# Add endpoint to download encrypted/decrypted files
 @app.get("/download/{temp_id}/{filename}")
-async def download_file(temp_id: str, filename: str):
-    temp_dir = os.path.join(tempfile.gettempdir(), temp_id)
-    # Try 'decrypted' subfolder first (for decrypted downloads)
-    file_path = os.path.join(temp_dir, 'decrypted', filename)
-    if os.path.exists(file_path):
-        return FileResponse(file_path, filename=filename, media_type='application/octet-stream')
-    # Then try 'encrypted' subfolder (for encrypted downloads)
-    file_path = os.path.join(temp_dir, 'encrypted', filename)
-    if os.path.exists(file_path):
-        return FileResponse(file_path, filename=filename, media_type='application/octet-stream')
-    raise HTTPException(status_code=404, detail="File not found")
+async def download_file(temp_id: str, filename: str, request: Request):
+    # Index lookup; expired or evicted artifacts are gone
+    artifact = artifact_store.lookup(temp_id, filename)
+    if artifact is None:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    size = artifact.size
+    etag = http_ranges.make_etag(temp_id, size, artifact.created)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(artifact.created, usegmt=True),
+        "Accept-Ranges": "bytes",
+    }
+    if http_ranges.etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    ranges = None
+    if http_ranges.if_range_matches(request.headers.get("if-range"), etag):
+        ranges = http_ranges.parse_range(request.headers.get("range"), size)
+    if ranges == []:
+        headers["Content-Range"] = f"bytes */{size}"
+        return Response(status_code=416, headers=headers)
+
+    headers.update(attachment_headers(filename))
+    if artifact.data is not None:
+        # Memory tier: served straight from RAM
+        source = artifact.data
+    else:
+        try:
+            # Opened now so eviction during the transfer cannot cut it short
+            source = await io_executor.run(os.open, artifact.path, os.O_RDONLY)
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="File not found")
+
+    if ranges is None:
+        if artifact.data is not None:
+            return Response(artifact.data, media_type='application/octet-stream', headers=headers)
+        headers["Content-Length"] = str(size)
+        return StreamingResponse(download_chunks(source, [(0, size - 1)]),
+                                 media_type='application/octet-stream', headers=headers)
+
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        headers["Content-Range"] = http_ranges.content_range(start, end, size)
+        headers["Content-Length"] = str(end - start + 1)
+        return StreamingResponse(download_chunks(source, ranges), status_code=206,
+                                 media_type='application/octet-stream', headers=headers)
+
+    media_type, parts, trailer, length = http_ranges.multipart_layout(ranges, size, 'application/octet-stream')
+    headers["Content-Length"] = str(length)
+    return StreamingResponse(download_chunks(source, parts, trailer), status_code=206,
+                             media_type=media_type, headers=headers)
 
 # Decryption response model
 class DecryptionResponse(BaseModel):
@@ -147,57 +378,114 @@ class DecryptionResponse(BaseModel):
 @app.post("/decrypt", response_model=DecryptionResponse)
 @app.post("/api/decrypt", response_model=DecryptionResponse)
 async def decrypt_file_upload(
+    request: Request,
     file: UploadFile = File(...),
     algorithm: str = Form(...),
-    key: str = Form(...)
+    key: str = Form(...),
+    inline: bool = False,
+    workers: Optional[int] = None,
+    offset: Optional[int] = None,
+    length: Optional[int] = None,
+    progress_id: Optional[str] = None
 ):
+    # A client-chosen progress_id publishes this request's progress on /progress/{progress_id}
+    progress = start_progress(progress_id, "decrypt", file.size)
+    return await tracked(progress, decrypt_upload(file, algorithm, key, inline, workers, offset, length, progress), request)
+
+async def decrypt_upload(file, algorithm, key, inline, workers, offset, length, progress):
+    # Range mode: return only plaintext bytes [offset, offset + length)
+    if offset is not None:
+        progress.set_stage("decrypt")
+        return await decrypt_range_response(file, algorithm, key, offset, length)
     try:
         # Validate algorithm
         if algorithm not in [EncryptionAlgorithm.AES256, EncryptionAlgorithm.AES128,
-                           EncryptionAlgorithm.BLOWFISH, EncryptionAlgorithm.RSA]:
+                           EncryptionAlgorithm.BLOWFISH, EncryptionAlgorithm.RSA,
+                           EncryptionAlgorithm.AES256GCM, EncryptionAlgorithm.CHACHA20POLY1305]:
             raise HTTPException(status_code=400, detail="Unsupported decryption algorithm")
+        workers = file_workers(workers)
 
-        # Create temporary directory for processing
-        temp_dir = tempfile.mkdtemp()
+        # Stream the plaintext back in this response instead of a /download link
+        if inline:
+            progress.set_stage("decrypt")
+            output_filename = file.filename[:-4] if file.filename.endswith('.enc') else file.filename
+            if is_small_upload(file):
+                decrypted = await decrypt_payload(algorithm, key, await file.read())
+                return Response(decrypted, media_type='application/octet-stream',
+                                headers=attachment_headers(output_filename))
+            decryptor = await io_executor.run(make_stream_decryptor, algorithm, key)
+            return await inline_response(decryptor, upload_chunks(file), output_filename, progress)
 
-        try:
-            # Save uploaded file to temporary location
-            input_path = os.path.join(temp_dir, file.filename)
-            with open(input_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
+        # Very large uploads become a background job instead of holding the request open
+        if routes_to_job(file, workers):
+            return await submit_job("decrypt", file, algorithm, key)
+
+        if is_small_upload(file):
+            # Small uploads are decrypted in memory and kept in the artifact
+            # store's memory tier; nothing touches the filesystem
+            progress.set_stage("decrypt")
+            output_filename = file.filename[:-4] if file.filename.endswith('.enc') else file.filename
+            decrypted = await decrypt_payload(algorithm, key, await file.read())
+            artifact_id = await io_executor.run(artifact_store.put, output_filename, decrypted)
+            return DecryptionResponse(
+                original_file=file.filename,
+                decrypted_file=f"/download/{artifact_id}/{output_filename}",
+                algorithm=algorithm,
+                message="File decrypted successfully"
+            )
+
+        # Create a workspace in the artifact store for processing
+        artifact_id, temp_dir = artifact_store.workspace()
 
+        try:
             # Create output directory (not file path)
             output_dir = os.path.join(temp_dir, "decrypted")
             os.makedirs(output_dir, exist_ok=True)
 
+            # Save uploaded file to temporary location
+            progress.set_stage("save")
+            input_path = os.path.join(temp_dir, file.filename)
+            await io_executor.run(save_upload, file.file, input_path)
+            progress.set_stage("decrypt", os.path.getsize(input_path))
+            reporting = crypto_progress(progress, temp_dir)
+            # Large files are decrypted through memory maps unless split across workers
+            use_mmap = workers is None and os.path.getsize(input_path) >= MMAP_DECRYPT_SIZE
+
             # Determine decryption algorithm and call with correct parameters
+            # (run in the crypto executor so the event loop stays responsive)
             if algorithm == EncryptionAlgorithm.AES256:
-                from Process.Symmetric_algo.Decryption_algo.aes256_dec import decrypt_file as aes256_dec
-                aes256_dec(input_path, output_dir, key)
+                await crypto_executor.run(aes256_dec.decrypt_file, input_path, output_dir, key, workers=workers,
+                                          use_mmap=use_mmap, **reporting)
                 output_filename = os.path.splitext(file.filename)[0]  # Remove .enc
             elif algorithm == EncryptionAlgorithm.AES128:
-                from Process.Symmetric_algo.Decryption_algo.aes128_dec import decrypt_file as aes128_dec
-                aes128_dec(input_path, output_dir, key)
+                await crypto_executor.run(aes128_dec.decrypt_file, input_path, output_dir, key, workers=workers,
+                                          use_mmap=use_mmap, **reporting)
                 output_filename = os.path.splitext(file.filename)[0]
             elif algorithm == EncryptionAlgorithm.BLOWFISH:
-                from Process.Symmetric_algo.Decryption_algo.blowfish_dec import decrypt_file as blowfish_dec
-                blowfish_dec(input_path, output_dir, key)
+                await crypto_executor.run(blowfish_dec.decrypt_file, input_path, output_dir, key, stream=True, workers=workers,
+                                          use_mmap=use_mmap, **reporting)
                 output_filename = file.filename.replace('.enc', '')
             elif algorithm == EncryptionAlgorithm.RSA:
-                from Process.Asymmetric_algo.Decryption.rsa.rsa_dec import decrypt_file as rsa_dec, load_private_key
-                # For RSA, key is the password, and private key is loaded from file
-                base_path = get_base_path() if 'get_base_path' in globals() else os.getcwd()
-                private_key_path = os.path.join(base_path, 'Keys', 'private_key.pem')
-                private_key = load_private_key(private_key_path)
-                rsa_dec(input_path, output_dir, private_key, key)
+                # For RSA, key is the password; the private key comes from the key store
+                # inside the worker (parsed key objects cannot be sent to a process pool)
+                private_key_path, _ = key_store.paths()
+                await crypto_executor.run(rsa_dec.decrypt_file_with_key_path, input_path, output_dir,
+                                          private_key_path, key, workers=workers, use_mmap=use_mmap, **reporting)
                 output_filename = file.filename.replace('.enc', '')
+            elif algorithm == EncryptionAlgorithm.AES256GCM:
+                await crypto_executor.run(aes256gcm_dec.decrypt_file, input_path, output_dir, key, **reporting)
+                output_filename = os.path.splitext(file.filename)[0]
+            elif algorithm == EncryptionAlgorithm.CHACHA20POLY1305:
+                await crypto_executor.run(chacha20poly1305_dec.decrypt_file, input_path, output_dir, key, **reporting)
+                output_filename = os.path.splitext(file.filename)[0]
 
             # Get the actual output file path
             actual_output_path = os.path.join(output_dir, output_filename)
 
             # Check if the decrypted file was created
             if os.path.exists(actual_output_path):
-                download_path = f"/download/{temp_dir.split('/')[-1]}/{output_filename}"
+                await io_executor.run(artifact_store.publish, artifact_id, actual_output_path)
+                download_path = f"/download/{artifact_id}/{output_filename}"
                 return DecryptionResponse(
                     original_file=file.filename,
                     decrypted_file=download_path,
@@ -208,28 +496,739 @@ async def decrypt_file_upload(
                 raise HTTPException(status_code=500, detail="Decryption completed but output file not found")
 
         finally:
-            # Keep temp files for download - clean up later or implement cleanup mechanism
+            # Outputs stay for /download; the artifact store expires them
             pass
 
+    except Cancelled:
+        if 'artifact_id' in locals():
+            artifact_store.discard(artifact_id)
+        raise
+    except ExecutorBusy as e:
+        if 'artifact_id' in locals():
+            artifact_store.discard(artifact_id)
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
-        if 'temp_dir' in locals():
-            shutil.rmtree(temp_dir, ignore_errors=True)
+        if 'artifact_id' in locals():
+            artifact_store.discard(artifact_id)
         raise HTTPException(status_code=500, detail=f"Decryption failed: {str(e)}")
 
+def range_decryptor(algorithm):
+    """Return the decrypt_range function for algorithms whose containers are seekable."""
+    if algorithm == EncryptionAlgorithm.AES256:
+        return aes256_dec.decrypt_range
+    if algorithm == EncryptionAlgorithm.AES128:
+        return aes128_dec.decrypt_range
+    if algorithm == EncryptionAlgorithm.AES256GCM:
+        return aes256gcm_dec.decrypt_range
+    if algorithm == EncryptionAlgorithm.CHACHA20POLY1305:
+        return chacha20poly1305_dec.decrypt_range
+    # Blowfish and RSA are one CBC body with no per-chunk authentication
+    raise HTTPException(status_code=400, detail="Range decryption is supported for aes128, aes256, aes256gcm and chacha20poly1305")
+
+async def decrypt_range_response(file, algorithm, key, offset, length=None):
+    """Decrypt only the requested plaintext range of an uploaded container and return it inline.
+
+    Only the segments covering the range are authenticated and decrypted;
+    length=None reads to the end of the file.
+    """
+    decrypt_range = range_decryptor(algorithm)
+    if offset < 0 or (length is not None and length < 0):
+        raise HTTPException(status_code=400, detail="offset and length must not be negative")
+    try:
+        # The upload is already a seekable file; segments are read straight from it
+        # (a file object cannot go to a process pool, so this runs in the io executor)
+        data = await io_executor.run(decrypt_range, file.file, offset, sys.maxsize if length is None else length, key)
+    except ExecutorBusy:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Decryption failed: {str(e)}")
+    output_filename = file.filename[:-4] if file.filename.endswith('.enc') else file.filename
+    return Response(data, media_type='application/octet-stream', headers=attachment_headers(output_filename))
+
+def make_stream_encryptor(algorithm, key, binary=False, codec=None):
+    """Return an incremental (update/finalize) encryptor for the algorithm.
+
+    binary selects the raw-token container for the Fernet-based AES algorithms;
+    the other algorithms always write binary output. codec, if set, compresses
+    the input first and the container header records the codec chosen.
+    """
+    if algorithm == EncryptionAlgorithm.AES256:
+        build = functools.partial(aes256.stream_encryptor, key, binary=binary)
+    elif algorithm == EncryptionAlgorithm.AES128:
+        build = functools.partial(aes128.stream_encryptor, key, binary=binary)
+    elif algorithm == EncryptionAlgorithm.BLOWFISH:
+        build = functools.partial(blowfish.StreamEncryptor, key)
+    elif algorithm == EncryptionAlgorithm.RSA:
+        build = functools.partial(rsa.StreamEncryptor, key_store.public_key())
+    elif algorithm == EncryptionAlgorithm.AES256GCM:
+        build = functools.partial(aes256gcm.stream_encryptor, key)
+    elif algorithm == EncryptionAlgorithm.CHACHA20POLY1305:
+        build = functools.partial(chacha20poly1305.stream_encryptor, key)
+    else:
+        raise HTTPException(status_code=400, detail="Unsupported encryption algorithm")
+    # The codec is only known once the first input has been sampled
+    return compression.CompressingEncryptor(build, codec) if codec else build()
+
+def make_stream_decryptor(algorithm, key):
+    """Return an incremental (update/finalize) decryptor for the algorithm; compressed plaintext is expanded."""
+    if algorithm == EncryptionAlgorithm.AES256:
+        decryptor = aes256_dec.stream_decryptor(key)
+    elif algorithm == EncryptionAlgorithm.AES128:
+        decryptor = aes128_dec.stream_decryptor(key)
+    elif algorithm == EncryptionAlgorithm.BLOWFISH:
+        decryptor = blowfish_dec.StreamDecryptor(key)
+    elif algorithm == EncryptionAlgorithm.RSA:
+        decryptor = rsa_dec.StreamDecryptor(key_store.private_key())
+    elif algorithm == EncryptionAlgorithm.AES256GCM:
+        decryptor = aes256gcm_dec.stream_decryptor(key)
+    elif algorithm == EncryptionAlgorithm.CHACHA20POLY1305:
+        decryptor = chacha20poly1305_dec.stream_decryptor(key)
+    else:
+        raise HTTPException(status_code=400, detail="Unsupported decryption algorithm")
+    return compression.DecompressingDecryptor(decryptor)
+
+INLINE_CHUNK_SIZE = 1024 * 1024
+
+# Uploads up to this size skip the temporary input file and go through the
+# modules' in-memory *_bytes functions instead
+SMALL_PAYLOAD_SIZE = int(os.environ.get("SMALL_PAYLOAD_SIZE", 256 * 1024))
+
+def is_small_upload(file):
+    return file.size is not None and file.size <= SMALL_PAYLOAD_SIZE
+
+async def encrypt_payload(algorithm, key, data, binary=False, codec=None):
+    """Encrypt an in-memory payload in the crypto executor; same formats as the file path."""
+    if algorithm == EncryptionAlgorithm.AES256:
+        return await crypto_executor.run(aes256.encrypt_bytes, data, key, binary, codec)
+    if algorithm == EncryptionAlgorithm.AES128:
+        return await crypto_executor.run(aes128.encrypt_bytes, data, key, binary, codec)
+    if algorithm == EncryptionAlgorithm.BLOWFISH:
+        return await crypto_executor.run(blowfish.encrypt_bytes, data, key, codec)
+    if algorithm == EncryptionAlgorithm.RSA:
+        # Public key from the key store inside the worker
+        return await crypto_executor.run(rsa.encrypt_bytes, data, None, codec)
+    if algorithm == EncryptionAlgorithm.AES256GCM:
+        return await crypto_executor.run(aes256gcm.encrypt_bytes, data, key, compression=codec)
+    if algorithm == EncryptionAlgorithm.CHACHA20POLY1305:
+        return await crypto_executor.run(chacha20poly1305.encrypt_bytes, data, key, compression=codec)
+    raise HTTPException(status_code=400, detail="Unsupported encryption algorithm")
+
+async def decrypt_payload(algorithm, key, data):
+    """Decrypt an in-memory payload in the crypto executor."""
+    if algorithm == EncryptionAlgorithm.AES256:
+        return await crypto_executor.run(aes256_dec.decrypt_bytes, data, key)
+    if algorithm == EncryptionAlgorithm.AES128:
+        return await crypto_executor.run(aes128_dec.decrypt_bytes, data, key)
+    if algorithm == EncryptionAlgorithm.BLOWFISH:
+        return await crypto_executor.run(blowfish_dec.decrypt_bytes, data, key)
+    if algorithm == EncryptionAlgorithm.RSA:
+        return await crypto_executor.run(rsa_dec.decrypt_bytes, data)
+    if algorithm == EncryptionAlgorithm.AES256GCM:
+        return await crypto_executor.run(aes256gcm_dec.decrypt_bytes, data, key)
+    if algorithm == EncryptionAlgorithm.CHACHA20POLY1305:
+        return await crypto_executor.run(chacha20poly1305_dec.decrypt_bytes, data, key)
+    raise HTTPException(status_code=400, detail="Unsupported decryption algorithm")
+
+def attachment_headers(filename):
+    return {"Content-Disposition": f"attachment; filename*=utf-8''{urllib.parse.quote(filename)}"}
+
+def save_upload(src, input_path):
+    with open(input_path, "wb") as buffer:
+        shutil.copyfileobj(src, buffer)
+
+def write_through(cipher, dst, chunk):
+    dst.write(cipher.update(chunk))
+
+def write_final(cipher, dst):
+    dst.write(cipher.finalize())
+
+def require_octet_stream(request):
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type != "application/octet-stream":
+        raise HTTPException(status_code=415, detail="Request body must be application/octet-stream")
+
+async def upload_chunks(file):
+    """Yield an UploadFile in bounded chunks."""
+    while True:
+        chunk = await file.read(INLINE_CHUNK_SIZE)
+        if not chunk:
+            break
+        yield chunk
+
+async def coalesce(chunks, size=INLINE_CHUNK_SIZE):
+    """Regroup small ASGI body chunks so each executor hop does a useful amount of work."""
+    buffer = bytearray()
+    async for chunk in chunks:
+        buffer += chunk
+        if len(buffer) >= size:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+async def cipher_stream(cipher, chunks, progress=None):
+    """Yield cipher output for an async iterable of input chunks."""
+    done = 0
+    async for chunk in coalesce(chunks):
+        out = await io_executor.run(cipher.update, chunk)
+        done += len(chunk)
+        if progress:
+            progress(done)
+        if out:
+            yield out
+    yield await io_executor.run(cipher.finalize)
+
+async def inline_response(cipher, chunks, filename, progress=None):
+    """Return the cipher output as the response body, with no temp file or /download.
+
+    The first output chunk is produced before the response starts, so a wrong
+    key or unreadable header still fails with a normal HTTP error. A failure
+    later in the stream (e.g. bad CBC padding) aborts the transfer instead.
+    progress, if given, is finished when the body ends.
+    """
+    body = cipher_stream(cipher, chunks, progress)
+    first = await body.__anext__()
+
+    async def content():
+        try:
+            yield first
+            async for chunk in body:
+                yield chunk
+        except BaseException as e:
+            if progress:
+                if not isinstance(e, Exception):
+                    # The client went away: the response task was cancelled, and no
+                    # further chunk is submitted to the executor
+                    progress.token.cancel("Client disconnected")
+                progress.finish(error=error_message(e) if isinstance(e, Exception) else progress.token.reason)
+            raise
+        if progress:
+            progress.finish()
+
+    return StreamingResponse(content(), media_type='application/octet-stream',
+                             headers=attachment_headers(filename))
+
+async def download_chunks(source, parts, trailer=None):
+    """Yield byte ranges of an artifact: in-memory bytes, or a file descriptor that is closed at the end.
+
+    parts are (start, end) pairs, or (part header, start, end) triples for a
+    multipart/byteranges body, where each part ends with CRLF and the body with trailer.
+    """
+    try:
+        for part in parts:
+            if len(part) == 3:
+                yield part[0]
+            start, end = part[-2:]
+            if isinstance(source, bytes):
+                yield source[start:end + 1]
+            else:
+                while start <= end:
+                    chunk = await io_executor.run(os.pread, source, min(INLINE_CHUNK_SIZE, end + 1 - start), start)
+                    if not chunk:
+                        break
+                    start += len(chunk)
+                    yield chunk
+            if len(part) == 3:
+                yield b"\r\n"
+        if trailer:
+            yield trailer
+    finally:
+        if not isinstance(source, bytes):
+            os.close(source)
+
+async def pipe_request_body(request, cipher, output_file_path, progress=None):
+    """Feed the raw request body through cipher and write the result as it arrives."""
+    require_octet_stream(request)
+    done = 0
+    with open(output_file_path, "wb") as dst:
+        async for chunk in coalesce(request.stream()):
+            await io_executor.run(write_through, cipher, dst, chunk)
+            done += len(chunk)
+            if progress:
+                progress(done)
+        await io_executor.run(write_final, cipher, dst)
+
+def request_size(request):
+    # Content-Length of a raw-body upload, if the client sent one
+    declared = request.headers.get("content-length")
+    return int(declared) if declared and declared.isdigit() else None
+
+# Raw-body streaming encryption - ciphertext is written while the upload arrives
+@app.put("/encrypt/stream", response_model=EncryptionResponse)
+@app.post("/encrypt/stream", response_model=EncryptionResponse)
+@app.put("/api/encrypt/stream", response_model=EncryptionResponse)
+@app.post("/api/encrypt/stream", response_model=EncryptionResponse)
+async def encrypt_stream_upload(
+    request: Request,
+    algorithm: str,
+    filename: str,
+    key: str = Header(..., alias="X-Encryption-Key"),
+    inline: bool = False,
+    binary: bool = False,
+    compress: Optional[str] = None,
+    progress_id: Optional[str] = None
+):
+    codec = compression_codec(compress)
+    # The body is encrypted while it arrives, so there is a single "encrypt" stage
+    progress = start_progress(progress_id, "encrypt", request_size(request))
+    progress.set_stage("encrypt")
+    return await tracked(progress, encrypt_request_body(request, algorithm, filename, key, inline, binary, codec, progress))
+
+async def encrypt_request_body(request, algorithm, filename, key, inline, binary, codec, progress):
+    filename = os.path.basename(filename)
+    if inline:
+        require_octet_stream(request)
+        try:
+            encryptor = await io_executor.run(make_stream_encryptor, algorithm, key, binary, codec)
+            return await inline_response(encryptor, request.stream(), f"{filename}.enc", progress)
+        except (HTTPException, ExecutorBusy, Cancelled):
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Encryption failed: {str(e)}")
+
+    artifact_id, temp_dir = artifact_store.workspace()
+    try:
+        encryptor = await io_executor.run(make_stream_encryptor, algorithm, key, binary, codec)
+        output_dir = os.path.join(temp_dir, "encrypted")
+        os.makedirs(output_dir, exist_ok=True)
+        output_filename = f"{filename}.enc"
+        output_path = os.path.join(output_dir, output_filename)
+        await pipe_request_body(request, encryptor, output_path, progress)
+        await io_executor.run(artifact_store.publish, artifact_id, output_path)
+
+        return EncryptionResponse(
+            original_file=filename,
+            encrypted_file=f"/download/{artifact_id}/{output_filename}",
+            algorithm=algorithm,
+            message="File encrypted successfully"
+        )
+    except (HTTPException, ExecutorBusy, Cancelled):
+        artifact_store.discard(artifact_id)
+        raise
+    except Exception as e:
+        artifact_store.discard(artifact_id)
+        raise HTTPException(status_code=500, detail=f"Encryption failed: {str(e)}")
+
+# Raw-body streaming decryption - plaintext is written while the upload arrives
+@app.put("/decrypt/stream", response_model=DecryptionResponse)
+@app.post("/decrypt/stream", response_model=DecryptionResponse)
+@app.put("/api/decrypt/stream", response_model=DecryptionResponse)
+@app.post("/api/decrypt/stream", response_model=DecryptionResponse)
+async def decrypt_stream_upload(
+    request: Request,
+    algorithm: str,
+    filename: str,
+    key: str = Header(..., alias="X-Encryption-Key"),
+    inline: bool = False,
+    progress_id: Optional[str] = None
+):
+    progress = start_progress(progress_id, "decrypt", request_size(request))
+    progress.set_stage("decrypt")
+    return await tracked(progress, decrypt_request_body(request, algorithm, filename, key, inline, progress))
+
+async def decrypt_request_body(request, algorithm, filename, key, inline, progress):
+    filename = os.path.basename(filename)
+    output_filename = filename[:-4] if filename.endswith('.enc') else filename
+    if inline:
+        require_octet_stream(request)
+        try:
+            decryptor = await io_executor.run(make_stream_decryptor, algorithm, key)
+            return await inline_response(decryptor, request.stream(), output_filename, progress)
+        except (HTTPException, ExecutorBusy, Cancelled):
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Decryption failed: {str(e)}")
+
+    artifact_id, temp_dir = artifact_store.workspace()
+    try:
+        decryptor = await io_executor.run(make_stream_decryptor, algorithm, key)
+        output_dir = os.path.join(temp_dir, "decrypted")
+        os.makedirs(output_dir, exist_ok=True)
+        output_path = os.path.join(output_dir, output_filename)
+        await pipe_request_body(request, decryptor, output_path, progress)
+        await io_executor.run(artifact_store.publish, artifact_id, output_path)
+
+        return DecryptionResponse(
+            original_file=filename,
+            decrypted_file=f"/download/{artifact_id}/{output_filename}",
+            algorithm=algorithm,
+            message="File decrypted successfully"
+        )
+    except (HTTPException, ExecutorBusy, Cancelled):
+        artifact_store.discard(artifact_id)
+        raise
+    except Exception as e:
+        artifact_store.discard(artifact_id)
+        raise HTTPException(status_code=500, detail=f"Decryption failed: {str(e)}")
+
+# Resumable chunked uploads - chunks are encrypted in place as they arrive
+UPLOAD_CHUNK_SIZE = int(os.environ.get("UPLOAD_CHUNK_SIZE", 8 * 1024 * 1024))
+MAX_UPLOAD_CHUNK_SIZE = 64 * 1024 * 1024
+# Sessions may have at most this many chunks (size / chunk_size, rounded up)
+MAX_UPLOAD_CHUNKS = int(os.environ.get("MAX_UPLOAD_CHUNKS", 100000))
+
+class UploadSessionResponse(BaseModel):
+    upload_id: str
+    algorithm: str
+    size: int
+    chunk_size: int
+    chunks: int
+    remaining: int
+    missing: List[int]
+
+def make_segment_encryptor(algorithm, key, chunk_size, binary=False):
+    """Return an out-of-order segment encryptor for the algorithms with segmented containers."""
+    if algorithm == EncryptionAlgorithm.AES256:
+        return aes256.segment_encryptor(key, chunk_size, binary=binary)
+    if algorithm == EncryptionAlgorithm.AES128:
+        return aes128.segment_encryptor(key, chunk_size, binary=binary)
+    if algorithm == EncryptionAlgorithm.AES256GCM:
+        return aes256gcm.segment_encryptor(key, chunk_size)
+    if algorithm == EncryptionAlgorithm.CHACHA20POLY1305:
+        return chacha20poly1305.segment_encryptor(key, chunk_size)
+    raise HTTPException(status_code=400, detail="Chunked uploads are supported for aes128, aes256, aes256gcm and chacha20poly1305")
+
+def upload_session_response(session):
+    return UploadSessionResponse(
+        upload_id=session.upload_id,
+        algorithm=session.algorithm,
+        size=session.size,
+        chunk_size=session.chunk_size,
+        chunks=session.chunks,
+        remaining=session.remaining(),
+        missing=session.missing()
+    )
+
+def find_upload(upload_id):
+    session = upload_sessions.get(upload_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    return session
+
+@app.post("/uploads", response_model=UploadSessionResponse, status_code=201)
+@app.post("/api/uploads", response_model=UploadSessionResponse, status_code=201)
+async def create_upload(
+    algorithm: str,
+    filename: str,
+    size: int,
+    key: str = Header(..., alias="X-Encryption-Key"),
+    chunk_size: int = UPLOAD_CHUNK_SIZE,
+    binary: bool = False
+):
+    """Start a chunked upload of `size` bytes; PUT the chunks in any order, then commit."""
+    if size < 0 or not 0 < chunk_size <= MAX_UPLOAD_CHUNK_SIZE:
+        raise HTTPException(status_code=400, detail=f"size must not be negative and chunk_size must be between 1 and {MAX_UPLOAD_CHUNK_SIZE}")
+    if -(-size // chunk_size) > MAX_UPLOAD_CHUNKS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_UPLOAD_CHUNKS} chunks per upload; use a larger chunk_size")
+    encryptor = make_segment_encryptor(algorithm, key, chunk_size, binary)
+    session = await io_executor.run(upload_sessions.create, encryptor, size, os.path.basename(filename), algorithm)
+    return upload_session_response(session)
+
+@app.get("/uploads/{upload_id}", response_model=UploadSessionResponse)
+@app.get("/api/uploads/{upload_id}", response_model=UploadSessionResponse)
+async def get_upload(upload_id: str):
+    """Session status; `remaining` counts the chunks still to send, `missing` lists the first of them."""
+    session = find_upload(upload_id)
+    return upload_session_response(session)
+
+@app.put("/uploads/{upload_id}/chunks/{index}", response_model=UploadSessionResponse)
+@app.put("/api/uploads/{upload_id}/chunks/{index}", response_model=UploadSessionResponse)
+async def put_upload_chunk(upload_id: str, index: int, request: Request):
+    session = find_upload(upload_id)
+    require_octet_stream(request)
+    too_large = HTTPException(status_code=413, detail=f"Chunks are at most {session.chunk_size} bytes")
+    declared = request_size(request)
+    if declared is not None and declared > session.chunk_size:
+        raise too_large
+    # Read incrementally so a body without (or lying about) Content-Length stops at the limit
+    data = bytearray()
+    async for piece in request.stream():
+        data += piece
+        if len(data) > session.chunk_size:
+            raise too_large
+    try:
+        await io_executor.run(session.write, index, data)
+    except ChunkConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return upload_session_response(session)
+
+@app.post("/uploads/{upload_id}/commit", response_model=EncryptionResponse)
+@app.post("/api/uploads/{upload_id}/commit", response_model=EncryptionResponse)
+async def commit_upload(upload_id: str):
+    """Finish the upload; the ciphertext becomes a normal /download artifact."""
+    session = find_upload(upload_id)
+    try:
+        output_path = await io_executor.run(upload_sessions.commit, upload_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    output_filename = os.path.basename(output_path)
+    return EncryptionResponse(
+        original_file=session.filename,
+        encrypted_file=f"/download/{upload_id}/{output_filename}",
+        algorithm=session.algorithm,
+        message="File encrypted successfully"
+    )
+
+@app.delete("/uploads/{upload_id}", status_code=204)
+@app.delete("/api/uploads/{upload_id}", status_code=204)
+async def abort_upload(upload_id: str):
+    if not await io_executor.run(upload_sessions.abort, upload_id):
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    return Response(status_code=204)
+
+# Asynchronous jobs - large files are processed by background workers
+# Uploads at least this large are routed to a job automatically (0 disables)
+JOB_THRESHOLD = int(os.environ.get("JOB_THRESHOLD", 512 * 1024 * 1024))
+JOB_OPERATIONS = ("encrypt", "decrypt")
+JOB_ALGORITHMS = (EncryptionAlgorithm.AES256, EncryptionAlgorithm.AES128, EncryptionAlgorithm.BLOWFISH,
+                  EncryptionAlgorithm.RSA, EncryptionAlgorithm.AES256GCM, EncryptionAlgorithm.CHACHA20POLY1305)
+
+class JobResponse(BaseModel):
+    job_id: str
+    operation: str
+    algorithm: str
+    filename: str
+    status: str
+    priority: int
+    bytes_total: int
+    bytes_done: int
+    progress: float
+    eta_seconds: Optional[float] = None
+    queue_position: Optional[int] = None
+    result: Optional[str] = None
+    error: Optional[str] = None
+
+def routes_to_job(file, workers=None):
+    # An explicit ?workers= request keeps the synchronous parallel path
+    return bool(JOB_THRESHOLD) and workers is None and file.size is not None and file.size >= JOB_THRESHOLD
+
+def job_response(job):
+    return JobResponse(
+        job_id=job["id"],
+        operation=job["operation"],
+        algorithm=job["algorithm"],
+        filename=job["filename"],
+        status=job["status"],
+        priority=job["priority"],
+        bytes_total=job["bytes_total"],
+        bytes_done=job["bytes_done"],
+        progress=job["bytes_done"] / job["bytes_total"] if job["bytes_total"] else float(job["status"] == "done"),
+        eta_seconds=job["eta"],
+        queue_position=job.get("position"),
+        result=job["result"],
+        error=job["error"]
+    )
+
+def run_job(job, key, progress):
+    """Job handler: pipe the saved upload through the algorithm's stream cipher, reporting input bytes done."""
+    if job["operation"] == "encrypt":
+        cipher = make_stream_encryptor(job["algorithm"], key, job["binary"], job["compression"])
+        output_dir, output_filename = "encrypted", f"{job['filename']}.enc"
+    else:
+        cipher = make_stream_decryptor(job["algorithm"], key)
+        output_dir = "decrypted"
+        output_filename = job["filename"][:-4] if job["filename"].endswith('.enc') else job["filename"]
+    output_path = os.path.join(os.path.dirname(job["input_path"]), output_dir, output_filename)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+    done = 0
+    with open(job["input_path"], "rb") as src, open(output_path, "wb") as dst:
+        while True:
+            chunk = src.read(INLINE_CHUNK_SIZE)
+            if not chunk:
+                break
+            dst.write(cipher.update(chunk))
+            done += len(chunk)
+            progress(done)
+        dst.write(cipher.finalize())
+    return output_path
+
+# Registered at import so jobs submitted before startup (e.g. in tests) still run
+job_queue.handler = run_job
+
+async def submit_job(operation, file, algorithm, key, priority=0, binary=False, compression=None):
+    """Save the upload to a workspace and queue it; answers 202 with the job status."""
+    artifact_id, temp_dir = artifact_store.workspace()
+    try:
+        input_path = os.path.join(temp_dir, file.filename)
+        await io_executor.run(save_upload, file.file, input_path)
+        await io_executor.run(job_queue.submit, operation, algorithm, key, file.filename, input_path, priority, binary,
+                              compression)
+    except Exception:
+        artifact_store.discard(artifact_id)
+        raise
+    job = await io_executor.run(job_queue.get, artifact_id)
+    return JSONResponse(status_code=202, content=jsonable_encoder(job_response(job)),
+                        headers={"Location": f"/jobs/{artifact_id}"})
+
+@app.post("/jobs", response_model=JobResponse, status_code=202)
+@app.post("/api/jobs", response_model=JobResponse, status_code=202)
+async def create_job(
+    file: UploadFile = File(...),
+    algorithm: str = Form(...),
+    key: str = Form(...),
+    operation: str = Form("encrypt"),
+    priority: int = 0,
+    binary: bool = False,
+    compress: Optional[str] = None
+):
+    """Queue an encrypt/decrypt job; poll GET /jobs/{job_id} for progress and the result link."""
+    if operation not in JOB_OPERATIONS:
+        raise HTTPException(status_code=400, detail="operation must be encrypt or decrypt")
+    if algorithm not in JOB_ALGORITHMS:
+        raise HTTPException(status_code=400, detail="Unsupported algorithm")
+    return await submit_job(operation, file, algorithm, key, priority, binary, compression_codec(compress))
+
+@app.get("/jobs/{job_id}", response_model=JobResponse)
+@app.get("/api/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str):
+    job = await io_executor.run(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_response(job)
+
+@app.get("/jobs/{job_id}/result")
+@app.get("/api/jobs/{job_id}/result")
+async def get_job_result(job_id: str, request: Request):
+    """The finished job's output (same as its /download link)."""
+    job = await io_executor.run(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    return await download_file(job_id, job["result"].rsplit("/", 1)[-1], request)
+
+@app.delete("/jobs/{job_id}", status_code=204)
+@app.delete("/api/jobs/{job_id}", status_code=204)
+async def cancel_job(job_id: str):
+    """Cancel a queued or running job; a running job stops at its next chunk."""
+    if not await io_executor.run(job_queue.cancel, job_id):
+        raise HTTPException(status_code=409, detail="Job is unknown or already finished")
+    return Response(status_code=204)
+
+# Live progress - Server-Sent Events for requests sent with ?progress_id= and for jobs
+PROGRESS_POLL_INTERVAL = float(os.environ.get("PROGRESS_POLL_INTERVAL", 0.25))
+# How long a subscriber waits for a progress id that has not been used yet
+PROGRESS_WAIT = 30
+PROGRESS_KEEPALIVE = 15
+
+def job_progress(job):
+    """A job's status in the same shape as Progress.snapshot()."""
+    running = job["status"] == "running"
+    elapsed = (job["finished"] or time.time()) - job["created"]
+    rate = None
+    if running and job["bytes_done"]:
+        rate = job["bytes_done"] / max(time.time() - job["started"], 1e-6)
+    return {
+        "id": job["id"],
+        "operation": job["operation"],
+        "stage": job["operation"] if running else job["status"],
+        "bytes_done": job["bytes_done"],
+        "bytes_total": job["bytes_total"],
+        "progress": job["bytes_done"] / job["bytes_total"] if job["bytes_total"] else None,
+        "bytes_per_second": rate,
+        "eta_seconds": job["eta"],
+        "elapsed_seconds": elapsed,
+        "error": job["error"],
+        "result": job["result"],
+    }
+
+def server_sent_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode()
+
+async def progress_events(progress_id):
+    """Yield a `progress` event whenever the request or job changes, until it finishes.
+
+    Polling a snapshot every PROGRESS_POLL_INTERVAL coalesces the per-chunk
+    updates of fast transfers into a bounded event rate. StreamingResponse
+    stops the generator when the client disconnects.
+    """
+    yield b"retry: 2000\n\n"
+    first_poll = last_sent = time.monotonic()
+    last = None
+    while True:
+        progress = progress_tracker.get(progress_id)
+        if progress is not None:
+            state = progress.snapshot()
+            changed = last is None or state["version"] != last["version"]
+            finished = progress.finished is not None
+        else:
+            job = await io_executor.run(job_queue.get, progress_id)
+            state = job_progress(job) if job is not None else None
+            changed = state is not None and (last is None or any(state[field] != last[field] for field in ("stage", "bytes_done", "error")))
+            finished = state is not None and job["status"] not in ("queued", "running")
+        if state is None and time.monotonic() - first_poll > PROGRESS_WAIT:
+            yield server_sent_event("unknown", {"id": progress_id, "detail": "Unknown progress id"})
+            return
+        if changed:
+            yield server_sent_event("progress", state)
+            last, last_sent = state, time.monotonic()
+        if finished:
+            return
+        if time.monotonic() - last_sent >= PROGRESS_KEEPALIVE:
+            yield b": keepalive\n\n"
+            last_sent = time.monotonic()
+        await asyncio.sleep(PROGRESS_POLL_INTERVAL)
+
+@app.get("/progress/{progress_id}")
+@app.get("/api/progress/{progress_id}")
+async def stream_progress(progress_id: str):
+    """Server-Sent Events with the progress of a ?progress_id= request or a job.
+
+    The stream may be opened before the request starts: unknown ids are
+    waited for for PROGRESS_WAIT seconds. It ends after the `done` or
+    `failed` state (`cancelled` for jobs).
+    """
+    if not valid_progress_id(progress_id):
+        raise HTTPException(status_code=400, detail="Invalid progress id")
+    return StreamingResponse(progress_events(progress_id), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 # Key generation route
 @app.get("/generate-key")
-async def generate_encryption_key(algorithm: str = EncryptionAlgorithm.AES256, length: int = 32):
+async def generate_encryption_key(algorithm: str = EncryptionAlgorithm.AES256, length: int = 32, key_size: int = 2048):
     try:
+        if algorithm == EncryptionAlgorithm.RSA:
+            if key_size not in SUPPORTED_KEY_SIZES:
+                raise HTTPException(status_code=400, detail=f"Unsupported RSA key size, use one of {list(SUPPORTED_KEY_SIZES)}")
+            # Served from the pre-generated pool; falls back to generating inline off the event loop
+            private_pem, public_pem = await io_executor.run(rsa_key_pool.get, key_size)
+            return {
+                "algorithm": algorithm,
+                "key_size": key_size,
+                "private_key": private_pem.decode('utf-8'),
+                "public_key": public_pem.decode('utf-8'),
+            }
+
         # Generate a cryptographically secure random key
         key = base64.urlsafe_b64encode(os.urandom(length)).decode('utf-8')
         return {"key": key, "algorithm": algorithm}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Key generation failed: {str(e)}")
 
 # Health check route
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "message": "Encryption service is running"}
+    return {
+        "status": "healthy",
+        "message": "Encryption service is running",
+        "executors": executor_stats(),
+        "key_store": key_store.stats(),
+        "rsa_key_pool": rsa_key_pool.stats(),
+        "artifacts": artifact_store.stats(),
+        "uploads": upload_sessions.stats(),
+        "jobs": job_queue.stats(),
+        "progress": progress_tracker.stats(),
+        "compression": compression.available(),
+    }
 
 if __name__ == "__main__":
     import uvicorn
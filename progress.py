@@ -0,0 +1,135 @@
+"""
+Progress of in-flight encrypt/decrypt requests, for /progress
+"""
+import os
+import re
+import time
+import threading
+from Process.cancellation import CancelToken
+
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+# Client-chosen progress ids: a UUID or similar token, nothing that needs escaping
+_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+
+def valid_id(progress_id):
+    return bool(_ID_PATTERN.fullmatch(progress_id))
+
+
+class Progress:
+    """Progress of one request: its current stage and the input bytes that stage has processed.
+
+    The instance itself is the callback handed to the algorithm functions
+    (progress(done)), so it is updated from executor threads. Each field is
+    a single attribute assignment and readers only take snapshots, so no
+    lock is needed.
+
+    Every report and stage change is also a cancellation point: once `token`
+    is cancelled (client gone) or past its deadline, they raise Cancelled
+    and the work stops at the next chunk.
+    """
+
+    def __init__(self, progress_id, operation, total=None, deadline=None):
+        self.id = progress_id
+        self.operation = operation
+        self.stage = "received"
+        self.total = total
+        self.done = 0
+        self.error = None
+        self.started = self.stage_started = self.updated = time.time()
+        self.finished = None
+        self.version = 0
+        self.token = CancelToken(deadline)
+
+    def __call__(self, done):
+        self.token.check()
+        self.done = done
+        self.updated = time.time()
+        self.version += 1
+
+    def set_stage(self, stage, total=None):
+        """Start a new stage; its byte count and throughput start from zero."""
+        self.token.check()
+        self.stage = stage
+        if total is not None:
+            self.total = total
+        self.done = 0
+        self.stage_started = self.updated = time.time()
+        self.version += 1
+
+    def finish(self, error=None):
+        if self.finished is not None:
+            return
+        if error is None and self.total is not None:
+            self.done = self.total
+        if error is None:
+            self.stage = DONE
+        else:
+            self.stage = CANCELLED if self.token.cancelled else FAILED
+        self.error = error
+        self.finished = self.updated = time.time()
+        self.version += 1
+
+    def snapshot(self):
+        done, total = self.done, self.total
+        elapsed = self.updated - self.stage_started
+        rate = done / elapsed if done and elapsed > 0 else None
+        return {
+            "id": self.id,
+            "operation": self.operation,
+            "stage": self.stage,
+            "bytes_done": done,
+            "bytes_total": total,
+            "progress": done / total if total else None,
+            "bytes_per_second": rate,
+            "eta_seconds": (total - done) / rate if rate and total and self.finished is None else None,
+            "elapsed_seconds": (self.finished or time.time()) - self.started,
+            "error": self.error,
+            "version": self.version,
+        }
+
+
+class ProgressTracker:
+    """Registry of the requests that were given a progress id.
+
+    Finished entries stay visible for `ttl` seconds, so a client that
+    subscribes after a fast request still receives its final state.
+    """
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def begin(self, progress_id, operation, total=None, deadline=None):
+        """Return the Progress for a request; it is only registered when progress_id is set."""
+        progress = Progress(progress_id, operation, total, deadline)
+        if progress_id:
+            self.expire()
+            with self._lock:
+                self._entries[progress_id] = progress
+        return progress
+
+    def get(self, progress_id):
+        with self._lock:
+            return self._entries.get(progress_id)
+
+    def expire(self, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            stale = [progress_id for progress_id, progress in self._entries.items()
+                     if progress.finished is not None and now - progress.finished > self.ttl]
+            for progress_id in stale:
+                del self._entries[progress_id]
+        return len(stale)
+
+    def stats(self):
+        with self._lock:
+            active = sum(1 for progress in self._entries.values() if progress.finished is None)
+            return {"active": active, "finished": len(self._entries) - active}
+
+
+progress_tracker = ProgressTracker(ttl=int(os.environ.get("PROGRESS_TTL", 60)))
@@ -0,0 +1,523 @@
+"""
+In-process tests for the FastAPI routes (no running server needed)
+"""
+import os
+import json
+import time
+import shutil
+import pytest
+from fastapi.testclient import TestClient
+from main import app
+
+client = TestClient(app)
+KEY = "test_key_123"
+
+
+@pytest.mark.parametrize("algorithm", ["aes256", "aes128", "blowfish", "aes256gcm", "chacha20poly1305"])
+def test_raw_body_stream_round_trip(algorithm):
+    """Raw octet-stream uploads encrypt and decrypt without multipart"""
+    data = os.urandom(200000)
+    headers = {"Content-Type": "application/octet-stream", "X-Encryption-Key": KEY}
+
+    response = client.put(f"/encrypt/stream?algorithm={algorithm}&filename=data.bin", content=data, headers=headers)
+    assert response.status_code == 200
+    encrypted = client.get(response.json()["encrypted_file"]).content
+
+    response = client.post(f"/decrypt/stream?algorithm={algorithm}&filename=data.bin.enc", content=encrypted, headers=headers)
+    assert response.status_code == 200
+    assert client.get(response.json()["decrypted_file"]).content == data
+
+
+def test_binary_container_through_api():
+    data = os.urandom(100000)
+    headers = {"Content-Type": "application/octet-stream", "X-Encryption-Key": KEY}
+
+    response = client.put("/encrypt/stream?algorithm=aes256&filename=data.bin&inline=true&binary=true", content=data, headers=headers)
+    assert response.status_code == 200
+    assert response.content.startswith(b"ENCB")
+
+    response = client.post(
+        "/decrypt?inline=true",
+        files={"file": ("data.bin.enc", response.content)},
+        data={"algorithm": "aes256", "key": KEY},
+    )
+    assert response.status_code == 200
+    assert response.content == data
+
+
+def test_raw_body_stream_requires_octet_stream():
+    response = client.put(
+        "/encrypt/stream?algorithm=aes256&filename=data.bin",
+        content=b"data",
+        headers={"Content-Type": "text/plain", "X-Encryption-Key": KEY},
+    )
+    assert response.status_code == 415
+
+
+@pytest.mark.parametrize("algorithm", ["aes256", "blowfish", "chacha20poly1305"])
+@pytest.mark.parametrize("size", [50000, 600000])
+def test_inline_response_round_trip(algorithm, size):
+    """inline=true returns the output in the response body, no /download hop"""
+    # Small uploads are handled in memory, larger ones are streamed
+    data = os.urandom(size)
+
+    response = client.post(
+        "/encrypt?inline=true",
+        files={"file": ("data.bin", data)},
+        data={"algorithm": algorithm, "key": KEY},
+    )
+    assert response.status_code == 200
+    assert "data.bin.enc" in response.headers["content-disposition"]
+
+    response = client.post(
+        "/decrypt?inline=true",
+        files={"file": ("data.bin.enc", response.content)},
+        data={"algorithm": algorithm, "key": KEY},
+    )
+    assert response.status_code == 200
+    assert response.content == data
+
+
+def test_inline_response_rejects_wrong_key_before_streaming():
+    data = os.urandom(1000)
+    headers = {"Content-Type": "application/octet-stream", "X-Encryption-Key": KEY}
+    encrypted = client.put("/encrypt/stream?algorithm=aes256&filename=d&inline=true", content=data, headers=headers).content
+
+    headers["X-Encryption-Key"] = "wrong key"
+    response = client.put("/decrypt/stream?algorithm=aes256&filename=d.enc&inline=true", content=encrypted, headers=headers)
+    assert response.status_code == 500
+
+
+def test_health_reports_executor_queues():
+    executors = client.get("/health").json()["executors"]
+    assert set(executors) == {"crypto", "io"}
+    assert executors["crypto"]["queued"] == 0
+
+
+def test_bounded_executor_rejects_when_queue_full():
+    import asyncio
+    import threading
+    from executors import BoundedExecutor, ExecutorBusy
+
+    executor = BoundedExecutor("test", max_workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def scenario():
+        first = asyncio.ensure_future(executor.run(release.wait))
+        second = asyncio.ensure_future(executor.run(release.wait))
+        await asyncio.sleep(0)
+        assert executor.stats()["queued"] == 1
+        with pytest.raises(ExecutorBusy):
+            await executor.run(release.wait)
+        release.set()
+        await asyncio.gather(first, second)
+
+    asyncio.run(scenario())
+    assert executor.stats()["rejected"] == 1
+    executor.shutdown()
+
+
+def test_generate_rsa_key_pair():
+    from cryptography.hazmat.primitives import serialization
+
+    response = client.get("/generate-key?algorithm=rsa")
+    assert response.status_code == 200
+    data = response.json()
+    private_key = serialization.load_pem_private_key(data["private_key"].encode(), password=None)
+    public_key = serialization.load_pem_public_key(data["public_key"].encode())
+    assert private_key.key_size == 2048
+    assert private_key.public_key().public_numbers() == public_key.public_numbers()
+
+    assert client.get("/generate-key?algorithm=rsa&key_size=1024").status_code == 400
+
+
+@pytest.mark.parametrize("size", [1000, 400000])
+def test_download_ranges_and_conditional_get(size):
+    """/download serves byte ranges, multi-range and 304s for both storage tiers"""
+    response = client.post("/encrypt", files={"file": ("data.bin", os.urandom(size))},
+                           data={"algorithm": "aes256gcm", "key": KEY})
+    url = response.json()["encrypted_file"]
+    full = client.get(url)
+    etag = full.headers["etag"]
+    assert full.status_code == 200 and full.headers["accept-ranges"] == "bytes"
+
+    partial = client.get(url, headers={"Range": "bytes=100-"})
+    assert partial.status_code == 206 and partial.content == full.content[100:]
+    assert partial.headers["content-range"] == f"bytes 100-{len(full.content) - 1}/{len(full.content)}"
+    assert client.get(url, headers={"Range": "bytes=-10"}).content == full.content[-10:]
+
+    multi = client.get(url, headers={"Range": "bytes=0-9,20-29"})
+    assert multi.status_code == 206 and multi.headers["content-type"].startswith("multipart/byteranges")
+    assert int(multi.headers["content-length"]) == len(multi.content)
+    assert full.content[:10] in multi.content and full.content[20:30] in multi.content
+
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+    assert client.get(url, headers={"Range": "bytes=0-9", "If-Range": '"stale"'}).status_code == 200
+    assert client.get(url, headers={"Range": "bytes=0-9", "If-Range": etag}).status_code == 206
+    unsatisfiable = client.get(url, headers={"Range": f"bytes={len(full.content)}-"})
+    assert unsatisfiable.status_code == 416 and unsatisfiable.headers["content-range"] == f"bytes */{len(full.content)}"
+
+
+@pytest.mark.parametrize("algorithm", ["aes256", "aes128", "aes256gcm", "chacha20poly1305"])
+def test_decrypt_range_mode(algorithm):
+    """/decrypt?offset=...&length=... returns just that slice of the plaintext"""
+    data = os.urandom(3 * 1024 * 1024 + 123)
+    headers = {"Content-Type": "application/octet-stream", "X-Encryption-Key": KEY}
+    encrypted = client.put(f"/encrypt/stream?algorithm={algorithm}&filename=log&inline=true", content=data, headers=headers).content
+
+    def decrypt(query, key=KEY):
+        return client.post(f"/decrypt?{query}", files={"file": ("log.enc", encrypted)}, data={"algorithm": algorithm, "key": key})
+
+    response = decrypt("offset=1048000&length=2000")
+    assert response.status_code == 200 and response.content == data[1048000:1050000]
+    assert decrypt(f"offset={len(data) - 10}").content == data[-10:]
+    assert decrypt(f"offset={len(data)}&length=5").content == b""
+    assert decrypt("offset=0&length=10", key="wrong key").status_code == 500
+
+
+def test_decrypt_range_mode_needs_seekable_container():
+    encrypted = client.post("/encrypt?inline=true", files={"file": ("d", b"x" * 100)}, data={"algorithm": "blowfish", "key": KEY}).content
+    response = client.post("/decrypt?offset=0&length=10", files={"file": ("d.enc", encrypted)}, data={"algorithm": "blowfish", "key": KEY})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("algorithm", ["aes256", "blowfish", "aes256gcm"])
+@pytest.mark.parametrize("size", [50000, 600000])
+def test_compressed_encryption_through_api(algorithm, size):
+    """?compress= shrinks compressible uploads on every encrypt path; decryption needs no flag"""
+    data = (b"GET /api/items?page=1 200 0.003s\n" * (size // 33 + 1))[:size]
+    form = {"algorithm": algorithm, "key": KEY}
+    headers = {"Content-Type": "application/octet-stream", "X-Encryption-Key": KEY}
+
+    inline = client.post("/encrypt?inline=true&compress=zlib", files={"file": ("data.log", data)}, data=form).content
+    linked = client.post("/encrypt?compress=lzma", files={"file": ("data.log", data)}, data=form).json()["encrypted_file"]
+    streamed = client.put(f"/encrypt/stream?algorithm={algorithm}&filename=data.log&inline=true&compress=auto",
+                          content=data, headers=headers).content
+    for encrypted in (inline, client.get(linked).content, streamed):
+        assert len(encrypted) < size // 4
+        response = client.post("/decrypt?inline=true", files={"file": ("data.log.enc", encrypted)}, data=form)
+        assert response.content == data
+        response = client.post("/decrypt", files={"file": ("data.log.enc", encrypted)}, data=form)
+        assert client.get(response.json()["decrypted_file"]).content == data
+        response = client.put(f"/decrypt/stream?algorithm={algorithm}&filename=data.log.enc", content=encrypted, headers=headers)
+        assert client.get(response.json()["decrypted_file"]).content == data
+
+
+def test_upload_session_bounds():
+    """Huge chunk counts are refused, and status lists only the first missing chunks"""
+    headers = {"X-Encryption-Key": KEY}
+    response = client.post(f"/uploads?algorithm=aes256gcm&filename=big.bin&size={10 ** 15}&chunk_size=1", headers=headers)
+    assert response.status_code == 400
+
+    session = client.post("/uploads?algorithm=aes256gcm&filename=big.bin&size=5000&chunk_size=1", headers=headers).json()
+    assert session["chunks"] == session["remaining"] == 5000
+    assert session["missing"] == list(range(1000))
+    client.delete(f"/uploads/{session['upload_id']}")
+
+
+def test_upload_session_close_waits_for_writes():
+    """Abort and commit never close the fd under a running write, and a second commit is refused"""
+    import threading
+    from uploads import upload_sessions
+
+    headers = {"Content-Type": "application/octet-stream", "X-Encryption-Key": KEY}
+    upload_id = client.post("/uploads?algorithm=aes256gcm&filename=data.bin&size=200&chunk_size=100",
+                            headers=headers).json()["upload_id"]
+    session = upload_sessions.get(upload_id)
+    encrypting, release = threading.Event(), threading.Event()
+    segment = session.encryptor.segment
+
+    def slow_segment(index, final, data):
+        encrypting.set()
+        release.wait(5)
+        return segment(index, final, data)
+
+    session.encryptor.segment = slow_segment
+    writer = threading.Thread(target=session.write, args=(0, b"x" * 100))
+    writer.start()
+    assert encrypting.wait(5)
+    closer = threading.Thread(target=session.close)
+    closer.start()
+    closer.join(0.2)
+    assert closer.is_alive()  # waiting for the write to finish with the fd
+    release.set()
+    writer.join(5)
+    closer.join(5)
+    assert not closer.is_alive() and session.remaining() == 1
+    with pytest.raises(ValueError, match="closed"):
+        session.write(1, b"x" * 100)
+    with pytest.raises(ValueError, match="closed"):
+        session.finish()
+    assert client.post(f"/uploads/{upload_id}/commit").status_code == 409
+    client.delete(f"/uploads/{upload_id}")
+
+    upload_id = client.post("/uploads?algorithm=aes256gcm&filename=data.bin&size=100&chunk_size=100",
+                            headers=headers).json()["upload_id"]
+    client.put(f"/uploads/{upload_id}/chunks/0", content=b"x" * 100, headers=headers)
+    session = upload_sessions.get(upload_id)
+    session.finish()
+    with pytest.raises(ValueError, match="closed"):
+        session.finish()
+    client.delete(f"/uploads/{upload_id}")
+
+
+def test_upload_chunk_size_limit():
+    """Oversized chunks get 413 while they arrive, whatever Content-Length claims"""
+    headers = {"Content-Type": "application/octet-stream", "X-Encryption-Key": KEY}
+    session = client.post("/uploads?algorithm=aes256&filename=big.bin&size=131072&chunk_size=65536", headers=headers).json()
+    url = f"/uploads/{session['upload_id']}/chunks/0"
+
+    def body(size):
+        for _ in range(size // 4096):
+            yield b"x" * 4096
+
+    assert client.put(url, content=b"x" * 65537, headers=headers).status_code == 413
+    # No Content-Length (chunked transfer) or a bogus one: the streamed size decides
+    assert client.put(url, content=body(69632), headers=headers).status_code == 413
+    assert client.put(url, content=body(69632), headers={**headers, "Content-Length": "abc"}).status_code == 413
+    assert client.put(url, content=body(65536), headers={**headers, "Content-Length": "abc"}).status_code == 200
+    assert client.get(f"/uploads/{session['upload_id']}").json()["missing"] == [1]
+    client.delete(f"/uploads/{session['upload_id']}")
+
+
+@pytest.mark.parametrize("algorithm", ["aes256", "aes256gcm"])
+def test_chunked_upload_session(algorithm):
+    """Chunks sent out of order and retried after a failure commit to a normal encrypted file"""
+    data = os.urandom(2 * 65536 + 1000)
+    headers = {"Content-Type": "application/octet-stream", "X-Encryption-Key": KEY}
+    session = client.post(f"/uploads?algorithm={algorithm}&filename=big.bin&size={len(data)}&chunk_size=65536",
+                          headers=headers).json()
+    url = f"/uploads/{session['upload_id']}"
+    assert session["chunks"] == 3 and session["missing"] == [0, 1, 2]
+
+    assert client.put(f"{url}/chunks/2", content=data[131072:], headers=headers).json()["missing"] == [0, 1]
+    assert client.put(f"{url}/chunks/0", content=data[:65536], headers=headers).status_code == 200
+    assert client.post(f"{url}/commit").status_code == 409  # chunk 1 still missing
+    assert client.put(f"{url}/chunks/1", content=data[:100], headers=headers).status_code == 400
+    assert client.put(f"{url}/chunks/0", content=data[65536:131072], headers=headers).status_code == 409
+    # Resuming: repeating an accepted chunk is harmless
+    assert client.put(f"{url}/chunks/0", content=data[:65536], headers=headers).status_code == 200
+    assert client.get(url).json()["missing"] == [1]
+    client.put(f"{url}/chunks/1", content=data[65536:131072], headers=headers)
+
+    response = client.post(f"{url}/commit")
+    assert response.status_code == 200
+    encrypted = client.get(response.json()["encrypted_file"]).content
+    assert client.get(url).status_code == 404
+
+    response = client.post("/decrypt?inline=true", files={"file": ("big.bin.enc", encrypted)},
+                           data={"algorithm": algorithm, "key": KEY})
+    assert response.content == data
+
+
+def wait_for_job(job_id):
+    for _ in range(200):
+        job = client.get(f"/jobs/{job_id}").json()
+        if job["status"] not in ("queued", "running"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError("job did not finish")
+
+
+def test_job_round_trip():
+    data = os.urandom(300000)
+    response = client.post("/jobs", files={"file": ("data.bin", data)}, data={"algorithm": "chacha20poly1305", "key": KEY})
+    assert response.status_code == 202 and response.headers["location"] == f"/jobs/{response.json()['job_id']}"
+    job = wait_for_job(response.json()["job_id"])
+    assert job["status"] == "done" and job["progress"] == 1.0 and job["bytes_done"] == len(data)
+    encrypted = client.get(f"/jobs/{job['job_id']}/result").content
+
+    response = client.post("/jobs", files={"file": ("data.bin.enc", encrypted)},
+                           data={"algorithm": "chacha20poly1305", "key": KEY, "operation": "decrypt"}, params={"priority": 5})
+    job = wait_for_job(response.json()["job_id"])
+    assert job["priority"] == 5 and client.get(job["result"]).content == data
+
+
+def test_large_upload_routes_to_job(monkeypatch):
+    monkeypatch.setattr("main.JOB_THRESHOLD", 1000)
+    response = client.post("/encrypt", files={"file": ("data.bin", os.urandom(5000))}, data={"algorithm": "aes256", "key": KEY})
+    assert response.status_code == 202
+    job = wait_for_job(response.json()["job_id"])
+    assert job["status"] == "done" and job["operation"] == "encrypt"
+
+    response = client.post("/decrypt", files={"file": ("data.bin.enc", os.urandom(5000))}, data={"algorithm": "aes256", "key": KEY})
+    job = wait_for_job(response.json()["job_id"])
+    assert job["status"] == "failed" and job["error"]
+    assert client.get(f"/jobs/{job['job_id']}/result").status_code == 409
+
+
+def test_compressed_jobs_and_unknown_codec():
+    data = b"0123456789abcdef" * 20000
+    form = {"algorithm": "chacha20poly1305", "key": KEY}
+    response = client.post("/encrypt?compress=brotli", files={"file": ("data.bin", data)}, data=form)
+    assert response.status_code == 400 and "brotli" in response.json()["detail"]
+
+    response = client.post("/jobs?compress=zlib", files={"file": ("data.bin", data)}, data=form)
+    job = wait_for_job(response.json()["job_id"])
+    encrypted = client.get(job["result"]).content
+    assert job["status"] == "done" and len(encrypted) < len(data) // 4
+
+    response = client.post("/jobs", files={"file": ("data.bin.enc", encrypted)}, data={**form, "operation": "decrypt"})
+    assert client.get(wait_for_job(response.json()["job_id"])["result"]).content == data
+
+
+def progress_events(progress_id):
+    events = []
+    with client.stream("GET", f"/progress/{progress_id}") as response:
+        assert response.headers["content-type"].startswith("text/event-stream")
+        for line in response.iter_lines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                events.append((event, json.loads(line[len("data: "):])))
+    return events
+
+
+@pytest.mark.parametrize("size", [1000, 400000])
+def test_progress_stream_reports_final_state(size):
+    """A ?progress_id= request is replayed on /progress after it finished, ending with done"""
+    progress_id = f"encrypt-{size}"
+    response = client.post(f"/encrypt?progress_id={progress_id}", files={"file": ("data.bin", os.urandom(size))},
+                           data={"algorithm": "aes256", "key": KEY})
+    assert response.status_code == 200
+    event, state = progress_events(progress_id)[-1]
+    assert event == "progress" and state["stage"] == "done" and state["operation"] == "encrypt"
+    assert state["bytes_done"] == state["bytes_total"] == size and state["progress"] == 1.0
+
+    response = client.put("/decrypt/stream?algorithm=aes256&filename=d.enc&progress_id=bad-key", content=os.urandom(1000),
+                          headers={"Content-Type": "application/octet-stream", "X-Encryption-Key": KEY})
+    assert response.status_code == 500
+    event, state = progress_events("bad-key")[-1]
+    assert state["stage"] == "failed" and state["error"]
+    assert client.post("/encrypt?progress_id=no/slashes", files={"file": ("d", b"x")},
+                       data={"algorithm": "aes256", "key": KEY}).status_code == 400
+
+
+def test_progress_stream_for_jobs():
+    response = client.post("/jobs", files={"file": ("data.bin", os.urandom(3000000))}, data={"algorithm": "aes256gcm", "key": KEY})
+    job_id = response.json()["job_id"]
+    events = progress_events(job_id)
+    assert events[-1][1]["stage"] == "done" and events[-1][1]["result"] == f"/download/{job_id}/data.bin.enc"
+    assert [state["bytes_done"] for _, state in events] == sorted(state["bytes_done"] for _, state in events)
+
+
+def test_request_deadline_cancels_and_cleans_up(monkeypatch):
+    from artifacts import artifact_store
+
+    monkeypatch.setattr("main.REQUEST_DEADLINE", 1e-9)
+    pending = artifact_store.stats()["pending"]
+    response = client.post("/encrypt?progress_id=deadline", files={"file": ("data.bin", os.urandom(400000))},
+                           data={"algorithm": "aes256gcm", "key": KEY})
+    assert response.status_code == 504
+    assert artifact_store.stats()["pending"] == pending
+    assert progress_events("deadline")[-1][1]["stage"] == "cancelled"
+
+
+@pytest.mark.parametrize("algorithm, params", [
+    ("aes256", {}),
+    ("blowfish", {}),
+    ("blowfish", {"workers": 2}),
+])
+def test_deadline_stops_mmap_and_worker_decryption(algorithm, params, monkeypatch):
+    """The mmap and ?workers= paths check the deadline per step and per range, not only when done"""
+    import Process.cbc_buffer
+    import Process.parallel_cbc
+    import Process.Symmetric_algo.fernet_stream
+    from artifacts import artifact_store
+    from progress import Progress
+
+    encrypted = client.post("/encrypt?inline=true", files={"file": ("data.bin", os.urandom(400000))},
+                            data={"algorithm": algorithm, "key": KEY}).content
+    monkeypatch.setattr(Process.cbc_buffer, "STEP", 4096)
+    monkeypatch.setattr(Process.parallel_cbc, "DEFAULT_RANGE_SIZE", 4096)
+    monkeypatch.setattr(Process.Symmetric_algo.fernet_stream, "DEFAULT_CHUNK_SIZE", 4096)
+    monkeypatch.setattr("main.MMAP_DECRYPT_SIZE", 0)
+    monkeypatch.setattr("main.MAX_FILE_WORKERS", 2)
+    monkeypatch.setattr("main.REQUEST_DEADLINE", 60)
+
+    # Let the deadline pass right after the first report of the decrypt stage
+    reported = []
+    report = Progress.__call__
+
+    def expire_after_first_report(self, done):
+        report(self, done)
+        if self.stage == "decrypt":
+            reported.append(done)
+            self.token.deadline = time.monotonic()
+
+    monkeypatch.setattr(Progress, "__call__", expire_after_first_report)
+    pending = artifact_store.stats()["pending"]
+    response = client.post("/decrypt", params={"progress_id": f"deadline-{algorithm}", **params},
+                           files={"file": ("data.bin.enc", encrypted)}, data={"algorithm": algorithm, "key": KEY})
+    assert response.status_code == 504
+    assert reported and max(reported) < len(encrypted)
+    assert artifact_store.stats()["pending"] == pending
+    assert progress_events(f"deadline-{algorithm}")[-1][1]["stage"] == "cancelled"
+
+
+def test_cancel_running_job(tmp_path):
+    import threading
+    from artifacts import ArtifactStore
+    from jobs import JobQueue
+
+    store = ArtifactStore(root=str(tmp_path))
+    queue = JobQueue(db_path=str(tmp_path / "jobs.sqlite3"), workers=1, store=store)
+    started = threading.Event()
+
+    def endless(job, key, progress):
+        started.set()
+        while True:
+            progress(1)
+            time.sleep(0.01)
+
+    queue.start(endless)
+    job_id, workspace = store.workspace()
+    with open(os.path.join(workspace, "data.bin"), "wb") as f:
+        f.write(b"x" * 100)
+    queue.submit("encrypt", "aes256", KEY, "data.bin", os.path.join(workspace, "data.bin"))
+    assert started.wait(5) and queue.cancel(job_id)
+    for _ in range(100):
+        if queue.get(job_id)["status"] == "cancelled":
+            break
+        time.sleep(0.02)
+    assert queue.get(job_id)["status"] == "cancelled" and not os.path.exists(workspace)
+    assert not queue.cancel(job_id)
+    queue.shutdown()
+
+
+def test_job_results_survive_restart(tmp_path):
+    from artifacts import ArtifactStore
+    from jobs import JobQueue
+
+    def copy(job, key, progress):
+        output_path = os.path.join(os.path.dirname(job["input_path"]), "encrypted", "data.bin.enc")
+        os.makedirs(os.path.dirname(output_path))
+        shutil.copy(job["input_path"], output_path)
+        return output_path
+
+    db_path = str(tmp_path / "jobs.sqlite3")
+    store = ArtifactStore(root=str(tmp_path))
+    queue = JobQueue(db_path=db_path, workers=1, store=store)
+    queue.start(copy)
+    job_id, workspace = store.workspace()
+    with open(os.path.join(workspace, "data.bin"), "wb") as f:
+        f.write(b"x" * 100)
+    queue.submit("encrypt", "aes256", KEY, "data.bin", os.path.join(workspace, "data.bin"))
+    for _ in range(100):
+        if queue.get(job_id)["status"] == "done":
+            break
+        time.sleep(0.02)
+    result = queue.get(job_id)["result"]
+    assert result == f"/download/{job_id}/data.bin.enc"
+    queue.shutdown()
+
+    # A new process starts with an empty artifact index; the link keeps working until the TTL runs out
+    store = ArtifactStore(root=str(tmp_path))
+    assert JobQueue(db_path=db_path, store=store).get(job_id)["result"] == result
+    artifact = store.lookup(job_id, "data.bin.enc")
+    assert artifact is not None and artifact.size == 100
+
+    # Expired by the time of the next restart: the dead link is cleared
+    store = ArtifactStore(root=str(tmp_path), ttl=0)
+    assert JobQueue(db_path=db_path, store=store).get(job_id)["result"] is None
+    assert store.lookup(job_id, "data.bin.enc") is None
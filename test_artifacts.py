@@ -0,0 +1,87 @@
+"""
+Tests for the /download artifact store
+"""
+import os
+import time
+from artifacts import ArtifactStore
+
+
+def publish(store, data, name="out.bin"):
+    artifact_id, workspace = store.workspace()
+    with open(os.path.join(workspace, "upload.bin"), "wb") as f:
+        f.write(b"input")
+    output_dir = os.path.join(workspace, "encrypted")
+    os.makedirs(output_dir)
+    output_path = os.path.join(output_dir, name)
+    with open(output_path, "wb") as f:
+        f.write(data)
+    store.publish(artifact_id, output_path)
+    return artifact_id, workspace, output_path
+
+
+def test_publish_keeps_only_output_and_indexes_it(tmp_path):
+    store = ArtifactStore(str(tmp_path), ttl=60)
+    artifact_id, workspace, output_path = publish(store, b"x" * 10)
+
+    assert os.path.dirname(workspace) == os.path.join(store.root, artifact_id[:2])
+    assert os.listdir(workspace) == ["encrypted"]
+    assert store.lookup(artifact_id, "out.bin").path == output_path
+    assert store.lookup(artifact_id, "other.bin") is None
+    assert store.lookup("missing", "out.bin") is None
+    assert store.stats()["bytes"] == 10
+
+    store.discard(artifact_id)
+    assert store.lookup(artifact_id, "out.bin") is None
+    assert not os.path.exists(workspace)
+
+
+def test_quota_evicts_least_recently_used(tmp_path):
+    store = ArtifactStore(str(tmp_path), ttl=60, max_bytes=25)
+    first, first_dir, _ = publish(store, b"a" * 10)
+    second, second_dir, _ = publish(store, b"b" * 10)
+    store.lookup(first, "out.bin")  # first is now the most recently used
+    third, _, _ = publish(store, b"c" * 10)
+
+    assert store.lookup(second, "out.bin") is None
+    assert not os.path.exists(second_dir)
+    assert store.lookup(first, "out.bin") and store.lookup(third, "out.bin")
+    assert store.stats()["bytes"] == 20 and store.evicted == 1
+
+
+def test_sweep_expires_artifacts_and_reclaims_leaked_workspaces(tmp_path):
+    store = ArtifactStore(str(tmp_path), ttl=60)
+    artifact_id, workspace, _ = publish(store, b"x")
+    _, pending = store.workspace()  # never published or discarded
+    leaked = os.path.join(store.root, "ab", "ab" + "0" * 30)  # from a previous process
+    os.makedirs(leaked)
+
+    assert store.sweep() == 0
+    assert store.sweep(now=time.time() + 120) == 3
+    assert not any(os.path.exists(path) for path in (workspace, pending, leaked))
+    assert store.lookup(artifact_id, "out.bin") is None
+    assert store.stats()["artifacts"] == 0 and store.stats()["pending"] == 0
+
+
+def test_memory_tier_spills_least_recently_used_to_disk(tmp_path):
+    store = ArtifactStore(str(tmp_path), ttl=60, memory_bytes=25, memory_item_size=15)
+    small = store.put("small.bin", b"a" * 10)
+    assert store.lookup(small, "small.bin").data == b"a" * 10
+    assert not os.path.exists(os.path.join(store.root, small[:2], small))
+
+    large = store.put("large.bin", b"b" * 20)  # over memory_item_size: straight to disk
+    with open(store.lookup(large, "large.bin").path, "rb") as f:
+        assert f.read() == b"b" * 20
+
+    second = store.put("second.bin", b"c" * 10)
+    store.lookup(small, "small.bin")  # small is now the most recently used
+    store.put("third.bin", b"d" * 10)
+
+    spilled = store.lookup(second, "second.bin")
+    assert spilled.data is None and spilled.spilling
+    with open(spilled.path, "rb") as f:
+        assert f.read() == b"c" * 10
+    assert store.lookup(small, "small.bin").data == b"a" * 10
+    assert store.stats()["memory_bytes"] == 20 and store.stats()["bytes"] == 30
+
+    store.discard(second)
+    assert store.stats()["bytes"] == 20
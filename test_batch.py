@@ -0,0 +1,50 @@
+"""
+Tests for the parallel batch CLI in Process/batch.py
+"""
+import os
+from Process.batch import run_batch, main
+
+KEY = "test_key_123"
+
+
+def make_tree(root):
+    files = {"a.txt": b"alpha" * 1000, os.path.join("sub", "b.bin"): os.urandom(5000)}
+    for name, data in files.items():
+        path = os.path.join(root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+    return files
+
+
+def test_batch_round_trip_mirrors_tree(tmp_path):
+    work_dir = str(tmp_path)
+    files = make_tree(os.path.join(work_dir, "plain"))
+
+    summary = run_batch('encrypt', 'aes256', os.path.join(work_dir, "plain"), os.path.join(work_dir, "enc"), KEY, jobs=2)
+    assert summary['succeeded'] == 2 and summary['failed'] == 0
+    assert summary['bytes'] == sum(len(data) for data in files.values())
+
+    summary = run_batch('decrypt', 'aes256', os.path.join(work_dir, "enc"), os.path.join(work_dir, "dec"), KEY, jobs=1)
+    assert summary['failed'] == 0
+    for name, data in files.items():
+        with open(os.path.join(work_dir, "dec", name), 'rb') as f:
+            assert f.read() == data
+
+
+def test_batch_collects_errors_instead_of_printing(capsys, tmp_path):
+    work_dir = str(tmp_path)
+    make_tree(os.path.join(work_dir, "plain"))
+    run_batch('encrypt', 'blowfish', os.path.join(work_dir, "plain"), os.path.join(work_dir, "enc"), KEY, jobs=1)
+
+    summary = run_batch('decrypt', 'aes128', os.path.join(work_dir, "enc"), os.path.join(work_dir, "dec"), KEY, jobs=1)
+    assert summary['failed'] == 2
+    assert all(error for _, error in summary['errors'])
+    assert capsys.readouterr().out == ""
+
+
+def test_batch_cli_exit_code(tmp_path):
+    work_dir = str(tmp_path)
+    make_tree(os.path.join(work_dir, "plain"))
+    args = ['--input', os.path.join(work_dir, "plain"), '--output', os.path.join(work_dir, "enc"), '--key', KEY, '--jobs', '1']
+    assert main(['encrypt', 'aes128'] + args) == 0
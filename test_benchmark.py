@@ -0,0 +1,58 @@
+"""
+Tests for the benchmark harness in Process/benchmark.py
+"""
+import json
+import copy
+import os
+from Process.benchmark import run_benchmark, compare, parse_size, percentile, main
+
+
+def test_parse_size_and_percentile():
+    assert parse_size("512") == 512
+    assert parse_size("64K") == 64 * 1024
+    assert parse_size("16mb") == 16 * 1024 * 1024
+    assert parse_size("2GiB") == 2 * 1024 ** 3
+    values = sorted(range(1, 101))
+    assert percentile(values, 0.5) == 50
+    assert percentile(values, 0.99) == 99
+    assert percentile([7], 0.9) == 7
+
+
+def test_benchmark_reports_every_case():
+    reported = []
+    results = run_benchmark(['aes256', 'rsa'], [1000, 70000], repeat=2, isolate=False, report=reported.append)
+    cases = [(r['operation'], r['algorithm'], r['size']) for r in results['results']]
+    assert cases == [(op, algo, size) for size in (1000, 70000) for algo in ('aes256', 'rsa') for op in ('encrypt', 'decrypt')]
+    assert reported == results['results']
+    for result in results['results']:
+        assert result['calls'] == 2 and result['mb_per_second'] > 0
+        latency = result['latency']
+        assert latency['min'] <= latency['p50'] <= latency['p90'] <= latency['p99'] <= latency['max']
+        assert result['tracemalloc_peak'] > 0
+    assert results['environment']['cryptography']
+    json.dumps(results)
+
+
+def test_baseline_comparison_flags_regressions():
+    baseline = run_benchmark(['blowfish'], [4096], repeat=1, isolate=False)
+    assert compare(baseline, baseline) == []
+
+    slower = copy.deepcopy(baseline)
+    slower['results'][0]['mb_per_second'] = baseline['results'][0]['mb_per_second'] * 0.5
+    slower['results'][1]['tracemalloc_peak'] = baseline['results'][1]['tracemalloc_peak'] + 64 * 1024 * 1024
+    regressions = compare(slower, baseline, tolerance=0.2)
+    assert [case for case, _ in regressions] == ["encrypt blowfish 4K", "decrypt blowfish 4K"]
+    assert compare(slower, baseline, tolerance=0.6)[0][0] == "decrypt blowfish 4K"
+
+
+def test_benchmark_cli_writes_json_and_fails_on_regression(tmp_path):
+    work_dir = str(tmp_path)
+    output = os.path.join(work_dir, "bench.json")
+    assert main(['--algorithms', 'aes128', '--sizes', '2K', '-n', '1', '--no-isolate', '-o', output]) == 0
+    with open(output) as f:
+        baseline = json.load(f)
+    for result in baseline['results']:
+        result['mb_per_second'] *= 1000
+    with open(output, 'w') as f:
+        json.dump(baseline, f)
+    assert main(['--algorithms', 'aes128', '--sizes', '2K', '-n', '1', '--no-isolate', '--baseline', output]) == 1
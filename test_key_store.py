@@ -0,0 +1,35 @@
+"""
+Tests for the cached RSA key store
+"""
+import os
+from Process.Asymmetric_algo.key_store import KeyStore
+from Process.Asymmetric_algo.Encryption.rsa.rsa import generate_rsa_keys
+
+
+def test_key_store_parses_once_and_reloads_on_change(tmp_path):
+    keys_path = str(tmp_path)
+    generate_rsa_keys(keys_path)
+    store = KeyStore(keys_path)
+
+    first = store.private_key()
+    assert store.private_key() is first
+    assert store.loads == 1 and store.hits == 1
+
+    # Rewriting the key pair changes mtime/inode, so the next lookup reparses
+    private_key, _ = generate_rsa_keys(keys_path)
+    reloaded = store.private_key()
+    assert reloaded is not first
+    assert reloaded.private_numbers() == private_key.private_numbers()
+
+
+def test_key_store_named_pairs(tmp_path):
+    keys_path = str(tmp_path)
+    generate_rsa_keys(keys_path)
+    _, archive_public = generate_rsa_keys(os.path.join(keys_path, "archive"))
+    store = KeyStore(keys_path)
+
+    assert store.public_key("archive").public_numbers() == archive_public.public_numbers()
+    assert store.public_key().public_numbers() != archive_public.public_numbers()
+
+    store.register("backup", public_key_path=os.path.join(keys_path, "archive", "public_key.pem"))
+    assert store.public_key("backup") is store.public_key("archive")
@@ -0,0 +1,681 @@
+"""
+Round-trip tests for the streaming encrypt/decrypt modes
+"""
+import os
+import pytest
+from Process.Symmetric_algo.Encryption_algo.aes256 import encrypt_file as aes256_encrypt
+from Process.Symmetric_algo.Encryption_algo.aes128 import encrypt_file as aes128_encrypt
+from Process.Symmetric_algo.Decryption_algo.aes256_dec import decrypt_file as aes256_decrypt
+from Process.Symmetric_algo.Decryption_algo.aes128_dec import decrypt_file as aes128_decrypt
+from Process.Symmetric_algo.Encryption_algo.blowfish import encrypt_file as blowfish_encrypt
+from Process.Symmetric_algo.Decryption_algo.blowfish_dec import decrypt_file as blowfish_decrypt
+from Process.Asymmetric_algo.Encryption.rsa.rsa import encrypt_file as rsa_encrypt, generate_rsa_keys
+from Process.Asymmetric_algo.Decryption.rsa.rsa_dec import decrypt_file as rsa_decrypt
+from Process.Symmetric_algo.Encryption_algo import aes256, aes128, blowfish, aes256gcm, chacha20poly1305
+from Process.Symmetric_algo.Decryption_algo import aes256_dec, aes128_dec, blowfish_dec, aes256gcm_dec, chacha20poly1305_dec
+from Process.Asymmetric_algo.Encryption.rsa import rsa
+from Process.Asymmetric_algo.Decryption.rsa import rsa_dec
+from Process.Symmetric_algo.fernet_stream import convert_file
+from Process.cancellation import CancelToken, Cancelled, DeadlineExceeded
+from Process import compression
+
+KEY = "test_key_123"
+
+
+def make_file(directory, name, data):
+    path = os.path.join(directory, name)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+
+def read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("encrypt, decrypt", [
+    (aes256_encrypt, aes256_decrypt),
+    (aes128_encrypt, aes128_decrypt),
+])
+@pytest.mark.parametrize("size", [0, 1, 4096, 10000])
+def test_fernet_stream_round_trip(encrypt, decrypt, size, tmp_path):
+    """Chunked container decrypts back to the original for any size"""
+    work_dir = str(tmp_path)
+    data = os.urandom(size)
+    input_path = make_file(work_dir, "data.bin", data)
+
+    encrypt(input_path, os.path.join(work_dir, "enc"), KEY, stream=True, chunk_size=4096)
+    encrypted_path = os.path.join(work_dir, "enc", "data.bin.enc")
+    decrypt(encrypted_path, os.path.join(work_dir, "dec"), KEY)
+
+    assert read_file(os.path.join(work_dir, "dec", "data.bin")) == data
+
+
+def test_fernet_stream_reads_single_token_files(tmp_path):
+    """Files written before stream mode still decrypt"""
+    work_dir = str(tmp_path)
+    input_path = make_file(work_dir, "legacy.txt", b"legacy single-token file")
+
+    aes256_encrypt(input_path, os.path.join(work_dir, "enc"), KEY)
+    aes256_decrypt(os.path.join(work_dir, "enc", "legacy.txt.enc"), os.path.join(work_dir, "dec"), KEY)
+
+    assert read_file(os.path.join(work_dir, "dec", "legacy.txt")) == b"legacy single-token file"
+
+
+def test_fernet_stream_rejects_truncation(tmp_path):
+    """Dropping the final segment must not yield a decrypted file"""
+    work_dir = str(tmp_path)
+    input_path = make_file(work_dir, "data.bin", os.urandom(10000))
+
+    aes256_encrypt(input_path, os.path.join(work_dir, "enc"), KEY, stream=True, chunk_size=4096)
+    encrypted_path = os.path.join(work_dir, "enc", "data.bin.enc")
+    encrypted = read_file(encrypted_path)
+    with open(encrypted_path, 'wb') as f:
+        f.write(encrypted[:len(encrypted) // 2])
+
+    aes256_decrypt(encrypted_path, os.path.join(work_dir, "dec"), KEY)
+    assert not os.path.exists(os.path.join(work_dir, "dec", "data.bin"))
+
+
+@pytest.mark.parametrize("encrypt_stream, decrypt_stream", [(True, False), (False, True), (True, True)])
+@pytest.mark.parametrize("size", [0, 7, 8, 10000])
+def test_blowfish_stream_matches_legacy_format(encrypt_stream, decrypt_stream, size, tmp_path):
+    """Streaming Blowfish output is interchangeable with the one-shot format"""
+    work_dir = str(tmp_path)
+    data = os.urandom(size)
+    input_path = make_file(work_dir, "data.bin", data)
+
+    blowfish_encrypt(input_path, os.path.join(work_dir, "enc"), KEY, stream=encrypt_stream, chunk_size=1000)
+    encrypted_path = os.path.join(work_dir, "enc", "data.bin.enc")
+    assert os.path.getsize(encrypted_path) == 8 + (size // 8 + 1) * 8
+
+    blowfish_decrypt(encrypted_path, os.path.join(work_dir, "dec"), KEY, stream=decrypt_stream, chunk_size=1000)
+    assert read_file(os.path.join(work_dir, "dec", "data.bin")) == data
+
+
+@pytest.mark.parametrize("size", [0, 15, 16, 100000])
+def test_rsa_stream_round_trip(size, tmp_path):
+    """Streaming hybrid RSA output decrypts back with PKCS7 on both sides"""
+    work_dir = str(tmp_path)
+    private_key, public_key = generate_rsa_keys(os.path.join(work_dir, "Keys"))
+    data = os.urandom(size)
+    input_path = make_file(work_dir, "data.bin", data)
+
+    rsa_encrypt(input_path, os.path.join(work_dir, "enc"), public_key, KEY, stream=True, chunk_size=4096)
+    rsa_decrypt(os.path.join(work_dir, "enc", "data.bin.enc"), os.path.join(work_dir, "dec"), private_key, KEY, chunk_size=4096)
+
+    assert read_file(os.path.join(work_dir, "dec", "data.bin")) == data
+
+
+def test_fernet_stream_decryptor_accepts_single_token(tmp_path):
+    """The push-style decryptor falls back to legacy single-token input"""
+    from Process.Symmetric_algo.Decryption_algo.aes256_dec import stream_decryptor
+    work_dir = str(tmp_path)
+    input_path = make_file(work_dir, "legacy.txt", b"legacy single-token file")
+    aes256_encrypt(input_path, work_dir, KEY)
+
+    decryptor = stream_decryptor(KEY)
+    token = read_file(input_path + ".enc")
+    assert decryptor.update(token[:10]) + decryptor.update(token[10:]) + decryptor.finalize() == b"legacy single-token file"
+
+
+@pytest.mark.parametrize("encrypt_workers, decrypt_workers", [(2, None), (None, 2), (3, 2)])
+def test_fernet_parallel_segments_round_trip(encrypt_workers, decrypt_workers, tmp_path):
+    """Segment-parallel encryption writes the same container as the serial path"""
+    work_dir = str(tmp_path)
+    data = os.urandom(50000)
+    input_path = make_file(work_dir, "data.bin", data)
+
+    aes256_encrypt(input_path, os.path.join(work_dir, "enc"), KEY, stream=True, chunk_size=4096, workers=encrypt_workers)
+    aes256_decrypt(os.path.join(work_dir, "enc", "data.bin.enc"), os.path.join(work_dir, "dec"), KEY, workers=decrypt_workers)
+
+    assert read_file(os.path.join(work_dir, "dec", "data.bin")) == data
+
+
+def test_fernet_parallel_decrypt_rejects_truncation(tmp_path):
+    work_dir = str(tmp_path)
+    input_path = make_file(work_dir, "data.bin", os.urandom(20000))
+    aes128_encrypt(input_path, os.path.join(work_dir, "enc"), KEY, stream=True, chunk_size=4096)
+    encrypted_path = os.path.join(work_dir, "enc", "data.bin.enc")
+    encrypted = read_file(encrypted_path)
+    # Drop the final record exactly at a record boundary
+    offset, last_record = 25, 25
+    while offset < len(encrypted):
+        last_record = offset
+        offset += 4 + int.from_bytes(encrypted[offset:offset + 4], "big")
+    with open(encrypted_path, 'wb') as f:
+        f.write(encrypted[:last_record])
+
+    aes128_decrypt(encrypted_path, os.path.join(work_dir, "dec"), KEY, workers=2)
+    assert not os.path.exists(os.path.join(work_dir, "dec", "data.bin"))
+
+
+@pytest.mark.parametrize("size", [0, 8, 9, 100000])
+def test_blowfish_parallel_decrypt_existing_format(size, monkeypatch, tmp_path):
+    """Range-parallel CBC decryption reads the unchanged Blowfish format"""
+    from Process import parallel_cbc
+    work_dir = str(tmp_path)
+    data = os.urandom(size)
+    input_path = make_file(work_dir, "data.bin", data)
+    blowfish_encrypt(input_path, os.path.join(work_dir, "enc"), KEY)
+
+    monkeypatch.setattr(parallel_cbc, "DEFAULT_RANGE_SIZE", 1000)  # many ranges, not block aligned on purpose
+    blowfish_decrypt(os.path.join(work_dir, "enc", "data.bin.enc"), os.path.join(work_dir, "dec"), KEY, workers=2)
+    assert read_file(os.path.join(work_dir, "dec", "data.bin")) == data
+
+
+def test_rsa_parallel_decrypt(tmp_path):
+    work_dir = str(tmp_path)
+    private_key, public_key = generate_rsa_keys(os.path.join(work_dir, "Keys"))
+    data = os.urandom(100000)
+    input_path = make_file(work_dir, "data.bin", data)
+
+    rsa_encrypt(input_path, os.path.join(work_dir, "enc"), public_key, KEY, stream=True)
+    rsa_decrypt(os.path.join(work_dir, "enc", "data.bin.enc"), os.path.join(work_dir, "dec"), private_key, KEY, workers=2)
+
+    assert read_file(os.path.join(work_dir, "dec", "data.bin")) == data
+
+
+def test_parallel_calls_share_one_pool(tmp_path):
+    """Parallel encrypt/decrypt reuse one bounded process pool instead of starting one per call"""
+    from Process import worker_pool
+    work_dir = str(tmp_path)
+    data = os.urandom(50000)
+    input_path = make_file(work_dir, "data.bin", data)
+
+    aes256_encrypt(input_path, os.path.join(work_dir, "enc"), KEY, stream=True, chunk_size=4096, workers=2)
+    pool = worker_pool.get()
+    aes256_decrypt(os.path.join(work_dir, "enc", "data.bin.enc"), os.path.join(work_dir, "dec"), KEY, workers=10 ** 6)
+    blowfish_encrypt(input_path, os.path.join(work_dir, "bf"), KEY)
+    blowfish_decrypt(os.path.join(work_dir, "bf", "data.bin.enc"), os.path.join(work_dir, "bf-dec"), KEY, workers=2)
+
+    assert worker_pool.get() is pool
+    assert worker_pool.clamp(10 ** 6) == worker_pool.MAX_WORKERS
+    assert read_file(os.path.join(work_dir, "dec", "data.bin")) == data
+    assert read_file(os.path.join(work_dir, "bf-dec", "data.bin")) == data
+
+
+AEAD_MODULES = [(aes256gcm, aes256gcm_dec), (chacha20poly1305, chacha20poly1305_dec)]
+
+
+@pytest.mark.parametrize("enc, dec", AEAD_MODULES)
+@pytest.mark.parametrize("size", [0, 1, 4096, 10000])
+def test_aead_round_trip(enc, dec, size, tmp_path):
+    work_dir = str(tmp_path)
+    data = os.urandom(size)
+    input_path = make_file(work_dir, "data.bin", data)
+
+    enc.encrypt_file(input_path, os.path.join(work_dir, "enc"), KEY, chunk_size=4096)
+    encrypted_path = os.path.join(work_dir, "enc", "data.bin.enc")
+    # 33-byte header plus a 16-byte tag per segment, no base64 expansion
+    segments = max(1, -(-size // 4096))
+    assert os.path.getsize(encrypted_path) == size + 33 + 16 * segments
+    dec.decrypt_file(encrypted_path, os.path.join(work_dir, "dec"), KEY)
+
+    assert read_file(os.path.join(work_dir, "dec", "data.bin")) == data
+
+
+@pytest.mark.parametrize("enc, dec", AEAD_MODULES)
+@pytest.mark.parametrize("damage", ["truncate", "flip", "wrong_key"])
+def test_aead_rejects_damaged_files(enc, dec, damage, tmp_path):
+    """Truncated, modified or wrongly keyed files leave no decrypted output"""
+    work_dir = str(tmp_path)
+    input_path = make_file(work_dir, "data.bin", os.urandom(10000))
+
+    enc.encrypt_file(input_path, os.path.join(work_dir, "enc"), KEY, chunk_size=4096)
+    encrypted_path = os.path.join(work_dir, "enc", "data.bin.enc")
+    encrypted = bytearray(read_file(encrypted_path))
+    if damage == "truncate":
+        # Cut exactly at a segment boundary, which only the last-segment flag catches
+        encrypted = encrypted[:33 + 2 * (4096 + 16)]
+    elif damage == "flip":
+        encrypted[5000] ^= 1
+    with open(encrypted_path, 'wb') as f:
+        f.write(encrypted)
+
+    dec.decrypt_file(encrypted_path, os.path.join(work_dir, "dec"), "wrong_key" if damage == "wrong_key" else KEY)
+    assert not os.path.exists(os.path.join(work_dir, "dec", "data.bin"))
+
+
+@pytest.mark.parametrize("encrypt, decrypt", [
+    (aes256_encrypt, aes256_decrypt),
+    (aes128_encrypt, aes128_decrypt),
+])
+@pytest.mark.parametrize("workers", [None, 2])
+@pytest.mark.parametrize("size", [0, 4096, 10000])
+def test_fernet_binary_container_round_trip(encrypt, decrypt, workers, size, tmp_path):
+    work_dir = str(tmp_path)
+    data = os.urandom(size)
+    input_path = make_file(work_dir, "data.bin", data)
+
+    encrypt(input_path, os.path.join(work_dir, "b64"), KEY, stream=True, chunk_size=4096)
+    encrypt(input_path, os.path.join(work_dir, "enc"), KEY, chunk_size=4096, workers=workers, binary=True)
+    encrypted_path = os.path.join(work_dir, "enc", "data.bin.enc")
+    assert os.path.getsize(encrypted_path) < os.path.getsize(os.path.join(work_dir, "b64", "data.bin.enc"))
+    decrypt(encrypted_path, os.path.join(work_dir, "dec"), KEY, workers=workers)
+
+    assert read_file(os.path.join(work_dir, "dec", "data.bin")) == data
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_fernet_convert_without_key(stream, tmp_path):
+    """Base64 files convert to binary and back, and every form still decrypts"""
+    work_dir = str(tmp_path)
+    data = os.urandom(10000)
+    input_path = make_file(work_dir, "data.bin", data)
+    aes256_encrypt(input_path, os.path.join(work_dir, "enc"), KEY, stream=stream, chunk_size=4096)
+    original_path = os.path.join(work_dir, "enc", "data.bin.enc")
+
+    binary_path = os.path.join(work_dir, "binary.enc")
+    convert_file(original_path, binary_path, binary=True)
+    back_path = os.path.join(work_dir, "back.enc")
+    convert_file(binary_path, back_path, binary=False)
+    assert read_file(back_path) == read_file(original_path)
+
+    aes256_decrypt(binary_path, os.path.join(work_dir, "dec"), KEY)
+    assert read_file(os.path.join(work_dir, "dec", "binary")) == data
+
+
+@pytest.mark.parametrize("enc, dec", [
+    (aes256, aes256_dec),
+    (aes128, aes128_dec),
+    (blowfish, blowfish_dec),
+    (aes256gcm, aes256gcm_dec),
+    (chacha20poly1305, chacha20poly1305_dec),
+])
+@pytest.mark.parametrize("size", [0, 1, 16, 5000])
+def test_in_memory_round_trip(enc, dec, size, tmp_path):
+    """*_bytes and *_into match the file functions' formats"""
+    work_dir = str(tmp_path)
+    data = os.urandom(size)
+
+    out = bytearray(enc.encrypted_size(size) + 8)
+    written = enc.encrypt_into(data, memoryview(out)[4:], KEY)
+    assert written == enc.encrypted_size(size)
+    plain = bytearray(written)
+    assert plain[:dec.decrypt_into(out[4:4 + written], plain, KEY)] == data
+
+    # encrypt_bytes output is a valid .enc file
+    make_file(work_dir, "data.bin.enc", enc.encrypt_bytes(data, KEY))
+    dec.decrypt_file(os.path.join(work_dir, "data.bin.enc"), os.path.join(work_dir, "dec"), KEY)
+    assert read_file(os.path.join(work_dir, "dec", "data.bin")) == data
+
+
+def test_in_memory_rejects_small_buffer_and_wrong_key():
+    with pytest.raises(ValueError):
+        blowfish.encrypt_into(b"x" * 16, bytearray(16), KEY)
+    with pytest.raises(Exception):
+        aes256_dec.decrypt_bytes(aes256.encrypt_bytes(b"secret", KEY), "wrong_key")
+
+
+def test_rsa_in_memory_round_trip(tmp_path):
+    work_dir = str(tmp_path)
+    private_key, public_key = generate_rsa_keys(os.path.join(work_dir, "Keys"))
+    data = os.urandom(1000)
+
+    encrypted = rsa.encrypt_bytes(data, public_key)
+    assert len(encrypted) == rsa.encrypted_size(len(data), public_key)
+    assert rsa_dec.decrypt_bytes(encrypted, private_key) == data
+
+    # Same format as the stream-mode file
+    make_file(work_dir, "data.bin.enc", encrypted)
+    rsa_decrypt(os.path.join(work_dir, "data.bin.enc"), os.path.join(work_dir, "dec"), private_key, KEY)
+    assert read_file(os.path.join(work_dir, "dec", "data.bin")) == data
+
+
+@pytest.mark.parametrize("size", [0, 15, 16, 100000])
+@pytest.mark.parametrize("fmt", ["token", "stream", "binary", "converted"])
+def test_fernet_mmap_decrypt(fmt, size, tmp_path):
+    work_dir = str(tmp_path)
+    data = os.urandom(size)
+    input_path = make_file(work_dir, "data.bin", data)
+    aes256_encrypt(input_path, os.path.join(work_dir, "enc"), KEY, stream=fmt == "stream",
+                   binary=fmt == "binary", chunk_size=4096)
+    encrypted_path = os.path.join(work_dir, "enc", "data.bin.enc")
+    if fmt == "converted":
+        convert_file(encrypted_path, os.path.join(work_dir, "data.bin.enc"))
+        encrypted_path = os.path.join(work_dir, "data.bin.enc")
+
+    aes256_decrypt(encrypted_path, os.path.join(work_dir, "dec"), KEY, use_mmap=True)
+    assert read_file(os.path.join(work_dir, "dec", "data.bin")) == data
+
+    aes256_decrypt(encrypted_path, os.path.join(work_dir, "wrong"), "wrong_key", use_mmap=True)
+    assert not os.path.exists(os.path.join(work_dir, "wrong", "data.bin"))
+
+
+@pytest.mark.parametrize("binary", [False, True])
+def test_fernet_mmap_decrypt_rejects_tampered_token(binary, tmp_path):
+    """A token spanning several mapped pieces is authenticated from the bytes it decrypts"""
+    work_dir = str(tmp_path)
+    data = os.urandom(5 * 1024 * 1024)
+    input_path = make_file(work_dir, "data.bin", data)
+    aes256_encrypt(input_path, os.path.join(work_dir, "enc"), KEY, binary=binary)
+    encrypted_path = os.path.join(work_dir, "enc", "data.bin.enc")
+    encrypted = bytearray(read_file(encrypted_path))
+    encrypted[len(encrypted) * 3 // 4] ^= 1
+    make_file(work_dir, "tampered.bin.enc", bytes(encrypted))
+
+    aes256_decrypt(os.path.join(work_dir, "tampered.bin.enc"), os.path.join(work_dir, "dec"), KEY, use_mmap=True)
+    assert not os.path.exists(os.path.join(work_dir, "dec", "tampered.bin"))
+    aes256_decrypt(encrypted_path, os.path.join(work_dir, "dec"), KEY, use_mmap=True)
+    assert read_file(os.path.join(work_dir, "dec", "data.bin")) == data
+
+
+@pytest.mark.parametrize("size", [0, 8, 100000])
+def test_blowfish_and_rsa_mmap_decrypt(size, monkeypatch, tmp_path):
+    import Process.cbc_buffer
+    monkeypatch.setattr(Process.cbc_buffer, "STEP", 4096)  # exercise the stepped update_into loop
+    work_dir = str(tmp_path)
+    private_key, public_key = generate_rsa_keys(os.path.join(work_dir, "Keys"))
+    data = os.urandom(size)
+    input_path = make_file(work_dir, "data.bin", data)
+
+    blowfish_encrypt(input_path, os.path.join(work_dir, "bf"), KEY)
+    blowfish_decrypt(os.path.join(work_dir, "bf", "data.bin.enc"), os.path.join(work_dir, "bf_dec"), KEY, use_mmap=True)
+    assert read_file(os.path.join(work_dir, "bf_dec", "data.bin")) == data
+
+    rsa_encrypt(input_path, os.path.join(work_dir, "rsa"), public_key, KEY, stream=True)
+    rsa_decrypt(os.path.join(work_dir, "rsa", "data.bin.enc"), os.path.join(work_dir, "rsa_dec"), private_key, KEY, use_mmap=True)
+    assert read_file(os.path.join(work_dir, "rsa_dec", "data.bin")) == data
+
+
+@pytest.mark.parametrize("make_encryptor, dec", [
+    (lambda: aes256.stream_encryptor(KEY, 4096), aes256_dec),
+    (lambda: aes256.stream_encryptor(KEY, 4096, binary=True), aes256_dec),
+    (lambda: aes128.stream_encryptor(KEY, 4096), aes128_dec),
+    (lambda: aes256gcm.stream_encryptor(KEY, 4096), aes256gcm_dec),
+    (lambda: chacha20poly1305.stream_encryptor(KEY, 4096), chacha20poly1305_dec),
+])
+def test_decrypt_range(make_encryptor, dec, tmp_path):
+    """Ranges decrypt from the covering segments only; damage elsewhere goes unnoticed"""
+    work_dir = str(tmp_path)
+    data = os.urandom(5 * 4096 + 100)
+    encryptor = make_encryptor()
+    encrypted = bytearray(encryptor.update(data) + encryptor.finalize())
+    path = make_file(work_dir, "data.bin.enc", encrypted)
+
+    for offset, length in [(0, len(data)), (4000, 200), (4096, 4096), (len(data) - 50, 100), (len(data), 10), (10, 0)]:
+        assert dec.decrypt_range(path, offset, length, KEY) == data[offset:offset + length]
+
+    # Corrupt the first segment: ranges in later segments still decrypt, the first one fails
+    encrypted[100] ^= 1
+    make_file(work_dir, "data.bin.enc", encrypted)
+    assert dec.decrypt_range(path, 3 * 4096, 10, KEY) == data[3 * 4096:3 * 4096 + 10]
+    with pytest.raises(Exception):
+        dec.decrypt_range(path, 0, 10, KEY)
+    # Cutting off the last segment is caught by ranges that reach the new end
+    encryptor = make_encryptor()
+    boundary = len(encryptor.update(data[:5 * 4096]) + encryptor.finalize())
+    make_file(work_dir, "data.bin.enc", encrypted[:boundary])
+    with pytest.raises(Exception):
+        dec.decrypt_range(path, len(data) - 150, 10, KEY)
+
+
+@pytest.mark.parametrize("encrypt, decrypt, kwargs", [
+    (aes256.encrypt_file, aes256_dec.decrypt_file, {"stream": True, "chunk_size": 4096}),
+    (aes128.encrypt_file, aes128_dec.decrypt_file, {"workers": 2, "chunk_size": 4096}),
+    (aes256gcm.encrypt_file, aes256gcm_dec.decrypt_file, {"chunk_size": 4096}),
+    (blowfish.encrypt_file, blowfish_dec.decrypt_file, {"stream": True, "chunk_size": 4096}),
+])
+def test_file_functions_report_progress(encrypt, decrypt, kwargs, tmp_path):
+    """progress is called with increasing input byte counts, ending at the input size"""
+    work_dir = str(tmp_path)
+    data = os.urandom(5 * 4096 + 100)
+    path = make_file(work_dir, "data.bin", data)
+    reported = []
+    encrypt(path, os.path.join(work_dir, "enc"), KEY, progress=reported.append, **kwargs)
+    assert len(reported) > 1 and reported == sorted(reported) and reported[-1] == len(data)
+
+    encrypted_path = os.path.join(work_dir, "enc", "data.bin.enc")
+    reported = []
+    decrypt_kwargs = {"stream": True} if decrypt is blowfish_dec.decrypt_file else {}
+    decrypt(encrypted_path, os.path.join(work_dir, "dec"), KEY, progress=reported.append, **decrypt_kwargs)
+    assert reported == sorted(reported) and reported[-1] == os.path.getsize(encrypted_path)
+    assert read_file(os.path.join(work_dir, "dec", "data.bin")) == data
+
+
+@pytest.mark.parametrize("mode", [{"use_mmap": True}, {"workers": 2}])
+def test_mapped_and_range_decryption_report_progress(mode, monkeypatch, tmp_path):
+    """The mmap and parallel CBC paths report per step and per range, not only when done"""
+    import Process.cbc_buffer
+    import Process.parallel_cbc
+    import Process.Symmetric_algo.fernet_stream
+    monkeypatch.setattr(Process.cbc_buffer, "STEP", 4096)
+    monkeypatch.setattr(Process.parallel_cbc, "DEFAULT_RANGE_SIZE", 4096)
+    monkeypatch.setattr(Process.Symmetric_algo.fernet_stream, "DEFAULT_CHUNK_SIZE", 4096)
+    work_dir = str(tmp_path)
+    private_key, public_key = generate_rsa_keys(os.path.join(work_dir, "Keys"))
+    data = os.urandom(5 * 4096 + 100)
+    input_path = make_file(work_dir, "data.bin", data)
+    blowfish_encrypt(input_path, os.path.join(work_dir, "bf"), KEY)
+    rsa_encrypt(input_path, os.path.join(work_dir, "rsa"), public_key, KEY, stream=True)
+    aes256_encrypt(input_path, os.path.join(work_dir, "aes"), KEY, stream=True, chunk_size=4096)
+
+    runs = {
+        "bf": lambda path, output, **kwargs: blowfish_decrypt(path, output, KEY, **kwargs),
+        "rsa": lambda path, output, **kwargs: rsa_decrypt(path, output, private_key, KEY, **kwargs),
+    }
+    if "use_mmap" in mode:
+        runs["aes"] = lambda path, output, **kwargs: aes256_decrypt(path, output, KEY, **kwargs)
+    for name, decrypt in runs.items():
+        encrypted_path = os.path.join(work_dir, name, "data.bin.enc")
+        reported = []
+        decrypt(encrypted_path, os.path.join(work_dir, name + "_dec"), progress=reported.append, **mode)
+        assert read_file(os.path.join(work_dir, name + "_dec", "data.bin")) == data
+        assert len(set(reported)) > 3 and reported == sorted(reported)
+        assert reported[-1] == os.path.getsize(encrypted_path)
+
+
+@pytest.mark.parametrize("encrypt, kwargs", [
+    (aes256.encrypt_file, {"stream": True}),
+    (aes128.encrypt_file, {"workers": 2}),
+    (chacha20poly1305.encrypt_file, {}),
+    (blowfish.encrypt_file, {"stream": True}),
+])
+def test_cancelled_encryption_removes_partial_output(encrypt, kwargs, tmp_path):
+    """A cancelled token stops the loop at the next chunk and leaves no output file"""
+    work_dir = str(tmp_path)
+    path = make_file(work_dir, "data.bin", os.urandom(10 * 4096))
+    token = CancelToken()
+
+    def cancel_after_two_chunks(done):
+        if done >= 2 * 4096:
+            token.cancel("stop")
+
+    with pytest.raises(Cancelled, match="stop"):
+        encrypt(path, os.path.join(work_dir, "enc"), KEY, chunk_size=4096, progress=token.watch(cancel_after_two_chunks), **kwargs)
+    assert not os.path.exists(os.path.join(work_dir, "enc", "data.bin.enc"))
+
+    with pytest.raises(DeadlineExceeded):
+        CancelToken(deadline=0).check()
+
+
+@pytest.mark.parametrize("encrypt, decrypt, encrypt_kwargs, kwargs", [
+    (aes256.encrypt_file, aes256_dec.decrypt_file, {"stream": True}, {}),
+    (aes256.encrypt_file, aes256_dec.decrypt_file, {}, {"use_mmap": True}),
+    (blowfish.encrypt_file, blowfish_dec.decrypt_file, {}, {"stream": True}),
+    (blowfish.encrypt_file, blowfish_dec.decrypt_file, {}, {"workers": 2}),
+    (chacha20poly1305.encrypt_file, chacha20poly1305_dec.decrypt_file, {}, {}),
+])
+def test_cancelled_decryption_raises(encrypt, decrypt, encrypt_kwargs, kwargs, tmp_path):
+    """Decrypt functions report a wrong key by printing, but let a cancellation through"""
+    work_dir = str(tmp_path)
+    path = make_file(work_dir, "data.bin", os.urandom(10 * 4096))
+    encrypt(path, os.path.join(work_dir, "enc"), KEY, **encrypt_kwargs)
+    token = CancelToken()
+    token.cancel("stop")
+
+    with pytest.raises(Cancelled, match="stop"):
+        decrypt(os.path.join(work_dir, "enc", "data.bin.enc"), os.path.join(work_dir, "dec"), KEY,
+                progress=token.watch(lambda done: None), **kwargs)
+    assert not os.path.exists(os.path.join(work_dir, "dec", "data.bin"))
+
+
+def test_flag_file_cancels_work_in_another_process(tmp_path):
+    """CancelToken.flag_file() reaches a worker process, which stops at its next chunk"""
+    import pickle
+    from concurrent.futures import ProcessPoolExecutor
+
+    work_dir = str(tmp_path)
+    path = make_file(work_dir, "data.bin", os.urandom(10 * 4096))
+    aes256.encrypt_file(path, os.path.join(work_dir, "enc"), KEY, stream=True, chunk_size=4096)
+    token = CancelToken()
+    flag = pickle.loads(pickle.dumps(token.flag_file(os.path.join(work_dir, ".cancel"))))
+    flag(0)
+    token.cancel("stop")
+
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        with pytest.raises(Cancelled, match="stop"):
+            pool.submit(aes256_dec.decrypt_file, os.path.join(work_dir, "enc", "data.bin.enc"),
+                        os.path.join(work_dir, "dec"), KEY, progress=flag).result()
+    assert not os.path.exists(os.path.join(work_dir, "dec", "data.bin"))
+
+    with pytest.raises(DeadlineExceeded):
+        CancelToken(deadline=0).flag_file(os.path.join(work_dir, ".late"))(0)
+
+
+def compressible(size):
+    line = b"2024-01-01T00:00:00Z level=info method=GET path=/api/items status=200\n"
+    return (line * (size // len(line) + 1))[:size]
+
+
+@pytest.mark.parametrize("encrypt, decrypt, kwargs, decrypt_kwargs", [
+    (aes256.encrypt_file, aes256_dec.decrypt_file, {"stream": True, "chunk_size": 4096}, {}),
+    (aes256.encrypt_file, aes256_dec.decrypt_file, {}, {"use_mmap": True}),
+    (aes128.encrypt_file, aes128_dec.decrypt_file, {"workers": 2, "chunk_size": 4096}, {"workers": 2}),
+    (aes256gcm.encrypt_file, aes256gcm_dec.decrypt_file, {"chunk_size": 4096}, {}),
+    (chacha20poly1305.encrypt_file, chacha20poly1305_dec.decrypt_file, {}, {}),
+    (blowfish.encrypt_file, blowfish_dec.decrypt_file, {"stream": True}, {"stream": True}),
+    (blowfish.encrypt_file, blowfish_dec.decrypt_file, {}, {}),
+])
+@pytest.mark.parametrize("codec", ["zlib", "lzma"])
+def test_compressed_files_decrypt_transparently(encrypt, decrypt, kwargs, decrypt_kwargs, codec, tmp_path):
+    """compression= shrinks the output; every decrypt path expands it again without being told"""
+    work_dir = str(tmp_path)
+    data = compressible(300000)
+    path = make_file(work_dir, "data.log", data)
+    reported = []
+    encrypt(path, os.path.join(work_dir, "enc"), KEY, compression=codec, progress=reported.append, **kwargs)
+    encrypted_path = os.path.join(work_dir, "enc", "data.log.enc")
+    assert os.path.getsize(encrypted_path) < len(data) // 4
+    assert reported[-1] == len(data)
+
+    decrypt(encrypted_path, os.path.join(work_dir, "dec"), KEY, **decrypt_kwargs)
+    assert read_file(os.path.join(work_dir, "dec", "data.log")) == data
+
+
+def test_rsa_compression_implies_stream_format(tmp_path):
+    work_dir = str(tmp_path)
+    private_key, public_key = generate_rsa_keys(os.path.join(work_dir, "Keys"))
+    data = compressible(100000)
+    path = make_file(work_dir, "data.log", data)
+    rsa_encrypt(path, os.path.join(work_dir, "enc"), public_key, KEY, compression="zlib")
+    encrypted = read_file(os.path.join(work_dir, "enc", "data.log.enc"))
+    assert encrypted.startswith(rsa.STREAM_MAGIC) and len(encrypted) < len(data) // 4
+    assert rsa_dec.decrypt_bytes(encrypted, private_key) == data
+    rsa_decrypt(os.path.join(work_dir, "enc", "data.log.enc"), os.path.join(work_dir, "dec"), private_key, KEY)
+    assert read_file(os.path.join(work_dir, "dec", "data.log")) == data
+
+
+@pytest.mark.parametrize("enc, dec", [
+    (aes256, aes256_dec),
+    (aes128, aes128_dec),
+    (blowfish, blowfish_dec),
+    (aes256gcm, aes256gcm_dec),
+    (chacha20poly1305, chacha20poly1305_dec),
+])
+def test_compression_in_memory_and_incompressible_input(enc, dec):
+    """Compressible payloads shrink; the sampled first block keeps random data as it is"""
+    data = compressible(100000)
+    encrypted = enc.encrypt_bytes(data, KEY, compression="auto")
+    assert len(encrypted) < len(data) // 4
+    assert dec.decrypt_bytes(encrypted, KEY) == data
+
+    data = os.urandom(100000)
+    encrypted = enc.encrypt_bytes(data, KEY, compression="auto")
+    assert len(encrypted) == len(enc.encrypt_bytes(data, KEY))
+    assert dec.decrypt_bytes(encrypted, KEY) == data
+
+
+@pytest.mark.parametrize("make_encryptor, dec", [
+    (lambda **kwargs: aes256.stream_encryptor(KEY, 256, binary=True, **kwargs), aes256_dec),
+    (lambda **kwargs: chacha20poly1305.stream_encryptor(KEY, 256, **kwargs), chacha20poly1305_dec),
+])
+def test_compressed_stream_round_trip_and_range(make_encryptor, dec, tmp_path):
+    work_dir = str(tmp_path)
+    data = compressible(200000)
+    encryptor = compression.CompressingEncryptor(make_encryptor, "lzma")
+    encrypted = b"".join(encryptor.update(data[i:i + 1000]) for i in range(0, len(data), 1000)) + encryptor.finalize()
+    assert encryptor.compression == compression.LZMA
+
+    decryptor = compression.DecompressingDecryptor(dec.stream_decryptor(KEY))
+    plain = b"".join(decryptor.update(encrypted[i:i + 777]) for i in range(0, len(encrypted), 777))
+    assert plain + decryptor.finalize() == data
+
+    # Plaintext offsets of a compressed file mean nothing: ranges are refused, not garbled
+    path = make_file(work_dir, "data.log.enc", encrypted)
+    for offset in (0, 1000):
+        with pytest.raises(ValueError, match="Compressed"):
+            dec.decrypt_range(path, offset, 10, KEY)
+
+
+def test_damaged_compressed_plaintext_is_an_error():
+    data = compressible(100000)
+    for codec in ("zlib", "lzma"):
+        packed, codec_id = compression.compress_bytes(data, codec)
+        with pytest.raises(ValueError, match="truncated"):
+            compression.decompress_bytes(packed[:-10], codec_id)
+        with pytest.raises(ValueError, match="after the compressed stream"):
+            compression.decompress_bytes(packed + b"extra", codec_id)
+    with pytest.raises(ValueError, match="Unsupported compression"):
+        compression.resolve("brotli")
+
+
+@pytest.mark.parametrize("codec", compression.available())
+def test_expansion_is_bounded(codec):
+    """In-memory expansion stops at max_size; streaming expansion yields bounded pieces"""
+    data = bytes(64 * 1024 * 1024)
+    packed, codec_id = compression.compress_bytes(data, codec)
+    with pytest.raises(ValueError, match="exceeds"):
+        compression.decompress_bytes(packed, codec_id, max_size=len(data) - 1)
+    assert compression.decompress_bytes(packed, codec_id, max_size=len(data)) == data
+
+    decompressor = compression.Decompressor(codec_id)
+    pieces = list(decompressor.update_chunks(packed)) + list(decompressor.finalize_chunks())
+    assert sum(map(len, pieces)) == len(data)
+    assert max(map(len, pieces)) <= 32 * 1024 * 1024
+
+
+# What compressed plaintext used to start with, when the codec was marked in the plaintext itself
+OLD_MARKER = b"\x89ENCZ\r\n\x1a\x01\x01"
+
+
+@pytest.mark.parametrize("enc, dec", [
+    (aes256, aes256_dec),
+    (aes128, aes128_dec),
+    (blowfish, blowfish_dec),
+    (aes256gcm, aes256gcm_dec),
+    (chacha20poly1305, chacha20poly1305_dec),
+    (rsa, rsa_dec),
+])
+@pytest.mark.parametrize("codec", [None, "zlib"])
+def test_plaintext_that_looks_compressed_round_trips(enc, dec, codec, tmp_path):
+    """Only the container header decides whether output is expanded, never the plaintext"""
+    work_dir = str(tmp_path)
+    encrypt_key = decrypt_key = KEY
+    if enc is rsa:
+        decrypt_key, encrypt_key = generate_rsa_keys(os.path.join(work_dir, "Keys"))
+    # The file arguments after the directory: (key_string,) or (public/private key, password);
+    # RSA round-trips arbitrary bytes only in the stream format
+    encrypt_args = (encrypt_key, KEY) if enc is rsa else (KEY,)
+    decrypt_args = (decrypt_key, KEY) if enc is rsa else (KEY,)
+    stream = {"stream": True} if enc is rsa else {}
+
+    for data in (OLD_MARKER + compressible(100000), OLD_MARKER + os.urandom(1000)):
+        assert dec.decrypt_bytes(enc.encrypt_bytes(data, encrypt_key, compression=codec), decrypt_key) == data
+
+        path = make_file(work_dir, "data.bin", data)
+        enc.encrypt_file(path, os.path.join(work_dir, "enc"), *encrypt_args, compression=codec, **stream)
+        dec.decrypt_file(os.path.join(work_dir, "enc", "data.bin.enc"), os.path.join(work_dir, "dec"), *decrypt_args)
+        assert read_file(os.path.join(work_dir, "dec", "data.bin")) == data
@@ -0,0 +1,228 @@
+"""
+Resumable chunked upload sessions for /uploads
+"""
+import os
+import time
+import hashlib
+import threading
+from artifacts import artifact_store
+
+# missing() lists at most this many chunk indices
+MISSING_LIMIT = 1000
+
+
+class ChunkConflict(Exception):
+    """Raised when a chunk index is uploaded again with different content."""
+
+
+class UploadSession:
+    """One chunked upload, encrypted into its container as the chunks arrive.
+
+    The plaintext size is fixed when the session is created, so every chunk's
+    segment index, final flag and position in the output are known. Chunks
+    can therefore arrive in any order and in parallel, and each is encrypted
+    and written straight to its final offset (pwrite). Commit only has to
+    check that nothing is missing; no reassembly copy is needed.
+
+    Sending a chunk again with the same content is a no-op, so clients can
+    retry blindly after a dropped connection. Different content for an index
+    that was already written raises ChunkConflict, because the segment
+    position (and for the AEAD ciphers, the nonce) is fixed per index.
+
+    Writes take the output fd together with an in-flight count, and close()
+    and finish() wait for them to drain before the fd is closed, so a chunk
+    can never land in a file that reused the fd number.
+    """
+
+    def __init__(self, upload_id, workspace, encryptor, size, filename, algorithm=None):
+        self.upload_id = upload_id
+        self.algorithm = algorithm
+        self.encryptor = encryptor
+        self.size = size
+        self.chunk_size = encryptor.chunk_size
+        self.chunks = max(1, -(-size // self.chunk_size))
+        self.filename = filename
+        self.output_path = os.path.join(workspace, "encrypted", f"{filename}.enc")
+        self.last_activity = time.time()
+        self._digests = {}
+        self._received = set()
+        self._end = None
+        self._writers = 0
+        self._lock = threading.Lock()
+        self._drained = threading.Condition(self._lock)
+        os.makedirs(os.path.dirname(self.output_path))
+        self._fd = os.open(self.output_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        _pwrite_all(self._fd, encryptor.header, 0)
+
+    def chunk_length(self, index):
+        if index == self.chunks - 1:
+            return self.size - index * self.chunk_size
+        return self.chunk_size
+
+    def write(self, index, data):
+        """Encrypt chunk `index` and write its segment in place."""
+        if not 0 <= index < self.chunks:
+            raise ValueError(f"Chunk index must be between 0 and {self.chunks - 1}")
+        if len(data) != self.chunk_length(index):
+            raise ValueError(f"Chunk {index} must be {self.chunk_length(index)} bytes, got {len(data)}")
+        digest = hashlib.sha256(data).digest()
+        with self._lock:
+            if self._fd is None:
+                raise ValueError("Upload session is closed")
+            self.last_activity = time.time()
+            claimed = self._digests.setdefault(index, digest)
+            if claimed != digest:
+                raise ChunkConflict(f"Chunk {index} was already uploaded with different content")
+            if index in self._received:
+                return
+            fd = self._fd
+            self._writers += 1
+
+        final = index == self.chunks - 1
+        try:
+            segment = self.encryptor.segment(index, final, data)
+            position = self.encryptor.offset(index)
+            _pwrite_all(fd, segment, position)
+        except Exception:
+            with self._lock:
+                self._digests.pop(index, None)
+                self._release()
+            raise
+        with self._lock:
+            self._received.add(index)
+            if final:
+                self._end = position + len(segment)
+            self._release()
+
+    def _release(self):
+        # Called with the lock held when a write is done with the fd
+        self._writers -= 1
+        if not self._writers:
+            self._drained.notify_all()
+
+    def _detach(self):
+        # Called with the lock held: no new writes start, and the fd is returned once in-flight ones are done
+        fd, self._fd = self._fd, None
+        while self._writers:
+            self._drained.wait()
+        return fd
+
+    def remaining(self):
+        """Number of chunks not received yet."""
+        with self._lock:
+            return self.chunks - len(self._received)
+
+    def missing(self, limit=MISSING_LIMIT):
+        """The first `limit` chunk indices not received yet, in order."""
+        with self._lock:
+            remaining = self.chunks - len(self._received)
+            missing = []
+            for index in range(self.chunks):
+                if len(missing) == min(limit, remaining):
+                    break
+                if index not in self._received:
+                    missing.append(index)
+            return missing
+
+    def finish(self):
+        """Close the output once every chunk is in; returns its path.
+
+        Raises ValueError if chunks are missing or the session is already
+        closed (committed or aborted concurrently).
+        """
+        with self._lock:
+            if self._fd is None:
+                raise ValueError("Upload session is closed")
+            remaining = self.chunks - len(self._received)
+            if remaining:
+                first = next(index for index in range(self.chunks) if index not in self._received)
+                raise ValueError(f"{remaining} chunk(s) missing, first is {first}")
+            fd = self._detach()
+        try:
+            os.ftruncate(fd, self._end)
+        finally:
+            os.close(fd)
+        return self.output_path
+
+    def close(self):
+        with self._lock:
+            fd = self._detach()
+        if fd is not None:
+            os.close(fd)
+
+
+class UploadSessions:
+    """Open upload sessions, each in its own artifact store workspace.
+
+    Sessions idle for longer than the store's TTL are aborted; every chunk
+    refreshes both the session and its workspace.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def create(self, encryptor, size, filename, algorithm=None):
+        if size < 0:
+            raise ValueError("size must not be negative")
+        self.expire()
+        upload_id, workspace = self.store.workspace()
+        try:
+            session = UploadSession(upload_id, workspace, encryptor, size, filename, algorithm)
+        except Exception:
+            self.store.discard(upload_id)
+            raise
+        with self._lock:
+            self._sessions[upload_id] = session
+        return session
+
+    def get(self, upload_id):
+        with self._lock:
+            session = self._sessions.get(upload_id)
+        if session is not None:
+            self.store.touch(upload_id)
+        return session
+
+    def commit(self, upload_id):
+        """Finish a session and publish its output; returns the output path."""
+        session = self.get(upload_id)
+        if session is None:
+            raise KeyError(upload_id)
+        output_path = session.finish()
+        with self._lock:
+            self._sessions.pop(upload_id, None)
+        self.store.publish(upload_id, output_path)
+        return output_path
+
+    def abort(self, upload_id):
+        with self._lock:
+            session = self._sessions.pop(upload_id, None)
+        if session is not None:
+            session.close()
+            self.store.discard(upload_id)
+        return session is not None
+
+    def expire(self, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            idle = [upload_id for upload_id, session in self._sessions.items()
+                    if now - session.last_activity > self.store.ttl]
+        for upload_id in idle:
+            self.abort(upload_id)
+        return len(idle)
+
+    def stats(self):
+        with self._lock:
+            return {"open": len(self._sessions)}
+
+
+def _pwrite_all(fd, data, position):
+    view = memoryview(data)
+    while view:
+        written = os.pwrite(fd, view, position)
+        view = view[written:]
+        position += written
+
+
+upload_sessions = UploadSessions(artifact_store)